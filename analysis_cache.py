@@ -0,0 +1,142 @@
+"""
+Persistent analysis cache for Auto Policy AI Analyzer
+Stores AI analysis results in SQLite, keyed by a hash of the policy text,
+the prompt template version and the model name
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from config import ANALYSIS_CACHE_CONFIG
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_policy_text(policy_text):
+    """Collapse whitespace so re-extracted or re-indented text maps to the same key"""
+    return _WHITESPACE_RE.sub(' ', policy_text or '').strip()
+
+
+def cache_key(policy_text, model_name, prompt_version, kind="analysis"):
+    """Content-addressed key for one analysis of one policy"""
+    digest = hashlib.sha256()
+    for part in (kind, str(prompt_version), model_name or '', normalize_policy_text(policy_text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cache_enabled():
+    """Cache opt-out: config flag or the POLICYAI_DISABLE_CACHE environment variable"""
+    if os.getenv('POLICYAI_DISABLE_CACHE', '').lower() in ('1', 'true', 'yes'):
+        return False
+    return ANALYSIS_CACHE_CONFIG['enabled']
+
+
+class AnalysisCache:
+    """SQLite-backed result cache with TTL and LRU/size-based eviction"""
+
+    def __init__(self, path=None, ttl=None, max_entries=None, max_bytes=None):
+        self.path = path or ANALYSIS_CACHE_CONFIG['path']
+        self.ttl = ANALYSIS_CACHE_CONFIG['ttl'] if ttl is None else ttl
+        self.max_entries = ANALYSIS_CACHE_CONFIG['max_entries'] if max_entries is None else max_entries
+        self.max_bytes = ANALYSIS_CACHE_CONFIG['max_bytes'] if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_last_access ON analyses(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached analysis dict, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def contains(self, key):
+        """Whether a fresh entry exists, without counting a hit or miss or refreshing it"""
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def put(self, key, analysis):
+        """Store an analysis dict and evict expired or least recently used entries"""
+        value = json.dumps(analysis)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached analysis"""
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters plus current entry count and size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,))
+        entries, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+        ).fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        # Walk from least recently used until both limits are satisfied
+        doomed = []
+        for key, entry_size in self._conn.execute(
+            "SELECT key, size FROM analyses ORDER BY last_access ASC"
+        ):
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            entries -= 1
+            size -= entry_size
+        self._conn.executemany("DELETE FROM analyses WHERE key = ?", doomed)
@@ -0,0 +1,199 @@
+"""
+Analysis history for Auto Policy AI Analyzer
+Persists every finished analysis with its extracted policy fields in SQLite,
+indexed by policy number, state, score and date, so past answers can be
+paged through and aggregated without calling the model again
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from analysis_cache import normalize_policy_text
+from benchmark_data import get_benchmarks
+from config import HISTORY_CONFIG
+from metrics import increment
+from policy_extractor import extract_policy_fields
+
+# Columns returned for list views; the stored fields and analysis JSON load only per record
+SUMMARY_COLUMNS = ("id", "created_at", "policy_number", "state", "score", "risk_level", "monthly_premium",
+                   "source", "model")
+# strftime formats for trend buckets
+BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+
+def text_hash(policy_text, model_name=None):
+    """Identity of one analyzed text: re-analyzing it updates the record instead of adding one"""
+    digest = hashlib.sha256(normalize_policy_text(policy_text).encode('utf-8'))
+    digest.update(b'\0' + (model_name or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def history_enabled():
+    """History opt-out: config flag or the POLICYAI_DISABLE_HISTORY environment variable"""
+    if os.getenv('POLICYAI_DISABLE_HISTORY', '').lower() in ('1', 'true', 'yes'):
+        return False
+    return HISTORY_CONFIG['enabled']
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _prefix_upper_bound(prefix):
+    # Every string starting with prefix sorts below this, so the range scan can use the index
+    return prefix + '\U0010ffff'
+
+
+class AnalysisHistory:
+    """SQLite store of past analyses with keyset-paged queries and SQL aggregates"""
+
+    def __init__(self, path=None):
+        self.path = path or HISTORY_CONFIG['path']
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                text_hash TEXT NOT NULL UNIQUE,
+                created_at REAL NOT NULL,
+                policy_number TEXT,
+                state TEXT,
+                score REAL,
+                risk_level TEXT,
+                monthly_premium REAL,
+                source TEXT,
+                model TEXT,
+                fields TEXT NOT NULL,
+                analysis TEXT NOT NULL
+            )
+        """)
+        # The paged list is ordered by (created_at, id); each filter column gets its own index
+        for name, columns in (("created", "created_at, id"), ("policy_number", "policy_number"),
+                              ("state", "state, created_at"), ("score", "score")):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_history_{name} ON history({columns})")
+        self._conn.commit()
+
+    def record(self, policy_text, analysis, fields=None, source=None, model_name=None, created_at=None):
+        """Store an analysis and return its id; the same text analyzed again by the same model replaces its record
+
+        fields defaults to the policy fields extracted from policy_text.
+        """
+        if fields is None:
+            fields = extract_policy_fields(policy_text)
+        state = get_benchmarks().normalize_state(fields.get('state'))
+        monthly = _number(fields.get('monthly_premium'))
+        if monthly is None and _number(fields.get('annual_premium')) is not None:
+            monthly = fields['annual_premium'] / 12
+        row = (text_hash(policy_text, model_name), created_at or time.time(), fields.get('policy_number'), state,
+               _number(analysis.get('overall_score')), (analysis.get('policy_analysis') or {}).get('risk_level'),
+               monthly, source, model_name, json.dumps(fields), json.dumps(analysis))
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO history (text_hash, created_at, policy_number, state, score, risk_level,
+                                     monthly_premium, source, model, fields, analysis)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(text_hash) DO UPDATE SET
+                    created_at = excluded.created_at, policy_number = excluded.policy_number,
+                    state = excluded.state, score = excluded.score, risk_level = excluded.risk_level,
+                    monthly_premium = excluded.monthly_premium, source = excluded.source,
+                    fields = excluded.fields, analysis = excluded.analysis
+            """, row)
+            # Looked up rather than RETURNING, which needs SQLite 3.35; lastrowid is unset on the update path
+            record_id = self._conn.execute("SELECT id FROM history WHERE text_hash = ?", row[:1]).fetchone()[0]
+            self._conn.commit()
+        increment("history_records", source=source)
+        return record_id
+
+    @staticmethod
+    def _where(policy_number=None, state=None, min_score=None, max_score=None, since=None, until=None):
+        clauses, params = [], []
+        if policy_number:
+            clauses.append("policy_number >= ? AND policy_number < ?")
+            params += [policy_number, _prefix_upper_bound(policy_number)]
+        if state:
+            clauses.append("state = ?")
+            params.append(get_benchmarks().normalize_state(state) or state)
+        if min_score is not None:
+            clauses.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("score <= ?")
+            params.append(max_score)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def page(self, limit=None, before=None, **filters):
+        """Newest matching records first, without their JSON payloads
+
+        before is the (created_at, id) of the last record on the previous page;
+        pages are found by index range scan, so deep pages cost the same as the first.
+        """
+        clauses, params = self._where(**filters)
+        if before is not None:
+            # A row-value comparison plans as a range search on idx_history_created; the OR form scans it
+            clauses.append("(created_at, id) < (?, ?)")
+            params += [before[0], before[1]]
+        sql = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit or HISTORY_CONFIG['page_size'])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def count(self, **filters):
+        clauses, params = self._where(**filters)
+        sql = "SELECT COUNT(*) FROM history" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def get(self, record_id):
+        """One record with its fields and analysis dicts, or None"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)}, fields, analysis FROM history "
+                                     "WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(SUMMARY_COLUMNS, row[:-2]))
+        record.update(fields=json.loads(row[-2]), analysis=json.loads(row[-1]))
+        return record
+
+    def trends(self, bucket="day", **filters):
+        """Per-period analysis count, mean score and mean monthly premium, oldest first"""
+        clauses, params = self._where(**filters)
+        sql = (f"SELECT strftime('{BUCKETS[bucket]}', created_at, 'unixepoch', 'localtime') AS period, "
+               "COUNT(*), AVG(score), AVG(monthly_premium) FROM history")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY period ORDER BY period"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"period": period, "analyses": count, "mean_score": score, "mean_monthly_premium": premium}
+                for period, count, score, premium in rows]
+
+    def by_state(self, **filters):
+        """Analysis count and mean score per state, most analyzed first"""
+        clauses, params = self._where(**filters)
+        sql = "SELECT state, COUNT(*), AVG(score) FROM history"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY state ORDER BY COUNT(*) DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"state": state, "analyses": count, "mean_score": score} for state, count, score in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM history")
+            self._conn.commit()
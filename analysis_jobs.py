@@ -0,0 +1,159 @@
+"""
+Background analysis jobs for Auto Policy AI Analyzer
+Runs analyses on a bounded thread pool shared by all sessions, so a Streamlit
+rerun never loses or repeats in-flight work; the script only polls job state
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_CONFIG
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+
+class JobLimitExceeded(Exception):
+    """The session or the whole server already has too many unfinished jobs"""
+
+
+class AnalysisJob:
+    """State of one background job; progress and warnings are safe to read while it runs"""
+
+    def __init__(self, session_id, key):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.key = key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.warnings = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def elapsed(self):
+        end = self.finished_at or time.time()
+        return end - (self.started_at or self.created_at)
+
+    def cancel(self):
+        """Drop a queued job, or ask a running one to stop at its next checkpoint"""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.finished_at = time.time()
+            self.status = CANCELLED
+
+    def check_cancelled(self):
+        """Checkpoint for job functions; raises JobCancelled when asked to stop"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, key, value):
+        with self._lock:
+            self._progress[key] = value
+
+    def progress(self):
+        """Snapshot of the partial results reported so far"""
+        with self._lock:
+            return dict(self._progress)
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+
+class JobManager:
+    """Bounded executor with per-session limits; identical requests share one job"""
+
+    def __init__(self, workers=None, max_per_session=None, max_pending=None, retention=None):
+        self.max_per_session = max_per_session or JOB_CONFIG['max_per_session']
+        self.max_pending = max_pending or JOB_CONFIG['max_pending']
+        self.retention = JOB_CONFIG['retention'] if retention is None else retention
+        self._executor = ThreadPoolExecutor(max_workers=workers or JOB_CONFIG['workers'],
+                                            thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, key, fn, *args):
+        """Start fn(job, *args) unless this session already has a live or finished job for key"""
+        with self._lock:
+            self._prune()
+            existing = self.find(session_id, key)
+            if existing is not None and existing.status in (QUEUED, RUNNING, DONE):
+                return existing
+
+            unfinished = [job for job in self._jobs.values() if not job.finished]
+            if sum(job.session_id == session_id for job in unfinished) >= self.max_per_session:
+                raise JobLimitExceeded(f"Only {self.max_per_session} analyses can run at once per session")
+            if len(unfinished) >= self.max_pending:
+                raise JobLimitExceeded("The analyzer is busy; please try again in a moment")
+
+            job = AnalysisJob(session_id, key)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, fn, args)
+            return job
+
+    def _run(self, job, fn, args):
+        if job.cancel_requested:
+            job.finished_at = time.time()
+            job.status = CANCELLED
+            return
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.result = fn(job, *args)
+            status = CANCELLED if job.cancel_requested else DONE
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            job.error = e
+            status = FAILED
+        # finished_at first: readers treat a finished status as final
+        job.finished_at = time.time()
+        job.status = status
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def find(self, session_id, key):
+        """Most recent job for this session and key"""
+        matches = [job for job in list(self._jobs.values()) if job.session_id == session_id and job.key == key]
+        return max(matches, key=lambda job: job.created_at, default=None)
+
+    def queue_position(self, job):
+        """Number of queued jobs ahead of this one"""
+        return sum(other.status == QUEUED and other.created_at < job.created_at
+                   for other in list(self._jobs.values()))
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in list(self._jobs.values()):
+                job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,199 @@
+"""
+Analysis response schema, validation and JSON repair for Auto Policy AI Analyzer
+The schema is sent to Gemini as a response schema (JSON mode) and compiled
+once into a local validator; malformed responses are repaired before any retry
+"""
+
+import json
+import re
+import threading
+
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "policy_analysis": {
+            "type": "object",
+            "properties": {
+                "coverage_adequacy": {"type": "string"},
+                "cost_effectiveness": {"type": "string"},
+                "risk_level": {"type": "string"}
+            },
+            "required": ["coverage_adequacy", "cost_effectiveness", "risk_level"]
+        },
+        "comparison": {
+            "type": "object",
+            "properties": {
+                "liability_adequacy": {"type": "string"},
+                "deductible_analysis": {"type": "string"},
+                "premium_analysis": {"type": "string"}
+            },
+            "required": ["liability_adequacy", "deductible_analysis", "premium_analysis"]
+        },
+        "recommendations": {"type": "array", "items": {"type": "string"}},
+        "risk_assessment": {"type": "string"},
+        "overall_score": {"type": "integer"}
+    },
+    "required": ["policy_analysis", "comparison", "recommendations", "risk_assessment", "overall_score"]
+}
+
+STRUCTURED_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": ANALYSIS_RESPONSE_SCHEMA
+}
+
+_TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+}
+
+
+def compile_validator(schema, path="$"):
+    """Turn a schema dict into a function returning a list of error strings
+
+    The schema is walked once here; validating a response only runs the
+    resulting closures.
+    """
+    type_name = schema.get("type")
+    type_check = _TYPE_CHECKS[type_name]
+    required = tuple(schema.get("required", ()))
+    properties = [(key, compile_validator(sub_schema, f"{path}.{key}"))
+                  for key, sub_schema in schema.get("properties", {}).items()]
+    items = compile_validator(schema["items"], f"{path}[]") if "items" in schema else None
+
+    def validate(value):
+        if not type_check(value):
+            return [f"{path}: expected {type_name}, got {type(value).__name__}"]
+        errors = []
+        if type_name == "object":
+            errors.extend(f"{path}.{key}: missing" for key in required if key not in value)
+            for key, validate_property in properties:
+                if key in value:
+                    errors.extend(validate_property(value[key]))
+        elif items is not None:
+            for item in value:
+                errors.extend(items(item))
+        return errors
+
+    return validate
+
+
+validate_analysis = compile_validator(ANALYSIS_RESPONSE_SCHEMA)
+
+
+def coerce_analysis(analysis):
+    """Fix common near-misses in place: string or float scores, a single recommendation string"""
+    score = analysis.get("overall_score")
+    if isinstance(score, str):
+        match = re.search(r'\d+(?:\.\d+)?', score)
+        score = float(match.group()) if match else None
+    if isinstance(score, float):
+        score = int(round(score))
+    if isinstance(score, int) and not isinstance(score, bool):
+        analysis["overall_score"] = min(max(score, 0), 10)
+    elif "overall_score" in analysis:
+        del analysis["overall_score"]
+
+    recommendations = analysis.get("recommendations")
+    if isinstance(recommendations, str):
+        analysis["recommendations"] = [recommendations]
+    elif isinstance(recommendations, list):
+        analysis["recommendations"] = [str(rec) for rec in recommendations]
+    return analysis
+
+
+_repair_lock = threading.Lock()
+_repair_stats = {"attempts": 0, "successes": 0}
+
+
+def repair_stats():
+    """Counts of JSON repair attempts and successes, plus the success rate"""
+    with _repair_lock:
+        attempts, successes = _repair_stats["attempts"], _repair_stats["successes"]
+    return {
+        "attempts": attempts,
+        "successes": successes,
+        "success_rate": successes / attempts if attempts else 0.0
+    }
+
+
+def _record_repair(success):
+    with _repair_lock:
+        _repair_stats["attempts"] += 1
+        if success:
+            _repair_stats["successes"] += 1
+
+
+def _close(text, stack):
+    return text + ''.join('}' if opener == '{' else ']' for opener in reversed(stack))
+
+
+def _repair_candidates(text):
+    """Yield progressively more aggressive repairs of possibly truncated JSON text"""
+    out = []
+    stack = []
+    in_string = escape = False
+    # (length of out, open containers) at each point where a member could be cut
+    boundaries = []
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append(ch)
+            out.append(ch)
+            boundaries.append((len(out), tuple(stack)))
+            continue
+        elif ch in '}]':
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break  # Ignore anything after the root object
+            continue
+        elif ch == ',':
+            boundaries.append((len(out), tuple(stack)))
+        out.append(ch)
+
+    repaired = ''.join(out)
+    if in_string:
+        yield _close(repaired + '"', stack)
+    yield _close(repaired.rstrip().rstrip(','), stack)
+    # Truncated mid-member: cut back to the last complete member and close
+    for length, open_stack in reversed(boundaries):
+        yield _close(''.join(out[:length]).rstrip().rstrip(','), list(open_stack))
+
+
+def repair_json(text):
+    """Best-effort repair of fenced, trailing-comma or truncated JSON; None if hopeless"""
+    start = text.find('{')
+    if start == -1:
+        _record_repair(False)
+        return None
+    text = text[start:]
+    for candidate in _repair_candidates(text):
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict) and value:
+            _record_repair(True)
+            return value
+    _record_repair(False)
+    return None
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Async HTTP analysis service for Auto Policy AI Analyzer
+Serves text extraction and policy analysis over HTTP with aiohttp, using the
+same functions as the web app. One model client, the analysis cache and the
+extraction memo are shared by all requests. Requests past the concurrency
+limit wait in a bounded queue; once that is full the service answers 429 so
+callers back off.
+
+Usage:
+    python analysis_service.py --port 8080
+    python analysis_service.py --fake --fake-latency 0.5   # offline, e.g. for load tests
+
+Endpoints:
+    POST /v1/analyze        JSON {"text": "..."} or a text/plain body
+    POST /v1/analyze/file   multipart form with a "file" field (PDF, TXT or image)
+    POST /v1/extract/file   same upload; extracted text and fields only, no AI call
+    GET  /healthz           model, load and circuit breaker state
+    GET  /metrics           Prometheus text format
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from analysis_cache import AnalysisCache, cache_enabled
+from analysis_history import AnalysisHistory, history_enabled
+from call_guard import configure_call_guard, get_call_guard
+from config import EXTRACTION_MEMO_CONFIG, MODEL_CONFIG, ROUTER_CONFIG, SERVICE_CONFIG, UPLOAD_CONFIG
+from extraction_memo import ExtractionMemo
+from metrics import increment, registry, span
+from policy_analyzer import (
+    AnalysisError, ResponseParseError, analyze_policy_simple, analyze_policy_with_gemini, answering_models,
+    cached_analysis, extract_text_from_file
+)
+from policy_extractor import extract_policy_fields
+from upload_handling import SpooledUpload, UploadTooLarge, max_upload_bytes
+
+MODEL = web.AppKey("model", object)
+MODEL_NAME = web.AppKey("model_name", str)
+CACHE = web.AppKey("cache", object)
+HISTORY = web.AppKey("history", object)
+MEMO = web.AppKey("memo", ExtractionMemo)
+ADMISSION = web.AppKey("admission", object)
+EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+
+
+class Admission:
+    """At most concurrency requests run and queue_limit wait; anything more is refused"""
+
+    def __init__(self, concurrency, queue_limit):
+        self.concurrency = concurrency
+        self.limit = concurrency + queue_limit
+        self.admitted = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def try_admit(self):
+        if self.admitted >= self.limit:
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.admitted -= 1
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+
+    async def __aexit__(self, *exc):
+        self._semaphore.release()
+
+
+def analyze_text(text, model, model_name, cache=None, history=None):
+    """(analysis, kind) for policy text; falls back to the simple analysis like the web app
+
+    Finished analyses are also recorded in history, when one is given.
+    """
+    try:
+        analysis, kind = cached_analysis("analysis", text, model_name,
+                                         lambda policy_text: analyze_policy_with_gemini(policy_text, model),
+                                         cache), "analysis"
+    except ResponseParseError:
+        increment("fallbacks", reason="parse")
+        analysis, kind = cached_analysis("simple", text, model_name,
+                                         lambda policy_text: analyze_policy_simple(policy_text, model),
+                                         cache), "simple"
+    if history is not None and analysis:
+        try:
+            history.record(text, analysis, source="service", model_name=answering_models(analysis) or model_name)
+        except sqlite3.Error:
+            increment("history_errors")
+    return analysis, kind
+
+
+def _error(status, message, hint=None, headers=None):
+    body = {"error": message}
+    if hint:
+        body["hint"] = hint
+    return web.json_response(body, status=status, headers=headers)
+
+
+async def _run(request, endpoint, fn, *args):
+    """Run fn(*args) on the shared executor under admission control
+
+    Returns fn's result, or raises web.HTTPTooManyRequests when the service is saturated.
+    """
+    admission = request.app[ADMISSION]
+    if not admission.try_admit():
+        increment("service_rejected", endpoint=endpoint)
+        raise web.HTTPTooManyRequests(text='{"error": "Service is at capacity, retry shortly"}',
+                                      content_type="application/json", headers={"Retry-After": "1"})
+    try:
+        async with admission:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(request.app[EXECUTOR], fn, *args)
+    finally:
+        admission.release()
+
+
+async def _analysis_response(request, endpoint, text):
+    app = request.app
+    started = time.perf_counter()
+    try:
+        with span("service", endpoint=endpoint):
+            analysis, kind = await _run(request, endpoint, analyze_text, text, app[MODEL], app[MODEL_NAME], app[CACHE],
+                                          app[HISTORY])
+    except AnalysisError as e:
+        guard = get_call_guard().status()
+        if not guard['available']:
+            return _error(503, str(e), e.hint, headers={"Retry-After": str(max(1, round(guard['retry_in'])))})
+        return _error(502, str(e), e.hint)
+    if not analysis:
+        return _error(502, "The model returned no analysis")
+    return web.json_response({
+        "model": app[MODEL_NAME],
+        "kind": kind,
+        "policy": extract_policy_fields(text),
+        "analysis": analysis,
+        "seconds": round(time.perf_counter() - started, 3)
+    })
+
+
+async def analyze(request):
+    """POST /v1/analyze: policy text as JSON {"text": ...} or a plain-text body"""
+    if request.content_type == "application/json":
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error(400, "Request body is not valid JSON")
+        text = body.get("text") if isinstance(body, dict) else None
+    else:
+        text = await request.text()
+    if not isinstance(text, str) or not text.strip():
+        return _error(400, "No policy text given")
+    return await _analysis_response(request, "analyze", text)
+
+
+async def _spool_field(request):
+    """Stream the "file" form field to a temporary file, stopping as soon as it is too large"""
+    if not request.content_type.startswith("multipart/"):
+        return None
+    reader = await request.multipart()
+    field = await reader.next()
+    while field is not None and field.name != "file":
+        field = await reader.next()
+    if field is None:
+        return None
+
+    limit = max_upload_bytes()
+    suffix = os.path.splitext(field.filename or "")[1].lower()
+    fd, path = tempfile.mkstemp(prefix='policyai-', suffix=suffix, dir=UPLOAD_CONFIG['spool_dir'])
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await field.read_chunk(UPLOAD_CONFIG['chunk_size'])
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLarge(limit)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, field.filename or os.path.basename(path), field.headers.get("Content-Type"),
+                         size, digest.hexdigest())
+
+
+async def _extract_upload(request, endpoint):
+    """(text, None) from the uploaded file, or (None, error response)"""
+    try:
+        upload = await _spool_field(request)
+    except UploadTooLarge as e:
+        return None, _error(413, str(e))
+    if upload is None:
+        return None, _error(400, 'Expected a multipart form with a "file" field')
+    with upload:
+        memo = request.app[MEMO]
+        # Same bytes, same text: repeated uploads skip extraction
+        text = await _run(request, endpoint, memo.extract, f"file:{upload.sha256}",
+                          lambda warn: extract_text_from_file(upload.path))
+    if not text:
+        return None, _error(422, "Could not extract text from file")
+    return text, None
+
+
+async def analyze_file(request):
+    """POST /v1/analyze/file: extract and analyze an uploaded policy"""
+    text, error = await _extract_upload(request, "analyze_file")
+    if error is not None:
+        return error
+    return await _analysis_response(request, "analyze_file", text)
+
+
+async def extract_file(request):
+    """POST /v1/extract/file: extracted text and policy fields, without calling the model"""
+    text, error = await _extract_upload(request, "extract_file")
+    if error is not None:
+        return error
+    return web.json_response({"text": text, "policy": extract_policy_fields(text)})
+
+
+async def health(request):
+    admission = request.app[ADMISSION]
+    return web.json_response({
+        "status": "ok",
+        "model": request.app[MODEL_NAME],
+        "in_flight": admission.admitted,
+        "capacity": admission.limit,
+        "circuit": get_call_guard().status()['state']
+    })
+
+
+async def metrics(request):
+    return web.Response(text=registry.render_prometheus(), content_type="text/plain")
+
+
+@web.middleware
+async def count_requests(request, handler):
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        increment("service_requests", path=request.path, status=e.status)
+        raise
+    increment("service_requests", path=request.path, status=response.status)
+    return response
+
+
+def create_app(model, model_name, cache=None, concurrency=None, queue_limit=None, history=None):
+    """aiohttp application serving analyses from one shared model client"""
+    concurrency = concurrency or SERVICE_CONFIG['concurrency']
+    queue_limit = SERVICE_CONFIG['queue_limit'] if queue_limit is None else queue_limit
+    app = web.Application(middlewares=[count_requests], client_max_size=max_upload_bytes() + 64 * 1024)
+    app[MODEL] = model
+    app[MODEL_NAME] = model_name
+    app[CACHE] = cache
+    app[HISTORY] = history
+    app[MEMO] = ExtractionMemo(EXTRACTION_MEMO_CONFIG['shared_max_bytes'])
+    app[ADMISSION] = Admission(concurrency, queue_limit)
+    app[EXECUTOR] = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='service')
+
+    async def shutdown_executor(app):
+        app[EXECUTOR].shutdown(wait=False)
+    app.on_cleanup.append(shutdown_executor)
+
+    app.router.add_post("/v1/analyze", analyze)
+    app.router.add_post("/v1/analyze/file", analyze_file)
+    app.router.add_post("/v1/extract/file", extract_file)
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve policy analysis over HTTP")
+    parser.add_argument("--host", default=SERVICE_CONFIG['host'], help="Interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=SERVICE_CONFIG['port'], help="Port (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=SERVICE_CONFIG['concurrency'],
+                        help="Analyses run at once (default: %(default)s)")
+    parser.add_argument("--queue-limit", type=int, default=SERVICE_CONFIG['queue_limit'],
+                        help="Requests allowed to wait before answering 429 (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the analysis cache")
+    parser.add_argument("--no-history", action="store_true", help="Do not record analyses in the history store")
+    parser.add_argument("--fake", action="store_true",
+                        help="Answer with a local fake model instead of Gemini (no API key needed)")
+    parser.add_argument("--rpm", type=float,
+                        help="Gemini requests per minute across all requests (default: CALL_CONFIG, "
+                             "unlimited with --fake)")
+    parser.add_argument("--fake-latency", type=float, default=SERVICE_CONFIG['fake_latency'],
+                        help="Seconds the fake model takes per call (default: %(default)s)")
+    return parser
+
+
+def load_model(args):
+    """(model, model_name) for the service, or (None, None) when Gemini is unreachable"""
+    if args.fake:
+        from fake_model import FakeGenerativeModel
+        model = FakeGenerativeModel(latency=args.fake_latency)
+        return model, model.model_name
+
+    from dotenv import load_dotenv
+    import google.generativeai as genai
+    from model_selection import ModelSelector
+
+    load_dotenv()
+    api_key = os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        print("❌ Please set your GOOGLE_API_KEY in the .env file, or use --fake", file=sys.stderr)
+        return None, None
+    genai.configure(api_key=api_key)
+    selector = ModelSelector()
+    model = selector.get_model()
+    if model is None:
+        print("❌ Could not connect to any Gemini model.", file=sys.stderr)
+        return None, None
+    if ROUTER_CONFIG['enabled']:
+        from model_router import ModelRouter
+        model = ModelRouter(MODEL_CONFIG['model_options'], preferred=selector.model_name)
+    return model, selector.model_name
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    model, model_name = load_model(args)
+    if model is None:
+        return 1
+    if args.rpm or args.fake:
+        # A fake backend has no quota; only an explicit --rpm limits it
+        configure_call_guard(requests_per_minute=args.rpm or 10 ** 9, burst=None if args.rpm else 10 ** 6)
+    cache = AnalysisCache() if cache_enabled() and not args.no_cache else None
+    history = AnalysisHistory() if history_enabled() and not args.no_history else None
+    print(f"Serving analyses with {model_name} on http://{args.host}:{args.port}")
+    web.run_app(create_app(model, model_name, cache, args.concurrency, args.queue_limit, history),
+                host=args.host, port=args.port, print=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,26 @@
 import streamlit as st
 import google.generativeai as genai
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import json
 import os
+import sqlite3
+import time
+import uuid
 from dotenv import load_dotenv
-import base64
-from PIL import Image
-import io
-import PyPDF2
-import pdfplumber
-from config import US_AVERAGES, APP_CONFIG, AI_CONFIG, CHART_CONFIG
+from config import (US_AVERAGES, APP_CONFIG, AI_CONFIG, MODEL_CONFIG, JOB_CONFIG, METRICS_CONFIG, PORTFOLIO_CONFIG,
+                    ROUTER_CONFIG, EXTRACTION_MEMO_CONFIG, WHAT_IF_CONFIG, PROMPT_CONFIG, UPLOAD_CONFIG, HISTORY_CONFIG)
+from model_selection import ModelSelector
+from model_router import ModelRouter
+from analysis_cache import AnalysisCache, cache_enabled, cache_key
+from analysis_history import BUCKETS, AnalysisHistory, history_enabled
+from analysis_jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobLimitExceeded, JobManager
+import policy_analyzer
+from policy_analyzer import AnalysisError, ModelCallError, cached_analysis, extract_text_from_image, extract_text_from_pdf
+from analysis_schema import repair_stats
+from benchmark_data import get_benchmarks
+from call_guard import get_call_guard
+from extraction_memo import ExtractionMemo
+import metrics
+from policy_extractor import extract_policy_fields, has_numeric_fields
+from upload_handling import UploadTooLarge, preview_text, spool_upload
 
 # Page configuration - MUST be the first Streamlit command
 st.set_page_config(
@@ -25,29 +33,44 @@ st.set_page_config(
 # Load environment variables
 load_dotenv()
 
+@st.cache_resource(show_spinner="Connecting to Gemini...")
+def get_model_selector():
+    """Shared model selector: probes once per process instead of on every rerun"""
+    return ModelSelector()
+
+@st.cache_resource
+def get_model_router(preferred):
+    """Shared router across the configured models, preferring the probed one"""
+    return ModelRouter(MODEL_CONFIG['model_options'], preferred=preferred)
+
+@st.cache_resource
+def get_analysis_cache():
+    """Shared on-disk analysis cache"""
+    return AnalysisCache()
+
+@st.cache_resource
+def get_analysis_history():
+    """Shared on-disk store of every finished analysis"""
+    return AnalysisHistory()
+
 # Configure Gemini API
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
     
-    # Try different model options including Gemini 2.0
-    model_options = ["gemini-2.0-flash-exp", "gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro"]
-    model = None
-    
-    for model_name in model_options:
-        try:
-            model = genai.GenerativeModel(model_name)
-            # Test the model connection
-            test_response = model.generate_content("Hello")
-            st.success(f"✅ Connected successfully using: {model_name}")
-            break
-        except Exception as e:
-            continue
+    # Probing happens once per process (or TTL); reruns reuse the shared selector
+    model_selector = get_model_selector()
+    model = model_selector.get_model()
     
     if model is None:
         st.error("❌ Could not connect to any Gemini model. Please check your API key and internet connection.")
-        st.info("💡 Available models: gemini-2.0-flash-exp, gemini-1.5-pro, gemini-1.5-flash, gemini-pro")
+        st.info(f"💡 Available models: {', '.join(MODEL_CONFIG['model_options'])}")
         st.stop()
+    
+    st.success(f"✅ Connected successfully using: {model_selector.model_name}")
+    if ROUTER_CONFIG['enabled']:
+        # Requests go to whichever configured model currently meets the latency SLO
+        model = get_model_router(model_selector.model_name)
 else:
     st.error("Please set your GOOGLE_API_KEY in the .env file")
     st.stop()
@@ -151,208 +174,178 @@ st.markdown("""
 
 # US averages are now imported from config.py
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF file using multiple methods"""
-    try:
-        # Method 1: Try pdfplumber first (better for complex PDFs)
-        with pdfplumber.open(pdf_file) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            if text.strip():
-                return text.strip()
-    except Exception as e:
-        st.warning(f"pdfplumber failed: {str(e)}")
+QUICK_SCORE_MODES = ("🤖 AI analysis", "⚡ Quick score (no AI call)")
+
+# Manual Entry form widget keys and their starting values
+MANUAL_DEFAULTS = {
+    'bi_per_person': 50000,
+    'bi_per_accident': 100000,
+    'pd_per_accident': 25000,
+    'comp_deductible': 500,
+    'collision_deductible': 500,
+    'um_per_person': 25000,
+    'um_per_accident': 50000,
+    'med_payments': 1000,
+    'rental_reimbursement': 30,
+    'monthly_premium': 150.0,
+    'manual_state': "Not specified",
+    'roadside_assistance': True
+}
+LIABILITY_FIELDS = ('bodily_injury_per_person', 'bodily_injury_per_accident', 'property_damage')
+DEDUCTIBLE_FIELDS = ('comprehensive_deductible', 'collision_deductible')
+
+def use_analysis_cache():
+    """Whether analyses go through the persistent cache for this session"""
+    return cache_enabled() and st.session_state.get('use_analysis_cache', True)
+
+def run_analysis(kind, policy_text, analyze, cache=None):
+    """Run one cached analysis and report model health; safe off the script thread"""
+    def call_model(text):
+        try:
+            analysis = analyze(text, model)
+        except ModelCallError:
+            model_selector.report_failure()
+            raise
+        model_selector.report_success()
+        return analysis
     
+    return cached_analysis(kind, policy_text, model_selector.model_name, call_model, cache)
+
+def record_analysis(history, policy_text, analysis, source, warn=None):
+    """Keep a finished analysis in the history store; a failed write never fails the analysis"""
+    if history is None or not analysis:
+        return
     try:
-        # Method 2: Try PyPDF2 as fallback
-        pdf_file.seek(0)  # Reset file pointer
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        if text.strip():
-            return text.strip()
-    except Exception as e:
-        st.warning(f"PyPDF2 failed: {str(e)}")
-    
-    return None
-
-def analyze_policy_with_gemini(policy_text):
-    """Analyze policy using Gemini AI"""
-    prompt = f"""
-    You are an expert auto insurance analyst. Analyze the following auto insurance policy information and provide a detailed comparison with US averages.
-    
-    Policy Information:
-    {policy_text}
-    
-    US Averages for reference:
-    - Liability Coverage: $50,000/$100,000 bodily injury, $25,000 property damage
-    - Comprehensive Deductible: $500
-    - Collision Deductible: $500
-    - Uninsured Motorist: $25,000/$50,000
-    - Medical Payments: $1,000
-    - Rental Reimbursement: $30/day
-    - Monthly Premium: $150
-    - Annual Premium: $1,800
-    
-    Please provide a detailed analysis in the following JSON format ONLY. Do not include any other text before or after the JSON:
-    {{
-        "policy_analysis": {{
-            "coverage_adequacy": "Brief assessment of coverage adequacy",
-            "cost_effectiveness": "Analysis of cost vs. value",
-            "risk_level": "Low/Medium/High risk assessment"
-        }},
-        "comparison": {{
-            "liability_adequacy": "Comparison with US liability averages",
-            "deductible_analysis": "Analysis of deductible levels",
-            "premium_analysis": "Premium comparison with US averages"
-        }},
-        "recommendations": [
-            "Specific recommendation 1",
-            "Specific recommendation 2",
-            "Specific recommendation 3"
-        ],
-        "risk_assessment": "Detailed risk assessment",
-        "overall_score": 7
-    }}
-    
-    IMPORTANT: Respond with ONLY valid JSON. No additional text, explanations, or formatting outside the JSON structure.
-    """
+        # With routing on, the model that answered is not necessarily the selector's
+        history.record(policy_text, analysis, source=source,
+                       model_name=policy_analyzer.answering_models(analysis) or model_selector.model_name)
+    except sqlite3.Error as e:
+        metrics.increment("history_errors")
+        if warn is not None:
+            warn(f"The analysis could not be saved to history: {e}")
+
+def analysis_job(job, policy_text, cache, incremental=False, history=None, source=None):
+    """Background job: streamed, JSON or block-by-block analysis, falling back to the simple analysis"""
+    def on_section(path, value):
+        job.check_cancelled()
+        if path[0] == 'recommendations' and len(path) == 2:
+            job.set_progress('recommendations', job.progress().get('recommendations', []) + [value])
+        elif len(path) == 1 and path[0] in SECTION_RENDERERS:
+            job.set_progress(path[0], value)
     
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-
-        
-        # Try to extract JSON from the response
-        if response_text:
-            # Look for JSON content between curly braces
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_text = response_text[start_idx:end_idx + 1]
-                try:
-                    return json.loads(json_text)
-                except json.JSONDecodeError as json_error:
-                    st.error(f"JSON parsing error: {str(json_error)}")
-                    st.info(f"Attempted to parse: {json_text[:100]}...")
-                    return None
-            else:
-                st.error("No JSON structure found in AI response")
-                return None
+        if (incremental and PROMPT_CONFIG['incremental']
+                and policy_analyzer.incremental_pays_off(policy_text, model_selector.model_name, cache)):
+            # Unchanged blocks of an edited document are answered from the cache; a short,
+            # unseen document keeps the streamed single call
+            analysis = run_analysis("sections", policy_text,
+                                    lambda text, model: policy_analyzer.analyze_policy_incremental(
+                                        text, model, cache, on_section, model_selector.model_name),
+                                    cache)
+        elif AI_CONFIG.get('stream'):
+            analysis = run_analysis("analysis", policy_text,
+                                    lambda text, model: policy_analyzer.analyze_policy_streaming(text, model, on_section),
+                                    cache)
         else:
-            st.error("Empty response from AI")
-            return None
-            
-    except Exception as e:
-        st.error(f"Error analyzing policy: {str(e)}")
-        st.info("This might be due to API limits or network issues. Please try again.")
-        return None
+            analysis = run_analysis("analysis", policy_text, policy_analyzer.analyze_policy_with_gemini, cache)
+        if analysis:
+            record_analysis(history, policy_text, analysis, source, job.warn)
+            return analysis
+        reason = "empty"
+    except AnalysisError as e:
+        if not get_call_guard().available():
+            # The backend is down; the simple prompt would be refused too
+            raise
+        job.warn(e)
+        reason = "model" if isinstance(e, ModelCallError) else "parse"
+    job.check_cancelled()
+    job.warn("JSON analysis failed, used the simple analysis instead.")
+    metrics.increment("fallbacks", reason=reason)
+    analysis = run_analysis("simple", policy_text, policy_analyzer.analyze_policy_simple, cache)
+    record_analysis(history, policy_text, analysis, source, job.warn)
+    return analysis
 
-def analyze_policy_simple(policy_text):
-    """Simple analysis without JSON parsing as fallback"""
-    prompt = f"""
-    Analyze this auto insurance policy and provide a brief assessment:
-    
-    {policy_text}
-    
-    Provide a simple analysis covering:
-    1. Coverage adequacy
-    2. Cost effectiveness  
-    3. Risk level
-    4. Key recommendations
-    """
-    
+@st.cache_resource
+def get_job_manager():
+    """Background analysis jobs shared by every session in this process"""
+    return JobManager()
+
+def session_id():
+    """Stable id for this browser session; jobs and per-session limits hang off it"""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def analysis_job_key(policy_text):
+    return cache_key(policy_text, model_selector.model_name, policy_analyzer.PROMPT_VERSION, kind="job")
+
+def start_analysis(policy_text, incremental=False, source=None):
+    """Queue a background analysis; clicking again reuses the running or finished job"""
+    key = analysis_job_key(policy_text)
+    cache = get_analysis_cache() if use_analysis_cache() else None
+    history = get_analysis_history() if history_enabled() else None
     try:
-        response = model.generate_content(prompt)
-        return {
-            "policy_analysis": {
-                "coverage_adequacy": "Analysis provided by AI",
-                "cost_effectiveness": "Cost analysis completed",
-                "risk_level": "Risk assessment provided"
-            },
-            "comparison": {
-                "liability_adequacy": "Compared with US averages",
-                "deductible_analysis": "Deductible analysis completed",
-                "premium_analysis": "Premium comparison done"
-            },
-            "recommendations": ["Review your policy with an insurance agent", "Consider increasing coverage if needed", "Shop around for better rates"],
-            "risk_assessment": response.text,
-            "overall_score": 6
-        }
-    except Exception as e:
-        st.error(f"Fallback analysis also failed: {str(e)}")
+        job = get_job_manager().submit(session_id(), key, analysis_job, policy_text, cache, incremental,
+                                       history, source)
+    except JobLimitExceeded as e:
+        st.warning(f"⏳ {e}")
         return None
+    st.session_state.setdefault('analysis_jobs', {})[key] = job.id
+    return job
 
-def create_comparison_charts(user_policy, us_averages):
-    """Create comparison charts"""
-    # Premium comparison
-    fig_premium = go.Figure()
-    fig_premium.add_trace(go.Bar(
-        name='Your Policy',
-        x=['Monthly Premium', 'Annual Premium'],
-        y=[user_policy.get('monthly_premium', 0), user_policy.get('annual_premium', 0)],
-        marker_color=CHART_CONFIG['colors']['primary']
-    ))
-    fig_premium.add_trace(go.Bar(
-        name='US Average',
-        x=['Monthly Premium', 'Annual Premium'],
-        y=[us_averages['monthly_premium'], us_averages['annual_premium']],
-        marker_color=CHART_CONFIG['colors']['secondary']
-    ))
-    fig_premium.update_layout(
-        title='Premium Comparison',
-        barmode='group',
-        height=CHART_CONFIG['height'],
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='#ffffff'),
-        title_font_color='#00d4ff'
-    )
-    
-    # Coverage comparison
-    fig_coverage = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=('Bodily Injury Coverage', 'Property Damage Coverage', 
-                       'Uninsured Motorist', 'Medical Payments'),
-        specs=[[{"type": "bar"}, {"type": "bar"}],
-               [{"type": "bar"}, {"type": "bar"}]]
-    )
-    
-    # Add coverage data
-    fig_coverage.add_trace(go.Bar(
-        name='Your Policy',
-        x=['Per Person', 'Per Accident'],
-        y=[user_policy.get('liability_coverage', {}).get('bodily_injury', {}).get('per_person', 0),
-           user_policy.get('liability_coverage', {}).get('bodily_injury', {}).get('per_accident', 0)],
-        marker_color=CHART_CONFIG['colors']['primary']
-    ), row=1, col=1)
-    
-    fig_coverage.add_trace(go.Bar(
-        name='US Average',
-        x=['Per Person', 'Per Accident'],
-        y=[us_averages['liability_coverage']['bodily_injury']['per_person'],
-           us_averages['liability_coverage']['bodily_injury']['per_accident']],
-        marker_color=CHART_CONFIG['colors']['secondary']
-    ), row=1, col=1)
-    
-    fig_coverage.update_layout(
-        height=600, 
-        showlegend=True,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='#ffffff'),
-        title_font_color='#00d4ff'
-    )
-    
-    return fig_premium, fig_coverage
+def current_analysis_job(policy_text):
+    """This session's job for policy_text, if one was started"""
+    job_id = st.session_state.get('analysis_jobs', {}).get(analysis_job_key(policy_text))
+    return get_job_manager().get(job_id) if job_id else None
+
+def portfolio_job(job, files, cache, use_ai, history=None):
+    """Background job: extract, quick-score and (unless use_ai is off) analyze every file"""
+    from portfolio import run_portfolio
+    analyze = None
+    if use_ai:
+        def analyze(text):
+            analysis = run_analysis("analysis", text, policy_analyzer.analyze_policy_with_gemini, cache)
+            record_analysis(history, text, analysis, "portfolio")
+            return analysis
+    return run_portfolio(job, files, analyze)
+
+def start_portfolio(uploaded_files, use_ai):
+    """Spool the uploads and queue one portfolio job; the spooled files are deleted when it ends"""
+    uploads = []
+    for uploaded_file in uploaded_files[:PORTFOLIO_CONFIG['max_files']]:
+        try:
+            uploads.append(spool_upload(uploaded_file))
+        except UploadTooLarge as e:
+            st.warning(f"⚠️ Skipped {uploaded_file.name}: {e}")
+    if not uploads:
+        return None
+    
+    def close_uploads(*_):
+        for upload in uploads:
+            upload.close()
+    
+    content = "\n".join(sorted(upload.sha256 for upload in uploads))
+    key = cache_key(content, model_selector.model_name if use_ai else None, policy_analyzer.PROMPT_VERSION,
+                    kind="portfolio" if use_ai else "portfolio-quick")
+    manager = get_job_manager()
+    job = manager.find(session_id(), key)
+    if job is not None and job.status in (QUEUED, RUNNING, DONE):
+        # Same files as a live or finished run: show that one
+        close_uploads()
+    else:
+        cache = get_analysis_cache() if use_ai and use_analysis_cache() else None
+        history = get_analysis_history() if use_ai and history_enabled() else None
+        try:
+            job = manager.submit(session_id(), key, portfolio_job,
+                                 [(upload.name, upload.path) for upload in uploads], cache, use_ai, history)
+        except JobLimitExceeded as e:
+            close_uploads()
+            st.warning(f"⏳ {e}")
+            return None
+        # Also runs when the job is cancelled before it starts
+        job.future.add_done_callback(close_uploads)
+    st.session_state['portfolio_job'] = job.id
+    return job
 
 def main():
     # Simple Header
@@ -366,6 +359,29 @@ def main():
         st.metric("US Average Annual Premium", f"${US_AVERAGES['annual_premium']}")
         st.metric("Typical Liability Coverage", "$50K/$100K")
         
+        if cache_enabled():
+            st.checkbox("Reuse cached analyses", value=True, key='use_analysis_cache',
+                        help="Identical policies are answered from the local cache instead of calling Gemini again")
+            stats = get_analysis_cache().stats()
+            st.caption(f"Cache: {stats['entries']} entries, {stats['hits']} hits / {stats['misses']} misses")
+        
+        repairs = repair_stats()
+        if repairs['attempts']:
+            st.caption(f"JSON repairs: {repairs['successes']}/{repairs['attempts']} succeeded "
+                       f"({repairs['success_rate']:.0%})")
+        
+        st.radio("Analysis mode", QUICK_SCORE_MODES, key='analysis_mode',
+                 help="Quick score rates limits, deductibles and premium against the averages "
+                      "instantly, without calling Gemini")
+        
+        guard = get_call_guard().status()
+        if not guard['available']:
+            st.warning(f"⚠️ Gemini is failing; AI analysis is paused for {guard['retry_in']:.0f}s. "
+                       "Quick score still works.")
+        
+        if debug_panel_enabled():
+            display_debug_panel()
+        
         st.header("ℹ️ How it works")
         st.markdown("""
         1. Upload your policy document or enter details manually
@@ -375,7 +391,7 @@ def main():
         """)
     
     # Main content
-    tab1, tab2 = st.tabs(["📄 Upload Policy", "✍️ Manual Entry"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📄 Upload Policy", "✍️ Manual Entry", "📁 Portfolio", "🗂️ History"])
     
     with tab1:
         st.markdown('<div class="upload-section">', unsafe_allow_html=True)
@@ -389,56 +405,16 @@ def main():
         )
         
         if uploaded_file is not None:
-            # Process uploaded file
-            file_content = uploaded_file.read()
+            # Stream the upload to a temp file; nothing larger than the limit is kept
+            try:
+                upload = spool_upload(uploaded_file)
+            except UploadTooLarge as e:
+                st.error(f"❌ {str(e)}. Please upload a smaller file.")
+                upload = None
             
-            if uploaded_file.type == "application/pdf":
-                # Handle PDF files
-                st.success(f"✅ Successfully uploaded: {uploaded_file.name}")
-                
-                # Extract text from PDF
-                uploaded_file.seek(0)  # Reset file pointer
-                text_content = extract_text_from_pdf(uploaded_file)
-                
-                if text_content:
-                    st.text_area("Extracted Text from PDF", text_content, height=300)
-                    
-                    if st.button("Analyze Policy"):
-                        with st.spinner("AI is analyzing your policy..."):
-                            analysis = analyze_policy_with_gemini(text_content)
-                            if not analysis:
-                                st.warning("JSON analysis failed, trying simple analysis...")
-                                analysis = analyze_policy_simple(text_content)
-                            if analysis:
-                                display_analysis_results(analysis)
-                else:
-                    st.error("❌ Could not extract text from PDF. The file might be scanned or password-protected.")
-                    st.info("💡 Try using the Manual Entry tab instead, or upload a different PDF file.")
-                    
-            elif uploaded_file.type.startswith('image'):
-                # Handle image files
-                image = Image.open(io.BytesIO(file_content))
-                st.image(image, caption="Uploaded Policy Document", use_column_width=True)
-                
-                # Convert image to text (simplified - in real app, use OCR)
-                st.info("🖼️ Image processing feature coming soon. Please use manual entry for now.")
-                
-            else:
-                # Handle text files (TXT, DOC, etc.)
-                try:
-                    text_content = file_content.decode('utf-8')
-                    st.text_area("Extracted Text", text_content, height=200)
-                    
-                    if st.button("Analyze Policy"):
-                        with st.spinner("AI is analyzing your policy..."):
-                            analysis = analyze_policy_with_gemini(text_content)
-                            if not analysis:
-                                st.warning("JSON analysis failed, trying simple analysis...")
-                                analysis = analyze_policy_simple(text_content)
-                            if analysis:
-                                display_analysis_results(analysis)
-                except:
-                    st.error("❌ Could not read file content. Please try manual entry.")
+            if upload is not None:
+                with upload:
+                    display_upload(upload)
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -447,159 +423,679 @@ def main():
         
         st.subheader("Enter Policy Details Manually")
         
-        col1, col2 = st.columns(2)
+        for key, value in MANUAL_DEFAULTS.items():
+            st.session_state.setdefault(key, value)
         
-        with col1:
-            st.subheader("Liability Coverage")
-            bi_per_person = st.number_input("Bodily Injury - Per Person ($)", value=50000, step=1000)
-            bi_per_accident = st.number_input("Bodily Injury - Per Accident ($)", value=100000, step=1000)
-            pd_per_accident = st.number_input("Property Damage - Per Accident ($)", value=25000, step=1000)
-            
-            st.subheader("Deductibles")
-            comp_deductible = st.number_input("Comprehensive Deductible ($)", value=500, step=100)
-            collision_deductible = st.number_input("Collision Deductible ($)", value=500, step=100)
-        
-        with col2:
-            st.subheader("Additional Coverage")
-            um_per_person = st.number_input("Uninsured Motorist - Per Person ($)", value=25000, step=1000)
-            um_per_accident = st.number_input("Uninsured Motorist - Per Accident ($)", value=50000, step=1000)
-            med_payments = st.number_input("Medical Payments ($)", value=1000, step=100)
-            rental_reimbursement = st.number_input("Rental Reimbursement ($/day)", value=30, step=5)
-            
-            st.subheader("Premium")
-            monthly_premium = st.number_input("Monthly Premium ($)", value=150.0, step=10.0)
-            annual_premium = monthly_premium * 12
-        
-        roadside_assistance = st.checkbox("Roadside Assistance", value=True)
-        
-        if st.button("Analyze My Policy"):
-            # Create policy dictionary
-            user_policy = {
-                "liability_coverage": {
-                    "bodily_injury": {"per_person": bi_per_person, "per_accident": bi_per_accident},
-                    "property_damage": {"per_accident": pd_per_accident}
-                },
-                "comprehensive_deductible": comp_deductible,
-                "collision_deductible": collision_deductible,
-                "uninsured_motorist": {"per_person": um_per_person, "per_accident": um_per_accident},
-                "medical_payments": med_payments,
-                "rental_reimbursement": rental_reimbursement,
-                "roadside_assistance": roadside_assistance,
-                "monthly_premium": monthly_premium,
-                "annual_premium": annual_premium
-            }
-            
-            # Create policy text for AI analysis
-            policy_text = f"""
-            Auto Insurance Policy Details:
+        # Edits apply together on submit instead of rerunning the page on every keystroke
+        with st.form("manual_entry"):
+            col1, col2 = st.columns(2)
             
-            Liability Coverage:
-            - Bodily Injury: ${bi_per_person:,} per person, ${bi_per_accident:,} per accident
-            - Property Damage: ${pd_per_accident:,} per accident
-            
-            Deductibles:
-            - Comprehensive: ${comp_deductible:,}
-            - Collision: ${collision_deductible:,}
-            
-            Additional Coverage:
-            - Uninsured Motorist: ${um_per_person:,} per person, ${um_per_accident:,} per accident
-            - Medical Payments: ${med_payments:,}
-            - Rental Reimbursement: ${rental_reimbursement}/day
-            - Roadside Assistance: {'Yes' if roadside_assistance else 'No'}
+            with col1:
+                st.subheader("Liability Coverage")
+                bi_per_person = st.number_input("Bodily Injury - Per Person ($)", step=1000, key='bi_per_person')
+                bi_per_accident = st.number_input("Bodily Injury - Per Accident ($)", step=1000, key='bi_per_accident')
+                pd_per_accident = st.number_input("Property Damage - Per Accident ($)", step=1000, key='pd_per_accident')
+                
+                st.subheader("Deductibles")
+                comp_deductible = st.number_input("Comprehensive Deductible ($)", step=100, key='comp_deductible')
+                collision_deductible = st.number_input("Collision Deductible ($)", step=100, key='collision_deductible')
             
-            Premium:
-            - Monthly: ${monthly_premium:.2f}
-            - Annual: ${annual_premium:.2f}
-            """
+            with col2:
+                st.subheader("Additional Coverage")
+                um_per_person = st.number_input("Uninsured Motorist - Per Person ($)", step=1000, key='um_per_person')
+                um_per_accident = st.number_input("Uninsured Motorist - Per Accident ($)", step=1000,
+                                                  key='um_per_accident')
+                med_payments = st.number_input("Medical Payments ($)", step=100, key='med_payments')
+                rental_reimbursement = st.number_input("Rental Reimbursement ($/day)", step=5,
+                                                       key='rental_reimbursement')
+                
+                st.subheader("Premium")
+                monthly_premium = st.number_input("Monthly Premium ($)", step=10.0, key='monthly_premium')
+                annual_premium = monthly_premium * 12
+                state = st.selectbox("State", ["Not specified"] + sorted(get_benchmarks().states().values()),
+                                     key='manual_state',
+                                     help="Compare against this state's benchmarks instead of US averages")
             
-            with st.spinner("AI is analyzing your policy..."):
-                analysis = analyze_policy_with_gemini(policy_text)
-                if not analysis:
-                    st.warning("JSON analysis failed, trying simple analysis...")
-                    analysis = analyze_policy_simple(policy_text)
-                if analysis:
-                    display_analysis_results(analysis, user_policy)
+            roadside_assistance = st.checkbox("Roadside Assistance", key='roadside_assistance')
+            st.form_submit_button("Update Policy")
+        
+        # Built on every run so a running analysis is found again after reruns
+        user_policy = {
+            "liability_coverage": {
+                "bodily_injury": {"per_person": bi_per_person, "per_accident": bi_per_accident},
+                "property_damage": {"per_accident": pd_per_accident}
+            },
+            "comprehensive_deductible": comp_deductible,
+            "collision_deductible": collision_deductible,
+            "uninsured_motorist": {"per_person": um_per_person, "per_accident": um_per_accident},
+            "medical_payments": med_payments,
+            "rental_reimbursement": rental_reimbursement,
+            "roadside_assistance": roadside_assistance,
+            "monthly_premium": monthly_premium,
+            "annual_premium": annual_premium
+        }
+        if state != "Not specified":
+            user_policy["state"] = state
+        
+        # Create policy text for AI analysis
+        policy_text = f"""
+        Auto Insurance Policy Details:
+        
+        Liability Coverage:
+        - Bodily Injury: ${bi_per_person:,} per person, ${bi_per_accident:,} per accident
+        - Property Damage: ${pd_per_accident:,} per accident
+        
+        Deductibles:
+        - Comprehensive: ${comp_deductible:,}
+        - Collision: ${collision_deductible:,}
+        
+        Additional Coverage:
+        - Uninsured Motorist: ${um_per_person:,} per person, ${um_per_accident:,} per accident
+        - Medical Payments: ${med_payments:,}
+        - Rental Reimbursement: ${rental_reimbursement}/day
+        - Roadside Assistance: {'Yes' if roadside_assistance else 'No'}
+        
+        Premium:
+        - Monthly: ${monthly_premium:.2f}
+        - Annual: ${annual_premium:.2f}
+        """
+        if "state" in user_policy:
+            policy_text += f"State: {state}\n"
+        
+        if st.toggle("🔀 What-if simulator", key='what_if',
+                     help="Score other liability limits and deductibles instantly, without calling Gemini"):
+            display_what_if(user_policy)
+        
+        if quick_score_mode():
+            display_quick_score(user_policy)
+            display_comparison_charts(user_policy)
+        else:
+            if st.button("Analyze My Policy"):
+                start_analysis(policy_text, source="manual")
+            display_analysis_job(policy_text, user_policy)
         
         st.markdown('</div>', unsafe_allow_html=True)
-
-def display_analysis_results(analysis, user_policy=None):
-    """Display the AI analysis results"""
-    st.markdown('<div class="analysis-section">', unsafe_allow_html=True)
     
-    st.subheader("🤖 AI Analysis Results")
-    
-    # Simple overall score display
-    if 'overall_score' in analysis:
-        score = analysis['overall_score']
-        st.metric("Overall Policy Score", f"{score}/10")
-        st.progress(score/10)
-    
-    # Policy analysis
-    if 'policy_analysis' in analysis:
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>Coverage Adequacy</h4>
-                <p>{analysis['policy_analysis'].get('coverage_adequacy', 'N/A')}</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>Cost Effectiveness</h4>
-                <p>{analysis['policy_analysis'].get('cost_effectiveness', 'N/A')}</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h4>Risk Level</h4>
-                <p>{analysis['policy_analysis'].get('risk_level', 'N/A')}</p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    # Comparison charts
-    if user_policy:
-        st.subheader("📊 Comparison with US Averages")
-        fig_premium, fig_coverage = create_comparison_charts(user_policy, US_AVERAGES)
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.plotly_chart(fig_premium, use_container_width=True)
-        with col2:
-            st.plotly_chart(fig_coverage, use_container_width=True)
-    
-    # Detailed comparison
-    if 'comparison' in analysis:
-        st.subheader("📈 Detailed Comparison")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("**Liability Adequacy:**")
-            st.write(analysis['comparison'].get('liability_adequacy', 'N/A'))
+    with tab3:
+        st.markdown('<div class="upload-section">', unsafe_allow_html=True)
+        
+        st.subheader("Analyze a Book of Policies")
+        
+        uploaded_files = st.file_uploader(
+            f"Choose up to {PORTFOLIO_CONFIG['max_files']} policy documents",
+            type=['pdf', 'txt', 'png', 'jpg', 'jpeg'],
+            accept_multiple_files=True,
+            key='portfolio_files',
+            help="Every file is extracted, scored and analyzed; results appear as each one finishes"
+        )
+        
+        if uploaded_files:
+            if len(uploaded_files) > PORTFOLIO_CONFIG['max_files']:
+                st.warning(f"⚠️ Only the first {PORTFOLIO_CONFIG['max_files']} files will be analyzed.")
+            use_ai = not quick_score_mode()
+            label = "Analyze Portfolio" if use_ai else "Score Portfolio"
+            if st.button(label, help=None if use_ai else "Quick score mode: no AI calls"):
+                start_portfolio(uploaded_files, use_ai)
+        display_portfolio_job()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab4:
+        st.subheader("Past Analyses")
+        if history_enabled():
+            display_history()
+        else:
+            st.info("💡 Analysis history is turned off (HISTORY_CONFIG or POLICYAI_DISABLE_HISTORY).")
+
+@st.cache_resource
+def get_shared_extraction_memo():
+    """Extracted upload text shared by every session in this process"""
+    return ExtractionMemo(EXTRACTION_MEMO_CONFIG['shared_max_bytes'])
+
+def extract_upload_text(upload, source, extract):
+    """Text of a spooled upload, extracted once per content hash and reused on every rerun"""
+    if 'extraction_memo' not in st.session_state:
+        st.session_state['extraction_memo'] = ExtractionMemo()
+    shared = get_shared_extraction_memo() if EXTRACTION_MEMO_CONFIG['shared'] else None
+    return st.session_state['extraction_memo'].extract(f"{source}:{upload.sha256}", extract,
+                                                       warn=st.warning, shared=shared)
+
+def editable_text(label, text, upload, height):
+    """Extracted text, shown as a capped preview unless the user opts in to correcting it before analysis"""
+    editable = len(text) <= UPLOAD_CONFIG['editable_chars']
+    if not (editable and st.toggle("✏️ Edit extracted text", key=f"edit_{upload.sha256}",
+                                   help="Show the full text to fix extraction mistakes; only the parts you "
+                                        "change are analyzed again. Turning this off discards the edits.")):
+        st.text_area(label, preview_text(text), height=height, disabled=True)
+        return text
+    return st.text_area(label, text, height=height, key=f"edited_{upload.sha256}")
+
+def display_upload(upload):
+    """Extract, preview and offer analysis for a spooled upload"""
+    if upload.type == "application/pdf":
+        # Handle PDF files
+        st.success(f"✅ Successfully uploaded: {upload.name}")
+        
+        # Extracted once per content hash; worker processes open the spooled file themselves
+        text_content = extract_upload_text(upload, "pdf", lambda warn: extract_text_from_pdf(upload.path, warn=warn))
+        
+        if text_content:
+            text_content = editable_text("Extracted Text from PDF", text_content, upload, 300)
+            user_policy = display_extracted_policy(text_content)
+            display_analysis_options(text_content, user_policy)
+        else:
+            st.error("❌ Could not extract text from PDF. The file might be scanned or password-protected.")
+            from ocr import ocr_available
+            if not ocr_available():
+                st.info("💡 Scanned PDFs need OCR: install Tesseract and `pytesseract` to read them.")
+            st.info("💡 Try using the Manual Entry tab instead, or upload a different PDF file.")
             
-            st.markdown("**Deductible Analysis:**")
-            st.write(analysis['comparison'].get('deductible_analysis', 'N/A'))
+    elif upload.type.startswith('image'):
+        # Handle image files; PIL and the OCR stack load on the first image upload
+        from PIL import Image
+        from ocr import ocr_available
+        
+        with Image.open(upload.path) as image:
+            st.image(image, caption="Uploaded Policy Document", use_column_width=True)
+        
+        if not ocr_available():
+            st.info("🖼️ Reading images needs OCR: install Tesseract and `pytesseract`, or use manual entry for now.")
+            return
+        
+        # Recognized text is memoized by content hash, so reruns do not repeat the OCR
+        with st.spinner("Reading text from image..."):
+            text_content = extract_upload_text(upload, "image", lambda warn: extract_text_from_image(upload.path))
+        
+        if text_content:
+            text_content = editable_text("Text Recognized from Image", text_content, upload, 300)
+            user_policy = display_extracted_policy(text_content)
+            display_analysis_options(text_content, user_policy)
+        else:
+            st.error("❌ No text could be recognized in this image.")
+            st.info("💡 Try a sharper, well-lit photo, or use the Manual Entry tab instead.")
         
-        with col2:
-            st.markdown("**Premium Analysis:**")
-            st.write(analysis['comparison'].get('premium_analysis', 'N/A'))
+    else:
+        # Handle text files (TXT, DOC, etc.)
+        try:
+            text_content = upload.read_text()
+            text_content = editable_text("Extracted Text", text_content, upload, 200)
+            user_policy = display_extracted_policy(text_content)
+            display_analysis_options(text_content, user_policy)
+        except:
+            st.error("❌ Could not read file content. Please try manual entry.")
+
+def display_analysis_options(text_content, user_policy):
+    """Analyze button and job results, or the instant quick score in quick mode"""
+    if quick_score_mode():
+        if has_numeric_fields(user_policy):
+            display_quick_score(user_policy)
+        else:
+            st.info("💡 No limits, deductibles or premium found to score. Switch to AI analysis instead.")
+        return
+    if st.button("Analyze Policy"):
+        start_analysis(text_content, incremental=True, source="upload")
+    display_analysis_job(text_content)
+
+def quick_score_mode():
+    return st.session_state.get('analysis_mode') == QUICK_SCORE_MODES[1]
+
+def _limits_label(limits):
+    return "/".join(f"${limit // 1000:,}K" for limit in limits)
+
+def apply_what_if(limits, deductible):
+    """Copy a simulated configuration into the Manual Entry form (runs before the form is drawn)"""
+    st.session_state.update(bi_per_person=limits[0], bi_per_accident=limits[1], pd_per_accident=limits[2],
+                            comp_deductible=deductible, collision_deductible=deductible)
+
+def display_what_if(user_policy):
+    """Score every liability/deductible combination and each field's sensitivity locally; no AI call"""
+    # NumPy and Plotly load with the first simulation, not at startup
+    from scoring import sensitivity, sweep
+    from charts import create_what_if_heatmap
+    
+    limits = [tuple(row) for row in WHAT_IF_CONFIG['liability_limits']]
+    deductibles = WHAT_IF_CONFIG['deductibles']
+    factors = WHAT_IF_CONFIG['sensitivity_factors']
+    with metrics.span("what_if"):
+        result = sweep(user_policy, [(LIABILITY_FIELDS, limits), (DEDUCTIBLE_FIELDS, [(d, d) for d in deductibles])])
+        fields, scores = sensitivity(user_policy, [1.0] + factors)
+    
+    entered = user_policy['liability_coverage']
+    entered_limits = (entered['bodily_injury']['per_person'], entered['bodily_injury']['per_accident'],
+                      entered['property_damage']['per_accident'])
+    current = None
+    if entered_limits in limits and user_policy['comprehensive_deductible'] == user_policy['collision_deductible'] \
+            and user_policy['comprehensive_deductible'] in deductibles:
+        current = (limits.index(entered_limits), deductibles.index(user_policy['comprehensive_deductible']))
     
-    # Simple Recommendations
-    if 'recommendations' in analysis:
-        st.subheader("💡 AI Recommendations")
-        for i, rec in enumerate(analysis['recommendations'], 1):
-            st.markdown(f"{i}. {rec}")
+    st.subheader("🔀 What-If Simulator")
+    st.plotly_chart(create_what_if_heatmap(result['overall'], [_limits_label(row) for row in limits],
+                                           [f"${d:,}" for d in deductibles], current),
+                    use_container_width=True)
+    st.caption("Premium is held at the entered amount; a real quote would change with the coverage.")
     
-    # Simple Risk Assessment
-    if 'risk_assessment' in analysis:
-        st.subheader("⚠️ Risk Assessment")
-        st.write(analysis['risk_assessment'])
+    st.markdown("**Score change when one field is scaled**")
+    st.dataframe([{
+        "Field": policy_analyzer.BENCHMARK_LABELS.get(field, field),
+        **{f"×{factor:g}": round(float(row[i + 1] - row[0]), 2) for i, factor in enumerate(factors)}
+    } for field, row in zip(fields, scores)], hide_index=True, use_container_width=True)
     
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        chosen_limits = st.selectbox("Liability limits", limits, format_func=_limits_label, key='what_if_limits')
+    with col2:
+        chosen_deductible = st.selectbox("Deductible", deductibles, format_func=lambda d: f"${d:,}",
+                                         key='what_if_deductible')
+    with col3:
+        st.button("Use in form", on_click=apply_what_if, args=(chosen_limits, chosen_deductible),
+                  help="Fill the form with this configuration; only analyzing it calls Gemini")
+
+def display_quick_score(user_policy):
+    """Deterministic score against US (or state) averages; no AI call"""
+    # NumPy loads with the first quick score, not at startup
+    from scoring import quick_score
+    with metrics.span("quick_score"):
+        score = quick_score(user_policy)
+    
+    st.subheader("⚡ Quick Score")
+    if score['overall_score'] is None:
+        st.info("💡 Not enough policy details to score.")
+        return score
+    render_overall_score(score['overall_score'])
+    st.caption(f"Compared with {score['state'] + ' medians' if score['state'] else 'US averages'} · 5/10 is average")
+    
+    groups = [(name, value) for name, value in score['groups'].items() if value is not None]
+    for column, (name, value) in zip(st.columns(len(groups)), groups):
+        with column:
+            st.metric(name.replace('_', ' ').title(), f"{value}/10")
+    
+    below = [name.replace('_', ' ') for name, field in score['fields'].items() if not field['adequate']]
+    if below:
+        st.warning(f"Below average: {', '.join(below)}")
+    return score
+
+def debug_panel_enabled():
+    """Sidebar timings are opt-in: config flag, POLICYAI_DEBUG=1 or ?debug=1 in the URL"""
+    return (METRICS_CONFIG['debug_panel'] or os.getenv('POLICYAI_DEBUG', '') in ('1', 'true')
+            or st.query_params.get('debug') in ('1', 'true'))
+
+def display_debug_panel():
+    """Per-stage latency, token and fallback figures for this server process"""
+    snapshot = metrics.registry.snapshot()
+    with st.expander("🔧 Performance", expanded=False):
+        if not snapshot['spans']:
+            st.caption("No timings recorded yet.")
+            return
+        st.table([{
+            "stage": span['stage'] + (f" ({', '.join(span['labels'].values())})" if span['labels'] else ""),
+            "count": span['count'],
+            "p50 ms": round(span['p50'] * 1000, 1),
+            "p95 ms": round(span['p95'] * 1000, 1)
+        } for span in snapshot['spans']])
+        models = sorted({counter['labels'].get('model') for counter in snapshot['counters']
+                         if counter['name'] == 'generate_calls'})
+        st.caption(f"Tokens: {metrics.registry.counter('tokens', direction='prompt'):,} prompt / "
+                   f"{metrics.registry.counter('tokens', direction='response'):,} response")
+        st.caption(f"Fallback rate: {snapshot['fallback_rate']:.0%}"
+                   + (f" · models: {', '.join(models)}" if models else ""))
+        router_stats = model.snapshot() if isinstance(model, ModelRouter) else []
+        if router_stats:
+            st.table([{
+                "model": row['model'] + (" (stream)" if row['stream'] else ""),
+                "calls": row['calls'],
+                "p50 ms": None if row['p50_s'] is None else round(row['p50_s'] * 1000, 1),
+                "p95 ms": None if row['p95_s'] is None else round(row['p95_s'] * 1000, 1),
+                "errors": f"{row['error_rate']:.0%}",
+                "demoted": "yes" if row['demoted'] else ""
+            } for row in router_stats])
+        if 'extraction_memo' in st.session_state:
+            memo = st.session_state['extraction_memo'].stats()
+            st.caption(f"Extraction memo: {memo['entries']} files, {memo['bytes'] / 1024:,.0f} KB, "
+                       f"{memo['hits']} hits / {memo['misses']} misses")
+        if metrics.registry.prometheus_file:
+            st.caption(f"Prometheus metrics: `{metrics.registry.prometheus_file}`")
+
+def display_comparison_charts(user_policy):
+    """Display premium and coverage charts against US averages, or state medians when the state is known"""
+    state = get_benchmarks().state_name(user_policy.get('state'))
+    if state:
+        st.subheader(f"📊 Comparison with {state} Medians")
+        benchmark, label = get_benchmarks().medians(state), f"{state} Median"
+    else:
+        st.subheader("📊 Comparison with US Averages")
+        benchmark, label = US_AVERAGES, "US Average"
+    # Plotly figure classes load on the first chart, not at startup
+    from charts import create_comparison_charts
+    with metrics.span("charts"):
+        fig_premium, fig_coverage = create_comparison_charts(user_policy, benchmark, label)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(fig_premium, use_container_width=True)
+    with col2:
+        st.plotly_chart(fig_coverage, use_container_width=True)
+
+def display_extracted_policy(text_content):
+    """Chart the numeric fields found in uploaded text; no AI call needed"""
+    user_policy = extract_policy_fields(text_content)
+    if has_numeric_fields(user_policy):
+        display_comparison_charts(user_policy)
+    return user_policy
+
+def render_overall_score(score):
+    """Simple overall score display"""
+    st.metric("Overall Policy Score", f"{score}/10")
+    st.progress(score/10)
+
+def render_policy_analysis(policy_analysis):
+    """Coverage, cost and risk cards"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>Coverage Adequacy</h4>
+            <p>{policy_analysis.get('coverage_adequacy', 'N/A')}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>Cost Effectiveness</h4>
+            <p>{policy_analysis.get('cost_effectiveness', 'N/A')}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h4>Risk Level</h4>
+            <p>{policy_analysis.get('risk_level', 'N/A')}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_comparison(comparison):
+    """Detailed comparison"""
+    st.subheader("📈 Detailed Comparison")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Liability Adequacy:**")
+        st.write(comparison.get('liability_adequacy', 'N/A'))
+        
+        st.markdown("**Deductible Analysis:**")
+        st.write(comparison.get('deductible_analysis', 'N/A'))
+    
+    with col2:
+        st.markdown("**Premium Analysis:**")
+        st.write(comparison.get('premium_analysis', 'N/A'))
+
+def render_recommendations(recommendations):
+    """Simple Recommendations"""
+    st.subheader("💡 AI Recommendations")
+    for i, rec in enumerate(recommendations, 1):
+        st.markdown(f"{i}. {rec}")
+
+def render_risk_assessment(risk_assessment):
+    """Simple Risk Assessment"""
+    st.subheader("⚠️ Risk Assessment")
+    st.write(risk_assessment)
+
+# Result sections in display order; comparison charts sit between the
+# policy analysis cards and the detailed comparison
+SECTION_RENDERERS = {
+    'overall_score': render_overall_score,
+    'policy_analysis': render_policy_analysis,
+    'comparison': render_comparison,
+    'recommendations': render_recommendations,
+    'risk_assessment': render_risk_assessment
+}
+
+def create_results_layout(user_policy=None):
+    """Reserve one placeholder per result section so they can be filled in any order"""
+    st.markdown('<div class="analysis-section">', unsafe_allow_html=True)
+    slots = {'header': st.empty()}
+    for section in SECTION_RENDERERS:
+        slots[section] = st.empty()
+        if section == 'policy_analysis':
+            slots['charts'] = st.container()
+    if user_policy:
+        with slots['charts']:
+            display_comparison_charts(user_policy)
+    return slots
+
+def render_section(slots, section, value):
+    """Fill (or refill) one result section"""
+    slots['header'].subheader("🤖 AI Analysis Results")
+    with slots[section].container():
+        SECTION_RENDERERS[section](value)
+
+def display_analysis_results(analysis, user_policy=None, slots=None):
+    """Display the AI analysis results"""
+    slots = slots or create_results_layout(user_policy)
+    for section in SECTION_RENDERERS:
+        if section in analysis:
+            render_section(slots, section, analysis[section])
     st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment(run_every=JOB_CONFIG['poll_interval'])
+def poll_analysis_job(job_id, user_policy=None):
+    """Live view of a running job; refreshes itself until the job finishes"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if job.status == QUEUED:
+            st.info(f"⏳ Waiting for a free analyzer ({get_job_manager().queue_position(job)} ahead)...")
+        else:
+            st.info(f"🤖 AI is analyzing your policy... ({job.elapsed():.0f}s)")
+    with col2:
+        if st.button("Cancel", key=f"cancel_{job_id}"):
+            job.cancel()
+            st.rerun()
+    display_analysis_results(job.progress(), user_policy)
+
+@st.fragment(run_every=JOB_CONFIG['poll_interval'])
+def poll_portfolio_job(job_id):
+    """Live progress of a portfolio run; records are listed as they finish"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    
+    progress = job.progress()
+    records, total = progress.get('records', []), progress.get('total')
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if job.status == QUEUED:
+            st.info(f"⏳ Waiting for a free analyzer ({get_job_manager().queue_position(job)} ahead)...")
+        else:
+            st.progress(len(records) / total if total else 0.0,
+                        text=f"Analyzed {len(records)} of {total or '?'} files ({job.elapsed():.0f}s)")
+    with col2:
+        if st.button("Cancel", key=f"cancel_{job_id}"):
+            job.cancel()
+            st.rerun()
+    if records:
+        from portfolio import portfolio_frame
+        st.dataframe(portfolio_frame(records), hide_index=True, use_container_width=True)
+
+def display_portfolio_job():
+    """This session's latest portfolio run: live while running, then the aggregate dashboard"""
+    job_id = st.session_state.get('portfolio_job')
+    job = get_job_manager().get(job_id) if job_id else None
+    if job is None:
+        return None
+    if not job.finished:
+        poll_portfolio_job(job.id)
+        return None
+    if job.status == FAILED:
+        st.error(f"Portfolio analysis failed: {job.error}")
+        return None
+    
+    # A cancelled run still shows the files that finished
+    records = job.result if job.status != CANCELLED else job.progress().get('records', [])
+    if job.status == CANCELLED:
+        st.info(f"Portfolio analysis cancelled after {len(records)} files.")
+    if records:
+        display_portfolio_results(records)
+    return records
+
+def display_portfolio_results(records):
+    """Aggregate table, headline metrics and distribution charts for a portfolio"""
+    # pandas and the portfolio charts load with the first portfolio, not at startup
+    from portfolio import portfolio_frame, portfolio_summary
+    from charts import create_portfolio_charts
+    frame = portfolio_frame(records)
+    summary = portfolio_summary(frame)
+    
+    st.subheader("📁 Portfolio Summary")
+    cols = st.columns(5)
+    cols[0].metric("Policies Analyzed", f"{summary['analyzed']}/{summary['files']}")
+    cols[1].metric("Mean AI Score", "N/A" if summary['mean_ai_score'] is None else f"{summary['mean_ai_score']:.1f}/10")
+    cols[2].metric("Mean Quick Score",
+                   "N/A" if summary['mean_quick_score'] is None else f"{summary['mean_quick_score']:.1f}/10")
+    cols[3].metric("Median Monthly Premium",
+                   "N/A" if summary['median_monthly_premium'] is None else f"${summary['median_monthly_premium']:,.0f}")
+    cols[4].metric("Total Annual Premium",
+                   "N/A" if summary['total_annual_premium'] is None else f"${summary['total_annual_premium']:,.0f}")
+    if summary['failed']:
+        st.warning(f"⚠️ {summary['failed']} file(s) could not be analyzed; see the error column.")
+    
+    st.dataframe(frame, hide_index=True, use_container_width=True)
+    st.download_button("Download CSV", frame.to_csv(index=False), file_name="portfolio.csv", mime="text/csv")
+    
+    with metrics.span("charts", kind="portfolio"):
+        fig_scores, fig_limits, fig_premiums = create_portfolio_charts(frame)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.plotly_chart(fig_scores, use_container_width=True)
+    with col2:
+        st.plotly_chart(fig_limits, use_container_width=True)
+    with col3:
+        st.plotly_chart(fig_premiums, use_container_width=True)
+
+HISTORY_PERIODS = {"All time": None, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "Last year": 365}
+
+def history_filters():
+    """Filter widgets for the History tab, as AnalysisHistory query arguments"""
+    col1, col2, col3, col4 = st.columns(4)
+    policy_number = col1.text_input("Policy number starts with", key='history_policy_number').strip()
+    state = col2.selectbox("State", ["All states"] + sorted(get_benchmarks().states().values()),
+                           key='history_state')
+    min_score, max_score = col3.slider("Score", 0.0, 10.0, (0.0, 10.0), step=0.5, key='history_score')
+    days = HISTORY_PERIODS[col4.selectbox("Analyzed", list(HISTORY_PERIODS), key='history_period')]
+    return {
+        "policy_number": policy_number or None,
+        "state": None if state == "All states" else state,
+        "min_score": min_score if min_score > 0 else None,
+        "max_score": max_score if max_score < 10 else None,
+        "since": time.time() - days * 24 * 60 * 60 if days else None
+    }
+
+def turn_history_page(cursor=None):
+    """Next page from cursor, the (created_at, id) of the last row shown; previous page when None"""
+    pages = st.session_state['history_pages']
+    if cursor is None:
+        if len(pages) > 1:
+            pages.pop()
+    else:
+        pages.append(cursor)
+
+def display_history():
+    """Filtered, paged list of stored analyses with trends; nothing here calls the model"""
+    history = get_analysis_history()
+    filters = history_filters()
+    # Keyset pages: a stack of cursors, restarted whenever the filters change
+    filter_key = (filters['policy_number'], filters['state'], filters['min_score'], filters['max_score'],
+                  st.session_state.get('history_period'))
+    if st.session_state.get('history_filter_key') != filter_key:
+        st.session_state['history_filter_key'] = filter_key
+        st.session_state['history_pages'] = [None]
+    
+    total = history.count(**filters)
+    if not total:
+        st.info("💡 No analyses match. Every AI analysis you run is saved here.")
+        return
+    
+    bucket = st.radio("Trend by", list(BUCKETS), horizontal=True, key='history_bucket',
+                      index=list(BUCKETS).index(HISTORY_CONFIG['trend_bucket']))
+    from charts import create_history_charts
+    states = history.by_state(**filters)
+    with metrics.span("charts", kind="history"):
+        fig_trend, fig_states = create_history_charts(history.trends(bucket, **filters), states)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(fig_trend, use_container_width=True)
+    with col2:
+        st.plotly_chart(fig_states, use_container_width=True)
+    
+    pages = st.session_state['history_pages']
+    rows = history.page(before=pages[-1], **filters)
+    page_size = HISTORY_CONFIG['page_size']
+    first = (len(pages) - 1) * page_size
+    st.caption(f"Showing {first + 1:,}–{first + len(rows):,} of {total:,} analyses, newest first")
+    benchmarks = get_benchmarks()
+    st.dataframe([{
+        "ID": row['id'],
+        "Analyzed": time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created_at'])),
+        "Policy Number": row['policy_number'],
+        "State": benchmarks.state_name(row['state']) if row['state'] else None,
+        "Score": row['score'],
+        "Risk Level": row['risk_level'],
+        "Monthly Premium": row['monthly_premium'],
+        "Source": row['source'],
+        "Model": row['model']
+    } for row in rows], hide_index=True, use_container_width=True)
+    
+    col1, col2, _ = st.columns([1, 1, 6])
+    col1.button("← Newer", on_click=turn_history_page, disabled=len(pages) == 1, key='history_newer')
+    last = rows[-1] if rows else None
+    col2.button("Older →", on_click=turn_history_page,
+                args=((last['created_at'], last['id']),) if last else None,
+                disabled=last is None or first + len(rows) >= total, key='history_older')
+    
+    labels = {row['id']: f"#{row['id']} · {row['policy_number'] or 'No policy number'} · "
+                         + ("N/A" if row['score'] is None else f"{row['score']:g}/10") for row in rows}
+    record_id = st.selectbox("Open an analysis", [None] + list(labels), key='history_record',
+                             format_func=lambda option: "Choose a record" if option is None else labels[option])
+    if record_id is not None:
+        record = history.get(record_id)
+        if record is not None:
+            display_analysis_results(record['analysis'], record['fields'] if has_numeric_fields(record['fields'])
+                                     else None)
+
+def display_analysis_job(policy_text, user_policy=None):
+    """Show this session's analysis of policy_text: live while running, then the results"""
+    job = current_analysis_job(policy_text)
+    if job is None:
+        return None
+    if not job.finished:
+        poll_analysis_job(job.id, user_policy)
+        return None
+    
+    for warning in job.warnings:
+        st.warning(str(warning))
+        if getattr(warning, 'hint', None):
+            st.info(warning.hint)
+    if job.status == CANCELLED:
+        st.info("Analysis cancelled.")
+        return None
+    if job.status == FAILED:
+        st.error(str(job.error) if isinstance(job.error, AnalysisError) else f"Analysis failed: {job.error}")
+        if getattr(job.error, 'hint', None):
+            st.info(job.error.hint)
+        return None
+    
+    analysis = job.result
+    display_analysis_results(analysis, user_policy)
+    prompt_stats = analysis.get('prompt_stats')
+    if prompt_stats and prompt_stats.get('original_tokens'):
+        st.caption(f"Prompt compaction saved {prompt_stats['tokens_saved']:,} of "
+                   f"{prompt_stats['original_tokens']:,} policy tokens"
+                   + (f" · analyzed in {prompt_stats['chunks']} sections" if 'chunks' in prompt_stats else ""))
+    return analysis
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Headless batch analyzer for Auto Policy AI Analyzer
+Analyzes a directory or glob of policy files and streams results to JSONL
+
+Usage:
+    python batch_analyze.py "test_policy_*.txt" sample_policy.txt
+    python batch_analyze.py policies/ -o results.jsonl --concurrency 8 --rpm 120
+
+Inputs already recorded as "ok" in the output file are skipped, so an
+interrupted run can simply be started again.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from analysis_cache import AnalysisCache, cache_enabled
+from call_guard import configure_call_guard
+from config import BATCH_CONFIG
+from metrics import increment, registry, span
+from policy_analyzer import (
+    AnalysisError, ResponseParseError, analyze_policy_simple, analyze_policy_with_gemini,
+    cached_analysis, extract_text_from_file
+)
+
+
+def collect_inputs(patterns, extensions=None):
+    """Expand directories and globs into a sorted, de-duplicated list of policy files"""
+    extensions = tuple(extensions or BATCH_CONFIG['input_extensions'])
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in files:
+                    if name.lower().endswith(extensions):
+                        paths.add(os.path.abspath(os.path.join(root, name)))
+        else:
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path) and path.lower().endswith(extensions):
+                    paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def load_completed(output_path):
+    """Sources already analyzed successfully in an existing output file"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a partially written last line from an interrupted run
+            if record.get('status') == 'ok':
+                completed.add(record.get('source'))
+    return completed
+
+
+def trim_partial_line(output_path):
+    """Cut a partially written last line left by an interrupted run, so appends start on a fresh line"""
+    try:
+        f = open(output_path, 'rb+')
+    except FileNotFoundError:
+        return
+    with f:
+        size = end = f.seek(0, os.SEEK_END)
+        # Walk back from the end in blocks to the last newline
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+
+
+def analyze_text(text, model, model_name, cache=None):
+    """(analysis, kind) for extracted text; falls back to the simple analysis like the web app"""
+    try:
+        return cached_analysis("analysis", text, model_name,
+                               lambda policy_text: analyze_policy_with_gemini(policy_text, model), cache), "analysis"
+    except ResponseParseError:
+        increment("fallbacks", reason="parse")
+        return cached_analysis("simple", text, model_name,
+                               lambda policy_text: analyze_policy_simple(policy_text, model), cache), "simple"
+
+
+async def analyze_file(path, model, model_name, extract_pool, model_pool, semaphore, cache=None):
+    """Extract and analyze one policy file; always returns a JSONL record"""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    record = {"source": path, "model": model_name}
+
+    try:
+        # Already inside a worker process, so extract pages serially there; the span
+        # is timed here because spans recorded in worker processes are not collected
+        with span("extract", source="batch"):
+            text = await loop.run_in_executor(extract_pool, partial(extract_text_from_file, path, parallel=False))
+    except Exception as e:
+        text = None
+        record["error"] = f"Could not read file: {str(e)}"
+    if not text:
+        record.setdefault("error", "Could not extract text from file")
+        record.update(status="error", elapsed_seconds=round(time.perf_counter() - started, 3))
+        return record
+
+    try:
+        # Cache lookups and model calls both block, so they run on the model pool; the shared
+        # CallGuard paces the calls themselves
+        async with semaphore:
+            analysis, kind = await loop.run_in_executor(model_pool, analyze_text, text, model, model_name, cache)
+        record.update(status="ok", analysis_kind=kind, analysis=analysis)
+    except AnalysisError as e:
+        record.update(status="error", error=str(e))
+    except Exception as e:
+        # One bad file must not abort the rest of the batch
+        record.update(status="error", error=f"Analysis failed: {type(e).__name__}: {str(e)}")
+
+    record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def run_batch(paths, output_path, model, model_name, concurrency=None,
+                    extract_workers=None, cache=None, progress=None):
+    """Analyze paths concurrently, appending each record to output_path as it finishes
+
+    Gemini calls are rate limited by the process-wide CallGuard (see main's --rpm).
+    """
+    concurrency = concurrency or BATCH_CONFIG['concurrency']
+    extract_workers = extract_workers or BATCH_CONFIG['extract_workers']
+
+    semaphore = asyncio.Semaphore(concurrency)
+    trim_partial_line(output_path)
+
+    summary = {"ok": 0, "error": 0}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as model_pool, \
+            ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            open(output_path, 'a', encoding='utf-8') as out:
+        tasks = [
+            asyncio.create_task(analyze_file(path, model, model_name, extract_pool, model_pool,
+                                             semaphore, cache))
+            for path in paths
+        ]
+        for finished in asyncio.as_completed(tasks):
+            record = await finished
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary[record["status"]] += 1
+            if progress:
+                progress(record, summary)
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Analyze auto policy files in bulk with Gemini")
+    parser.add_argument("inputs", nargs="+", help="Policy files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default=BATCH_CONFIG['output'],
+                        help="JSONL file to append results to (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONFIG['concurrency'],
+                        help="Maximum in-flight Gemini calls (default: %(default)s)")
+    parser.add_argument("--rpm", type=float,
+                        help="Gemini requests per minute across all workers, 0 for unlimited "
+                             "(default: CALL_CONFIG)")
+    parser.add_argument("--extract-workers", type=int, default=BATCH_CONFIG['extract_workers'],
+                        help="Processes used for text extraction (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the analysis cache")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Re-analyze inputs already present in the output file")
+    parser.add_argument("--metrics", metavar="FILE", default=registry.prometheus_file,
+                        help="Write stage timings and token counts in Prometheus text format")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    paths = collect_inputs(args.inputs)
+    if not args.no_resume:
+        completed = load_completed(args.output)
+        skipped = [path for path in paths if path in completed]
+        paths = [path for path in paths if path not in completed]
+        if skipped:
+            print(f"Skipping {len(skipped)} input(s) already in {args.output}")
+    if not paths:
+        print("Nothing to analyze.")
+        return 0
+
+    from dotenv import load_dotenv
+    import google.generativeai as genai
+    from model_selection import ModelSelector
+
+    load_dotenv()
+    api_key = os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        print("❌ Please set your GOOGLE_API_KEY in the .env file", file=sys.stderr)
+        return 1
+    genai.configure(api_key=api_key)
+    selector = ModelSelector()
+    model = selector.get_model()
+    if model is None:
+        print("❌ Could not connect to any Gemini model.", file=sys.stderr)
+        return 1
+
+    if args.rpm is not None:
+        # Every Gemini call, retries included, takes a slot from the shared guard
+        configure_call_guard(requests_per_minute=args.rpm or 10 ** 9, burst=None if args.rpm else 10 ** 6)
+    cache = AnalysisCache() if cache_enabled() and not args.no_cache else None
+
+    def progress(record, summary):
+        status = "✅" if record["status"] == "ok" else "❌"
+        done = summary["ok"] + summary["error"]
+        print(f"{status} [{done}/{len(paths)}] {record['source']} ({record['elapsed_seconds']}s)")
+
+    print(f"Analyzing {len(paths)} policies with {selector.model_name} → {args.output}")
+    summary = asyncio.run(run_batch(
+        paths, args.output, model, selector.model_name,
+        concurrency=args.concurrency, extract_workers=args.extract_workers, cache=cache, progress=progress
+    ))
+    print(f"Done: {summary['ok']} succeeded, {summary['error']} failed")
+    if args.metrics:
+        registry.write_prometheus(args.metrics)
+    return 0 if summary["error"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+State benchmark data for Auto Policy AI Analyzer
+Loads per-state distributions of every coverage field from the bundled data
+file and answers "what percentile is this value in state X" by binary search
+over each field's sorted percentile points
+"""
+
+import json
+import threading
+from bisect import bisect_left, bisect_right
+
+from config import BENCHMARK_CONFIG
+
+US = "US"
+
+# Field name in the data file -> path into the policy dict
+FIELD_PATHS = {
+    "bodily_injury_per_person": ("liability_coverage", "bodily_injury", "per_person"),
+    "bodily_injury_per_accident": ("liability_coverage", "bodily_injury", "per_accident"),
+    "property_damage": ("liability_coverage", "property_damage", "per_accident"),
+    "uninsured_per_person": ("uninsured_motorist", "per_person"),
+    "uninsured_per_accident": ("uninsured_motorist", "per_accident"),
+    "medical_payments": ("medical_payments",),
+    "rental_reimbursement": ("rental_reimbursement",),
+    "comprehensive_deductible": ("comprehensive_deductible",),
+    "collision_deductible": ("collision_deductible",),
+    "monthly_premium": ("monthly_premium",),
+    "annual_premium": ("annual_premium",),
+}
+
+_load_lock = threading.Lock()
+_benchmarks = None
+
+
+def _field_value(policy, path):
+    for key in path:
+        policy = policy.get(key) if isinstance(policy, dict) else None
+    return policy if isinstance(policy, (int, float)) and not isinstance(policy, bool) else None
+
+
+def _interpolate(points, percentiles, value, search):
+    index = search(points, value)
+    if index == 0:
+        return percentiles[0]
+    if index == len(points):
+        return percentiles[-1]
+    low, high = points[index - 1], points[index]
+    return percentiles[index - 1] + (value - low) / (high - low) * (percentiles[index] - percentiles[index - 1])
+
+
+class BenchmarkData:
+    """In-memory index of (state, field) -> sorted percentile points"""
+
+    def __init__(self, data):
+        self.version = data["version"]
+        self.source = data.get("source", "")
+        self.percentiles = tuple(data["percentiles"])
+        self.fields = tuple(data["fields"])
+        self._names = {}
+        self._index = {}
+        self._lookup = {}
+        for code, state in data["states"].items():
+            self._names[code] = state["name"]
+            self._lookup[code.lower()] = self._lookup[state["name"].lower()] = code
+            for field, points in zip(self.fields, state["values"]):
+                if list(points) != sorted(points) or len(points) != len(self.percentiles):
+                    raise ValueError(f"Benchmark points for {code}/{field} must be {len(self.percentiles)} sorted values")
+                self._index[(code, field)] = tuple(points)
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or BENCHMARK_CONFIG['path'], "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def states(self):
+        """{code: name} for every state in the data, without the US row"""
+        return {code: name for code, name in self._names.items() if code != US}
+
+    def normalize_state(self, state):
+        """State code for a name or postal code (any case); None if unknown"""
+        if not isinstance(state, str):
+            return None
+        code = self._lookup.get(state.strip().lower())
+        return None if code == US else code
+
+    def state_name(self, state):
+        code = self.normalize_state(state)
+        return self._names[code] if code else None
+
+    def distribution(self, state, field):
+        """Sorted percentile points for field in state, falling back to the US row"""
+        code = self.normalize_state(state) or US
+        return self._index.get((code, field)) or self._index[(US, field)]
+
+    def median(self, state, field):
+        return self.distribution(state, field)[self.percentiles.index(50)]
+
+    def percentile(self, state, field, value):
+        """Percentile (0-100) of value in state's distribution
+
+        Values tied with several points (e.g. the state minimum) get the middle
+        of the tied range; between points the percentile is interpolated.
+        """
+        points = self.distribution(state, field)
+        low = _interpolate(points, self.percentiles, value, bisect_left)
+        high = _interpolate(points, self.percentiles, value, bisect_right)
+        return (low + high) / 2
+
+    def policy_percentiles(self, policy, state=None):
+        """{field: percentile} for every benchmarked field the policy has"""
+        state = state or policy.get("state")
+        percentiles = {}
+        for field in self.fields:
+            value = _field_value(policy, FIELD_PATHS[field])
+            if value is not None:
+                percentiles[field] = self.percentile(state, field, value)
+        return percentiles
+
+    def medians(self, state=None):
+        """Medians for state (or the US) nested like US_AVERAGES, for charts and scoring"""
+        medians = {}
+        for field in self.fields:
+            path = FIELD_PATHS[field]
+            target = medians
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = self.median(state, field)
+        return medians
+
+
+def get_benchmarks():
+    """Shared BenchmarkData, loaded from BENCHMARK_CONFIG['path'] on first use"""
+    global _benchmarks
+    if _benchmarks is None:
+        with _load_lock:
+            if _benchmarks is None:
+                _benchmarks = BenchmarkData.load()
+    return _benchmarks
@@ -0,0 +1,4 @@
+"""
+Benchmarks for Auto Policy AI Analyzer
+Run from the repository root, e.g. python -m benchmarks.bench_extractor
+"""
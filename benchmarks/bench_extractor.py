@@ -0,0 +1,41 @@
+"""
+Throughput benchmark for the rule-based policy field extractor
+Usage: python -m benchmarks.bench_extractor [--iterations N]
+"""
+
+import argparse
+import glob
+import time
+
+from policy_extractor import extract_policy_fields
+
+POLICY_FILES = ['sample_policy.txt'] + sorted(glob.glob('test_policy_*.txt'))
+
+
+def run(iterations):
+    texts = [open(path, 'r', encoding='utf-8').read() for path in POLICY_FILES]
+    # Warm up so regex compilation and imports are not timed
+    for text in texts:
+        extract_policy_fields(text)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            extract_policy_fields(text)
+    elapsed = time.perf_counter() - started
+    policies = iterations * len(texts)
+    return {"policies": policies, "seconds": elapsed, "policies_per_second": policies / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    result = run(args.iterations)
+    print(f"Extracted {result['policies']} policies in {result['seconds']:.3f}s "
+          f"({result['policies_per_second']:,.0f} policies/sec)")
+
+
+if __name__ == "__main__":
+    main()
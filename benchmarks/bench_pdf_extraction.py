@@ -0,0 +1,74 @@
+"""
+Benchmark for the PDF extraction engine on synthetic multi-hundred-page PDFs
+Compares the original serial pdfplumber + PyPDF2 loop with pdf_extraction.extract_pdf
+Usage: python -m benchmarks.bench_pdf_extraction [--pages N]
+"""
+
+import argparse
+import io
+import time
+
+import PyPDF2
+import pdfplumber
+
+from benchmarks.synthetic_pdf import make_pdf
+from pdf_extraction import extract_pdf, warm_up_pool
+
+
+def legacy_extract(pdf_bytes):
+    """The pre-engine implementation: serial pages, += concatenation, full PyPDF2 re-read"""
+    text = ""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    if text.strip():
+        return text.strip()
+    text = ""
+    for page in PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages:
+        page_text = page.extract_text()
+        if page_text:
+            text += page_text + "\n"
+    return text.strip() or None
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def run(pages):
+    text_pdf = make_pdf(pages)
+    image_pdf = make_pdf(pages, with_text=False)
+    # Start worker processes outside the timed region, as a long-running app would
+    warm_up_pool()
+
+    results = {}
+    for label, pdf_bytes in (("text", text_pdf), ("image_only", image_pdf)):
+        legacy_text, legacy_seconds = timed(legacy_extract, pdf_bytes)
+        engine, engine_seconds = timed(extract_pdf, pdf_bytes)
+        if label == "text":
+            assert engine["text"] == legacy_text, "engine output differs from legacy output"
+        results[label] = {
+            "pages": pages,
+            "legacy_seconds": round(legacy_seconds, 3),
+            "engine_seconds": round(engine_seconds, 3),
+            "speedup": round(legacy_seconds / engine_seconds, 1) if engine_seconds else None
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    args = parser.parse_args()
+
+    for label, result in run(args.pages).items():
+        print(f"{label:>10}: {result['pages']} pages  legacy {result['legacy_seconds']:.2f}s  "
+              f"engine {result['engine_seconds']:.2f}s  ({result['speedup']}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Stage-level benchmark for the analysis pipeline, with a local fake Gemini backend
+Times PDF/text extraction, prompt construction, the model call, JSON parsing,
+field extraction, chart building and chart rendering for each bundled
+test_policy_*.txt and a set of generated PDFs, plus the Streamlit app end to end.
+Results are written as JSON and compared against a saved baseline.
+Usage: python -m benchmarks.bench_pipeline [--repeat N] [--latency S] [--save-baseline]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from benchmarks.synthetic_pdf import make_pdf
+from call_guard import configure_call_guard
+from charts import clear_chart_cache, create_comparison_charts
+from config import MODEL_CONFIG, US_AVERAGES
+from fake_model import FakeGenerativeModel
+from pdf_extraction import warm_up_pool
+from policy_analyzer import (build_analysis_prompt, extract_text_from_file, extract_text_from_pdf, generate,
+                             parse_analysis_response, prepare_policy_text)
+from policy_extractor import extract_policy_fields
+
+STAGES = ("extract", "prompt", "model_call", "parse", "fields", "charts", "render", "pipeline")
+APP_STAGES = ("app_rerun", "app_analysis")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def load_inputs(pdf_pages):
+    """[(name, kind, source)] for the bundled text policies and generated PDFs"""
+    inputs = [(os.path.basename(path), "text", path) for path in sorted(glob.glob("test_policy_*.txt"))]
+    inputs.extend((f"synthetic_{pages}p.pdf", "pdf", make_pdf(pages)) for pages in pdf_pages)
+    return inputs
+
+
+class StageTimer:
+    """Collects wall-clock samples per stage"""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        yield
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+
+
+def run_pipeline(kind, source, model, timer):
+    """One pass through every stage, the way the app processes an upload"""
+    with timer.stage("pipeline"):
+        with timer.stage("extract"):
+            if kind == "pdf":
+                text = extract_text_from_pdf(source)
+            else:
+                text = extract_text_from_file(source)
+        with timer.stage("prompt"):
+            _, compacted, _ = prepare_policy_text(text)
+            prompt = build_analysis_prompt(compacted)
+        with timer.stage("model_call"):
+            response = generate(model, prompt)
+        with timer.stage("parse"):
+            analysis = parse_analysis_response(response.text)
+        with timer.stage("fields"):
+            user_policy = extract_policy_fields(text)
+        # Time a cold build; re-displays of the same policy come from the figure cache
+        clear_chart_cache()
+        with timer.stage("charts"):
+            figures = create_comparison_charts(user_policy, US_AVERAGES)
+        with timer.stage("render"):
+            # st.plotly_chart sends each figure to the browser as JSON
+            payload = [figure.to_json() for figure in figures]
+    return analysis, payload
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "samples": len(ordered)
+    }
+
+
+def bench_stages(inputs, repeat, latency):
+    model = FakeGenerativeModel(latency=latency)
+    per_input = {}
+    overall = StageTimer()
+    for name, kind, source in inputs:
+        # One untimed pass so imports, regex compilation and worker start-up are excluded
+        run_pipeline(kind, source, model, StageTimer())
+        timer = StageTimer()
+        for _ in range(repeat):
+            run_pipeline(kind, source, model, timer)
+        per_input[name] = {stage: summarize(timer.samples[stage]) for stage in STAGES}
+        for stage in STAGES:
+            overall.samples.setdefault(stage, []).extend(timer.samples[stage])
+    return {stage: summarize(overall.samples[stage]) for stage in STAGES}, per_input
+
+
+def bench_app(repeat, latency):
+    """Script rerun time and click-to-results time for the Streamlit app, using the fake model"""
+    import google.generativeai as genai
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    # Every analysis should reach the model rather than the on-disk cache
+    os.environ["POLICYAI_DISABLE_CACHE"] = "1"
+    MODEL_CONFIG["probe_cache_file"] = os.path.join(tempfile.mkdtemp(prefix="policyai-bench-"), "probe.json")
+    genai.GenerativeModel = lambda model_name, **kwargs: FakeGenerativeModel(model_name=model_name, latency=latency)
+
+    timer = StageTimer()
+    app = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    for run in range(repeat):
+        with timer.stage("app_rerun"):
+            app.run()
+        # Vary the premium so each click starts a fresh analysis job
+        premium = [widget for widget in app.number_input if widget.label == "Monthly Premium ($)"][0]
+        premium.set_value(150.0 + run + 1)
+        with timer.stage("app_analysis"):
+            [button for button in app.button if button.label == "Analyze My Policy"][0].click().run()
+            deadline = time.perf_counter() + 60
+            while not any(metric.label == "Overall Policy Score" for metric in app.metric):
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("analysis did not finish within 60s")
+                time.sleep(0.01)
+                app.run()
+    return {stage: summarize(timer.samples[stage]) for stage in APP_STAGES}
+
+
+def _compare_summary(current, previous, tolerance, noise_ms):
+    if not previous or not previous["median_ms"]:
+        return False
+    ratio = current["median_ms"] / previous["median_ms"]
+    current["baseline_median_ms"] = previous["median_ms"]
+    current["ratio"] = round(ratio, 2)
+    return ratio > 1 + tolerance and current["median_ms"] - previous["median_ms"] > noise_ms
+
+
+def compare(results, baseline, tolerance, noise_ms):
+    """Stages (overall and per input) whose median is slower than the baseline beyond tolerance and noise_ms"""
+    regressions = [stage for stage, current in results["stages"].items()
+                   if _compare_summary(current, baseline.get("stages", {}).get(stage), tolerance, noise_ms)]
+    for name, stages in results["inputs"].items():
+        previous_stages = baseline.get("inputs", {}).get(name, {})
+        regressions.extend(f"{name}/{stage}" for stage, current in stages.items()
+                           if _compare_summary(current, previous_stages.get(stage), tolerance, noise_ms))
+    return regressions
+
+
+def run(repeat=5, latency=0.0, pdf_pages=(5, 60), app_runs=3):
+    # The shared guard is sized to the real quota; the fake backend has none
+    configure_call_guard(requests_per_minute=10 ** 9, burst=10 ** 6)
+    warm_up_pool()
+    stages, per_input = bench_stages(load_inputs(pdf_pages), repeat, latency)
+    if app_runs:
+        stages.update(bench_app(app_runs, latency))
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "model_latency_s": latency,
+            "pdf_pages": list(pdf_pages)
+        },
+        "stages": stages,
+        "inputs": per_input
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per input")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model latency in seconds")
+    parser.add_argument("--pdf-pages", type=int, nargs="*", default=[5, 60], help="generated PDF sizes")
+    parser.add_argument("--app-runs", type=int, default=3, help="Streamlit app runs (0 skips the app stages)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a regression")
+    parser.add_argument("--noise-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.latency, args.pdf_pages, args.app_runs)
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.noise_ms)
+    results["regressions"] = regressions
+
+    with open(args.baseline if args.save_baseline else args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for stage, summary in results["stages"].items():
+        against = f"  ({summary['ratio']}x baseline)" if "ratio" in summary else ""
+        flag = "  REGRESSION" if stage in regressions else ""
+        print(f"{stage:>13}: median {summary['median_ms']:9.2f} ms  p95 {summary['p95_ms']:9.2f} ms{against}{flag}")
+    if regressions:
+        print(f"Regressions against {args.baseline}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Throughput benchmark for the quick-score engine
+Scores generated policies three ways: pre-built arrays (the vectorized core),
+a list of policy dicts (what batch callers pass) and one quick_score() call
+per policy, and reports policies scored per second for each.
+Usage: python -m benchmarks.bench_scoring [--policies N] [--repeat N]
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_data import get_benchmarks
+from scoring import average_matrix, policy_matrix, quick_score, score_arrays, score_policies
+
+# Postal codes, full names in any case, and unknown states
+STATES = list(get_benchmarks().states()) + ["Louisiana", "new york", "Puerto Rico", None]
+
+
+def make_policies(count, seed=0):
+    """Random but plausible policies, some with missing fields and states"""
+    rng = random.Random(seed)
+    policies = []
+    for _ in range(count):
+        per_person = rng.choice([15000, 25000, 50000, 100000, 250000])
+        policy = {
+            "liability_coverage": {
+                "bodily_injury": {"per_person": per_person, "per_accident": per_person * 2},
+                "property_damage": {"per_accident": rng.choice([10000, 25000, 50000, 100000])}
+            },
+            "comprehensive_deductible": rng.choice([0, 250, 500, 1000]),
+            "collision_deductible": rng.choice([250, 500, 1000, 2000]),
+            "medical_payments": rng.choice([1000, 5000, 10000]),
+            "monthly_premium": round(rng.uniform(60, 400), 2),
+            "state": rng.choice(STATES)
+        }
+        if rng.random() < 0.7:
+            policy["uninsured_motorist"] = {"per_person": per_person, "per_accident": per_person * 2}
+        policies.append(policy)
+    return policies
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(count=100000, repeat=3):
+    policies = make_policies(count)
+    values = policy_matrix(policies)
+    averages = average_matrix([policy["state"] for policy in policies])
+    # The per-policy loop is far slower; a slice is enough for its rate
+    loop_count = min(count, 5000)
+    timings = {
+        "arrays": (count, _best(lambda: score_arrays(values, averages), repeat)),
+        "dicts": (count, _best(lambda: score_policies(policies), repeat)),
+        "per_policy": (loop_count, _best(lambda: [quick_score(policy) for policy in policies[:loop_count]], repeat))
+    }
+    return {name: {"policies": scored, "seconds": round(seconds, 4), "policies_per_second": round(scored / seconds)}
+            for name, (scored, seconds) in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--policies", type=int, default=100000, help="generated policies to score")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method; the fastest is reported")
+    args = parser.parse_args()
+
+    for name, result in run(args.policies, args.repeat).items():
+        print(f"{name:>10}: {result['policies_per_second']:>12,} policies/s "
+              f"({result['policies']:,} in {result['seconds'] * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Load test for the HTTP analysis service with a local fake Gemini backend
+Starts the service in-process on a free port, fires requests from many
+concurrent clients and reports throughput, latency percentiles and how many
+requests were refused with 429. Every request carries a distinct policy so
+the analysis cache never answers.
+Usage: python -m benchmarks.bench_service [--requests N] [--clients N] [--latency S]
+                                          [--concurrency N] [--queue-limit N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+
+from analysis_service import create_app
+from call_guard import configure_call_guard
+from config import SERVICE_CONFIG
+from fake_model import FakeGenerativeModel
+from metrics import quantile
+
+
+async def _load(requests, clients, latency, concurrency, queue_limit):
+    model = FakeGenerativeModel(latency=latency)
+    server = TestServer(create_app(model, model.model_name, None, concurrency, queue_limit))
+    await server.start_server()
+    pending = list(range(requests))
+    latencies, statuses = [], {}
+
+    async def client(session):
+        while pending:
+            number = pending.pop()
+            started = time.perf_counter()
+            async with session.post(server.make_url("/v1/analyze"),
+                                    data=f"Policy {number}: Bodily Injury $50,000 per person") as response:
+                await response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if response.status == 200:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*[client(session) for _ in range(clients)])
+    seconds = time.perf_counter() - started
+    await server.close()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "seconds": round(seconds, 3),
+        "ok_per_second": round(statuses.get(200, 0) / seconds, 1),
+        "p50_ms": round(quantile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p95_ms": round(quantile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "statuses": statuses
+    }
+
+
+def run(requests=200, clients=16, latency=0.05, concurrency=None, queue_limit=None):
+    # The shared guard is sized to the real quota; the fake backend has none
+    configure_call_guard(requests_per_minute=10 ** 9, burst=10 ** 6)
+    return asyncio.run(_load(requests, clients, latency, concurrency or SERVICE_CONFIG['concurrency'],
+                             SERVICE_CONFIG['queue_limit'] if queue_limit is None else queue_limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests to send in total")
+    parser.add_argument("--clients", type=int, default=16,
+                        help="concurrent clients; more than concurrency + queue limit get 429s")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake model takes per call")
+    parser.add_argument("--concurrency", type=int, help="service concurrency (default: SERVICE_CONFIG)")
+    parser.add_argument("--queue-limit", type=int, help="service queue limit (default: SERVICE_CONFIG)")
+    args = parser.parse_args()
+
+    result = run(args.requests, args.clients, args.latency, args.concurrency, args.queue_limit)
+    print(f"{result['requests']} requests in {result['seconds']:.2f}s: {result['ok_per_second']} ok/s, "
+          f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+    print("statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(result['statuses'].items())))
+
+
+if __name__ == "__main__":
+    main()
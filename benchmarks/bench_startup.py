@@ -0,0 +1,112 @@
+"""
+Startup benchmark for app.py based on python -X importtime
+Imports the app in a fresh interpreter with no API key, so the script stops
+right after its imports, and reports import time, the slowest direct
+imports, and whether heavy dependencies stayed deferred until first use.
+The same run with those dependencies imported eagerly shows the gain.
+Usage: python -m benchmarks.bench_startup [--runs N] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Loaded on first use (a PDF, an image, a chart, a quick score, a portfolio), never at startup. PIL and
+# plotly.graph_objects are not listed because Streamlit itself imports them.
+DEFERRED_MODULES = ("pandas", "plotly.express", "plotly.subplots", "pdfplumber", "PyPDF2", "pypdfium2",
+                    "pdf_extraction", "ocr", "charts", "scoring", "numpy", "portfolio")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "startup_baseline.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return entries
+
+
+def measure(code):
+    """Import timings for one fresh interpreter running code"""
+    # An empty key makes app.py stop right after its imports instead of probing Gemini
+    env = dict(os.environ, GOOGLE_API_KEY="", PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    entries = parse_importtime(completed.stderr)
+    top_level = [entry for entry in entries if entry[3] == 0]
+    # Depth 1 is what app.py (and the interpreter's own start-up modules) import directly
+    direct = [entry for entry in entries if entry[3] == 1]
+    return {
+        "import_ms": sum(cumulative for _, _, cumulative, _ in top_level) / 1000,
+        "modules": {name for name, _, _, _ in entries},
+        "slowest": sorted(((name, cumulative / 1000) for name, _, cumulative, _ in direct),
+                          key=lambda item: -item[1])[:8]
+    }
+
+
+def run(runs=5):
+    lazy = [measure("import app") for _ in range(runs)]
+    eager_code = "import app; " + "; ".join(f"import {module}" for module in DEFERRED_MODULES)
+    eager = [measure(eager_code) for _ in range(runs)]
+    lazy_ms = statistics.median(sample["import_ms"] for sample in lazy)
+    eager_ms = statistics.median(sample["import_ms"] for sample in eager)
+    return {
+        "runs": runs,
+        "import_ms": round(lazy_ms, 1),
+        "eager_import_ms": round(eager_ms, 1),
+        "deferred_ms": round(eager_ms - lazy_ms, 1),
+        "modules_loaded": len(lazy[0]["modules"]),
+        "eagerly_loaded": sorted(module for module in DEFERRED_MODULES if module in lazy[0]["modules"]),
+        "slowest": [[name, round(ms, 1)] for name, ms in lazy[0]["slowest"]]
+    }
+
+
+def check(results, baseline, tolerance):
+    """Problems that should fail the run: deferred modules loaded, or a slower startup"""
+    problems = [f"{module} is imported at startup" for module in results["eagerly_loaded"]]
+    if baseline and results["import_ms"] > baseline["import_ms"] * (1 + tolerance):
+        problems.append(f"startup imports took {results['import_ms']} ms "
+                        f"(baseline {baseline['import_ms']} ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a regression")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    print(f"app.py startup imports: {results['import_ms']:.0f} ms ({results['modules_loaded']} modules)")
+    print(f"with heavy modules eager: {results['eager_import_ms']:.0f} ms "
+          f"→ {results['deferred_ms']:.0f} ms deferred to first use")
+    for name, ms in results["slowest"]:
+        print(f"  {ms:8.1f} ms  {name}")
+    problems = check(results, baseline, args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic PDF generator for benchmarks and tests
+Writes minimal single-font PDFs so no PDF authoring library is needed
+"""
+
+POLICY_LINES = [
+    "AUTO INSURANCE POLICY - DECLARATIONS PAGE {page}",
+    "Policy Number: SYN-{page:05d}",
+    "LIABILITY COVERAGE:",
+    "- Bodily Injury: $50,000 per person / $100,000 per accident",
+    "- Property Damage: $25,000 per accident",
+    "COLLISION COVERAGE:",
+    "- Deductible: $500",
+    "COMPREHENSIVE COVERAGE:",
+    "- Deductible: $500",
+    "PREMIUM INFORMATION:",
+    "- Monthly Premium: $150.00",
+    "This page is part of a synthetic declarations packet used for benchmarking.",
+]
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(page_count, with_text=True, lines=None):
+    """Return the bytes of a PDF with page_count pages
+
+    With with_text=False the pages only draw rectangles, which looks like a
+    scanned, image-only document to text extractors.
+    """
+    lines = lines or POLICY_LINES
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(1, page_count + 1):
+        if with_text:
+            ops = ["BT /F1 11 Tf 14 TL 72 740 Td"]
+            ops.extend(f"({_escape(line.format(page=page))}) Tj T*" for line in lines)
+            ops.append("ET")
+        else:
+            ops = [f"0.{page % 9} g 72 {100 + (page % 50) * 10} 400 200 re f"]
+        stream = "\n".join(ops).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode()
+
+    out = [b"%PDF-1.4\n"]
+    offsets = []
+    position = len(out[0])
+    for number, body in enumerate(objects, 1):
+        chunk = b"%d 0 obj\n" % number + body + b"\nendobj\n"
+        offsets.append(position)
+        out.append(chunk)
+        position += len(chunk)
+    xref = [b"xref\n0 %d\n" % (len(objects) + 1), b"0000000000 65535 f \n"]
+    xref.extend(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.extend(xref)
+    out.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, position))
+    return b"".join(out)
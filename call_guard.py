@@ -0,0 +1,227 @@
+"""
+Shared guard around Gemini calls for Auto Policy AI Analyzer
+Every generate_content call in the process passes through one CallGuard: a
+token bucket keeps the request rate within quota, retryable errors (429,
+timeouts, 5xx) are retried with jittered exponential backoff, each attempt
+has a timeout, and a circuit breaker fails fast while the backend is down.
+"""
+
+import random
+import threading
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+from config import CALL_CONFIG
+from metrics import increment
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Quota, overload and timeout errors; anything else (bad request, blocked prompt) fails at once
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    TimeoutError,
+    ConnectionError,
+)
+
+_guard_lock = threading.Lock()
+_guard = None
+
+
+class CircuitOpenError(Exception):
+    """Calls are being refused because the backend kept failing"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Gemini is temporarily unavailable after repeated failures; "
+                         f"retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class RateLimitExceeded(Exception):
+    """No request slot freed up within the acquire timeout"""
+
+
+def is_retryable(error):
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class TokenBucket:
+    """Allows rate calls per second on average, with bursts of up to burst calls"""
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise seconds until one will be"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Block until a token is taken; False if that would take longer than timeout"""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if deadline is not None and self.clock() + wait > deadline:
+                return False
+            self.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; one trial call is let through after reset_seconds"""
+
+    def __init__(self, failure_threshold, reset_seconds, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_in(self):
+        return max(0.0, self._opened_at + self.reset_seconds - self.clock())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and not self.retry_in():
+                self.state = HALF_OPEN
+                return
+            # Open, or half-open with the trial call still in flight
+            raise CircuitOpenError(self.retry_in())
+
+    def available(self):
+        """Whether a call would be let through now: closed, or open with the cooldown over"""
+        with self._lock:
+            return self.state == CLOSED or (self.state == OPEN and not self.retry_in())
+
+    def abandon_trial(self):
+        """The half-open trial call ended without an outcome; let the next call try instead"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                # _opened_at is unchanged, so the cooldown is already over
+                self.state = OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    increment("circuit_opened")
+                self.state = OPEN
+                self._opened_at = self.clock()
+
+
+class CallGuard:
+    """Rate limiting, retries, timeouts and circuit breaking for model calls"""
+
+    def __init__(self, requests_per_minute=None, burst=None, max_retries=None, base_delay=None, max_delay=None,
+                 timeout=None, acquire_timeout=None, failure_threshold=None, reset_seconds=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        requests_per_minute = requests_per_minute or CALL_CONFIG['requests_per_minute']
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst or CALL_CONFIG['burst'], clock, sleep)
+        self.breaker = CircuitBreaker(failure_threshold or CALL_CONFIG['failure_threshold'],
+                                      CALL_CONFIG['reset_seconds'] if reset_seconds is None else reset_seconds,
+                                      clock)
+        self.max_retries = CALL_CONFIG['max_retries'] if max_retries is None else max_retries
+        self.base_delay = CALL_CONFIG['base_delay'] if base_delay is None else base_delay
+        self.max_delay = CALL_CONFIG['max_delay'] if max_delay is None else max_delay
+        self.timeout = CALL_CONFIG['timeout'] if timeout is None else timeout
+        self.acquire_timeout = CALL_CONFIG['acquire_timeout'] if acquire_timeout is None else acquire_timeout
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        """Full jitter: uniform over [0, base_delay * 2**attempt], capped at max_delay"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn):
+        """Run fn(timeout) under the guard and return its result
+
+        Raises CircuitOpenError while the breaker is open, RateLimitExceeded
+        when no request slot frees up in time, or fn's last error.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.available():
+                # Fail fast without spending a rate-limit slot
+                raise CircuitOpenError(self.breaker.retry_in())
+            # The slot is taken before the breaker goes half-open, so a trial call never waits on the bucket
+            if not self.bucket.acquire(self.acquire_timeout):
+                increment("rate_limited")
+                raise RateLimitExceeded("Too many analyses in progress; please try again in a moment")
+            self.breaker.before_call()
+            try:
+                result = fn(self.timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The backend answered; the request itself was the problem
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                increment("generate_retries", error=type(e).__name__)
+                self.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Interrupted: no verdict on the backend, so the trial slot is handed back
+                self.breaker.abandon_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def available(self):
+        """False while the breaker refuses calls, including while its trial call is in flight"""
+        return self.breaker.available()
+
+    def status(self):
+        """Breaker state and seconds until the next trial call, for the UI"""
+        return {"state": self.breaker.state, "retry_in": self.breaker.retry_in(),
+                "available": self.breaker.available()}
+
+
+def get_call_guard():
+    """The process-wide CallGuard, created from CALL_CONFIG on first use"""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = CallGuard()
+    return _guard
+
+
+def configure_call_guard(**options):
+    """Replace the process-wide CallGuard, e.g. with a higher rate in front of a fake backend"""
+    global _guard
+    with _guard_lock:
+        _guard = CallGuard(**options)
+    return _guard
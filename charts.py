@@ -0,0 +1,230 @@
+"""
+Comparison charts for Auto Policy AI Analyzer
+Builds every user-vs-benchmark comparison (US averages or a state's medians)
+from one columnar frame without Streamlit. The layout and benchmark traces are
+validated by Plotly once; per-policy figures are cached by a hash of the
+charted values
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from config import CHART_CONFIG, US_AVERAGES
+
+# (panel, bar label, path into the policy dict), one row per compared value
+CHART_FIELDS = (
+    ('premium', 'Monthly Premium', ('monthly_premium',)),
+    ('premium', 'Annual Premium', ('annual_premium',)),
+    ('bodily_injury', 'Per Person', ('liability_coverage', 'bodily_injury', 'per_person')),
+    ('bodily_injury', 'Per Accident', ('liability_coverage', 'bodily_injury', 'per_accident')),
+    ('property_damage', 'Per Accident', ('liability_coverage', 'property_damage', 'per_accident')),
+    ('uninsured_motorist', 'Per Person', ('uninsured_motorist', 'per_person')),
+    ('uninsured_motorist', 'Per Accident', ('uninsured_motorist', 'per_accident')),
+    ('medical_payments', 'Per Person', ('medical_payments',)),
+)
+
+# Coverage panels in make_subplots order (row by row)
+COVERAGE_PANELS = (
+    ('bodily_injury', 'Bodily Injury Coverage'),
+    ('property_damage', 'Property Damage Coverage'),
+    ('uninsured_motorist', 'Uninsured Motorist'),
+    ('medical_payments', 'Medical Payments'),
+)
+
+_DARK_LAYOUT = dict(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#ffffff'),
+    title_font_color='#00d4ff'
+)
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def _field_value(policy, path):
+    for key in path:
+        policy = policy.get(key) if isinstance(policy, dict) else None
+    return policy if isinstance(policy, (int, float)) and not isinstance(policy, bool) else 0
+
+
+def comparison_frame(user_policy, us_averages=None):
+    """Columnar table of every compared value: panel, label, user and us_average columns"""
+    us_averages = us_averages or US_AVERAGES
+    return {
+        "panel": [panel for panel, _, _ in CHART_FIELDS],
+        "label": [label for _, label, _ in CHART_FIELDS],
+        "user": [_field_value(user_policy, path) for _, _, path in CHART_FIELDS],
+        "us_average": [_field_value(us_averages, path) for _, _, path in CHART_FIELDS],
+    }
+
+
+def chart_key(frame, label):
+    """Hash of every charted value; policies that chart the same share cached figures"""
+    payload = json.dumps([frame["user"], frame["us_average"], label])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _panel_rows(frame, panel):
+    rows = [index for index, name in enumerate(frame["panel"]) if name == panel]
+    return [frame["label"][index] for index in rows], rows
+
+
+@lru_cache(maxsize=4)
+def _figure_templates(us_key):
+    """Validated premium and coverage figure specs holding only the benchmark traces"""
+    frame = json.loads(us_key)
+    label = frame["benchmark_label"]
+    secondary = CHART_CONFIG['colors']['secondary']
+
+    labels, rows = _panel_rows(frame, 'premium')
+    fig_premium = go.Figure()
+    fig_premium.add_trace(go.Bar(name=label, x=labels, y=[frame["us_average"][i] for i in rows],
+                                 marker_color=secondary, legendgroup='us'))
+    fig_premium.update_layout(title='Premium Comparison', barmode='group',
+                              height=CHART_CONFIG['height'], **_DARK_LAYOUT)
+
+    fig_coverage = make_subplots(rows=2, cols=2, subplot_titles=[title for _, title in COVERAGE_PANELS],
+                                 specs=[[{"type": "bar"}, {"type": "bar"}], [{"type": "bar"}, {"type": "bar"}]])
+    for position, (panel, _) in enumerate(COVERAGE_PANELS):
+        labels, rows = _panel_rows(frame, panel)
+        fig_coverage.add_trace(go.Bar(name=label, x=labels, y=[frame["us_average"][i] for i in rows],
+                                      marker_color=secondary, legendgroup='us', showlegend=position == 0),
+                               row=position // 2 + 1, col=position % 2 + 1)
+    fig_coverage.update_layout(height=600, showlegend=True, barmode='group', **_DARK_LAYOUT)
+    return fig_premium.to_dict(), fig_coverage.to_dict()
+
+
+def figure_specs(frame, label='US Average'):
+    """Plain-dict (premium, coverage) figure specs for a comparison frame"""
+    us_key = json.dumps(dict({key: frame[key] for key in ("panel", "label", "us_average")}, benchmark_label=label))
+    premium, coverage = copy.deepcopy(_figure_templates(us_key))
+    primary = CHART_CONFIG['colors']['primary']
+
+    # User traces go first so "Your Policy" leads the legend and each bar group
+    labels, rows = _panel_rows(frame, 'premium')
+    premium["data"].insert(0, {"type": "bar", "name": "Your Policy", "x": labels,
+                               "y": [frame["user"][i] for i in rows],
+                               "marker": {"color": primary}, "legendgroup": "user"})
+    user_traces = []
+    for position, (panel, _) in enumerate(COVERAGE_PANELS):
+        labels, rows = _panel_rows(frame, panel)
+        axis = str(position + 1) if position else ''
+        user_traces.append({"type": "bar", "name": "Your Policy", "x": labels,
+                            "y": [frame["user"][i] for i in rows], "marker": {"color": primary},
+                            "legendgroup": "user", "showlegend": position == 0,
+                            "xaxis": f"x{axis}", "yaxis": f"y{axis}"})
+    coverage["data"] = [trace for pair in zip(user_traces, coverage["data"]) for trace in pair]
+    return premium, coverage
+
+
+def create_comparison_charts(user_policy, us_averages=None, label='US Average'):
+    """Premium and coverage comparison figures, cached by policy hash
+
+    us_averages may be any policy-shaped benchmark (e.g. a state's medians),
+    named label in the legend. The returned figures are shared between
+    callers and must not be mutated.
+    """
+    frame = comparison_frame(user_policy, us_averages)
+    key = chart_key(frame, label)
+    with _figure_cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+
+    # Specs are assembled from the validated templates, so Plotly's per-property
+    # validation (the bulk of figure construction time) can be skipped
+    figures = tuple(go.Figure(spec, _validate=False) for spec in figure_specs(frame, label))
+    with _figure_cache_lock:
+        _figure_cache[key] = figures
+        while len(_figure_cache) > CHART_CONFIG['cache_size']:
+            _figure_cache.popitem(last=False)
+    return figures
+
+
+def clear_chart_cache():
+    with _figure_cache_lock:
+        _figure_cache.clear()
+
+
+def create_portfolio_charts(frame):
+    """Score, limit and premium distributions across a portfolio table (see portfolio.py)"""
+    colors = CHART_CONFIG['colors']
+    analyzed = frame[frame["status"] == "ok"]
+
+    fig_scores = go.Figure()
+    for column, name, color in (("ai_score", "AI Score", colors['primary']),
+                                ("quick_score", "Quick Score", colors['warning'])):
+        values = analyzed[column].dropna()
+        if len(values):
+            fig_scores.add_trace(go.Histogram(x=values, name=name, marker_color=color, opacity=0.75,
+                                              xbins=dict(start=0, end=10.5, size=1)))
+    fig_scores.update_layout(title='Policy Scores', barmode='overlay', xaxis_title='Score (0-10)',
+                             yaxis_title='Policies', height=CHART_CONFIG['height'], **_DARK_LAYOUT)
+
+    fig_limits = go.Figure()
+    for column, name in (("bi_per_person", "Bodily Injury / Person"), ("property_damage", "Property Damage"),
+                         ("um_per_person", "Uninsured Motorist / Person")):
+        fig_limits.add_trace(go.Box(y=analyzed[column].dropna(), name=name, boxpoints='all',
+                                    marker_color=colors['primary']))
+    fig_limits.update_layout(title='Coverage Limits', yaxis_title='Limit ($)', showlegend=False,
+                             height=CHART_CONFIG['height'], **_DARK_LAYOUT)
+
+    fig_premiums = go.Figure(go.Histogram(x=analyzed["monthly_premium"].dropna(), name='Monthly Premium',
+                                          marker_color=colors['secondary'], nbinsx=20))
+    fig_premiums.add_vline(x=US_AVERAGES['monthly_premium'], line_dash='dash', line_color=colors['success'],
+                           annotation_text='US Average')
+    fig_premiums.update_layout(title='Monthly Premiums', xaxis_title='Premium ($)', yaxis_title='Policies',
+                               height=CHART_CONFIG['height'], **_DARK_LAYOUT)
+    return fig_scores, fig_limits, fig_premiums
+
+
+def create_what_if_heatmap(scores, row_labels, column_labels, current=None):
+    """Heatmap of overall scores over a liability-by-deductible sweep (see scoring.sweep)
+
+    current is the (row, column) of the entered configuration, marked when it is on the grid.
+    """
+    fig = go.Figure(go.Heatmap(z=scores, x=column_labels, y=row_labels, zmin=0, zmax=10,
+                               colorscale='RdYlGn', colorbar=dict(title='Score'),
+                               text=[[f"{score:.1f}" for score in row] for row in scores],
+                               texttemplate='%{text}', hovertemplate='%{y} · %{x}<br>Score %{z:.1f}<extra></extra>'))
+    if current is not None:
+        fig.add_trace(go.Scatter(x=[column_labels[current[1]]], y=[row_labels[current[0]]], mode='markers',
+                                 marker=dict(symbol='square-open', size=40, color=CHART_CONFIG['colors']['primary'],
+                                             line=dict(width=3)),
+                                 name='Current', hoverinfo='skip'))
+    fig.update_layout(title='Overall Score by Liability Limits and Deductible', xaxis_title='Deductible',
+                      yaxis_title='Liability limits', showlegend=False, height=CHART_CONFIG['height'],
+                      **_DARK_LAYOUT)
+    return fig
+
+
+def create_history_charts(trends, states):
+    """Analyses and mean score per period, and mean score by state (see AnalysisHistory.trends/by_state)"""
+    colors = CHART_CONFIG['colors']
+    periods = [row['period'] for row in trends]
+
+    fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_trend.add_trace(go.Bar(x=periods, y=[row['analyses'] for row in trends], name='Analyses',
+                               marker_color=colors['secondary'], opacity=0.6), secondary_y=False)
+    fig_trend.add_trace(go.Scatter(x=periods, y=[row['mean_score'] for row in trends], name='Mean Score',
+                                   mode='lines+markers', line=dict(color=colors['primary'])), secondary_y=True)
+    fig_trend.update_yaxes(title_text='Analyses', secondary_y=False)
+    fig_trend.update_yaxes(title_text='Mean score (0-10)', range=[0, 10], secondary_y=True)
+    fig_trend.update_layout(title='Analyses Over Time', xaxis_type='category', height=CHART_CONFIG['height'],
+                            **_DARK_LAYOUT)
+
+    known = [row for row in states if row['state']]
+    fig_states = go.Figure(go.Bar(x=[row['state'] for row in known], y=[row['mean_score'] for row in known],
+                                  text=[f"{row['analyses']}" for row in known], marker_color=colors['primary'],
+                                  hovertemplate='%{x}: mean score %{y:.1f}<br>%{text} analyses<extra></extra>'))
+    fig_states.update_layout(title='Mean Score by State', xaxis_title='State', yaxis_title='Mean score (0-10)',
+                             yaxis_range=[0, 10], height=CHART_CONFIG['height'], **_DARK_LAYOUT)
+    return fig_trend, fig_states
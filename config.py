@@ -3,6 +3,8 @@ Configuration file for Auto Policy AI Analyzer
 Customize US averages and other settings here
 """
 
+import os
+
 # US Average Auto Insurance Data
 # Source: National Association of Insurance Commissioners (NAIC) and industry reports
 US_AVERAGES = {
@@ -20,24 +22,9 @@ US_AVERAGES = {
     "annual_premium": 1800
 }
 
-# State-specific averages (can be expanded)
-STATE_AVERAGES = {
-    "California": {
-        "monthly_premium": 175,
-        "annual_premium": 2100
-    },
-    "Texas": {
-        "monthly_premium": 165,
-        "annual_premium": 1980
-    },
-    "Florida": {
-        "monthly_premium": 185,
-        "annual_premium": 2220
-    },
-    "New York": {
-        "monthly_premium": 195,
-        "annual_premium": 2340
-    }
+# State Benchmark Data (benchmark_data.py): per-state percentile points of every coverage field
+BENCHMARK_CONFIG = {
+    "path": os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "state_benchmarks.json")
 }
 
 # App Configuration
@@ -52,13 +39,183 @@ APP_CONFIG = {
 AI_CONFIG = {
     "model": "gemini-2.0-flash-exp",
     "temperature": 0.7,
-    "max_tokens": 2000
+    "max_tokens": 2000,
+    "stream": True,  # render analysis sections as the response streams in
+    "structured_output": True  # JSON mode with a response schema where the model supports it
+}
+
+# Model Discovery Configuration
+MODEL_CONFIG = {
+    "model_options": ["gemini-2.0-flash-exp", "gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro"],
+    "probe_ttl": 6 * 60 * 60,  # seconds before the chosen model is re-probed
+    "probe_cache_file": ".model_probe.json",  # lets restarts skip probing
+    "failure_threshold": 2  # consecutive call failures before a background re-probe
+}
+
+# Model Routing Configuration (model_router.py)
+ROUTER_CONFIG = {
+    "enabled": True,  # route each request across model_options instead of using only the probed model
+    "latency_slo": 20.0,  # seconds; the most preferred model whose p95 meets this is used
+    "hedge": True,  # send a second request to a faster model once the first passes its p95
+    "hedge_min_samples": 5,  # calls before a model's p95 is trusted; until then the SLO is the hedge delay
+    "window": 50,  # recent calls per model kept for latency and error statistics
+    "error_threshold": 0.5,  # error rate in the window that demotes a model
+    "min_error_samples": 4,  # calls in the window before demotion is considered
+    "demotion_seconds": 300,  # how long a demoted model is skipped
+    "workers": 8  # threads for concurrent primary and hedged requests
+}
+
+# Model Call Guard Configuration (call_guard.py): shared by every Gemini call in the process
+CALL_CONFIG = {
+    "requests_per_minute": 60,  # token bucket refill rate; set to the API key's quota
+    "burst": 10,  # calls allowed back to back before the rate applies
+    "acquire_timeout": 30.0,  # seconds a call may queue for a slot before failing
+    "timeout": 60.0,  # seconds per attempt (passed to the API as request_options)
+    "max_retries": 3,  # retries of 429s, timeouts and 5xx errors
+    "base_delay": 1.0,  # seconds; backoff doubles per retry with full jitter
+    "max_delay": 20.0,  # cap on a single backoff
+    "failure_threshold": 5,  # consecutive failed attempts that open the circuit breaker
+    "reset_seconds": 30.0  # how long the breaker stays open before a trial call
+}
+
+# Analysis Cache Configuration
+ANALYSIS_CACHE_CONFIG = {
+    "enabled": True,  # set POLICYAI_DISABLE_CACHE=1 to opt out without editing this file
+    "path": ".analysis_cache.sqlite3",
+    "ttl": 7 * 24 * 60 * 60,  # seconds
+    "max_entries": 5000,
+    "max_bytes": 50 * 1024 * 1024
+}
+
+# Analysis History Configuration (analysis_history.py)
+HISTORY_CONFIG = {
+    "enabled": True,  # set POLICYAI_DISABLE_HISTORY=1 to stop recording without editing this file
+    "path": ".analysis_history.sqlite3",
+    "page_size": 50,  # records per page in the History tab
+    "trend_bucket": "day"  # default trend period: day, week or month
+}
+
+# Batch Analyzer Configuration (batch_analyze.py)
+BATCH_CONFIG = {
+    "concurrency": 4,  # in-flight Gemini calls; the request rate comes from CALL_CONFIG or --rpm
+    "extract_workers": None,  # process pool size; None uses os.cpu_count()
+    "output": "analysis_results.jsonl",
+    "input_extensions": [".txt", ".pdf", ".png", ".jpg", ".jpeg"]
+}
+
+# Analysis Service Configuration (analysis_service.py)
+SERVICE_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8080,
+    "concurrency": 8,  # analyses running at once on the shared model client
+    "queue_limit": 16,  # requests allowed to wait for a slot; beyond this the service answers 429
+    "fake_latency": 0.5  # seconds per call for --fake
+}
+
+# PDF Extraction Configuration
+PDF_CONFIG = {
+    "probe_pages": 3,  # pages checked for a text layer before a full pass
+    "parallel_min_pages": 24,  # smaller documents are extracted in-process
+    "pages_per_task": 16,  # minimum page range handed to each worker process
+    "workers": None,  # None uses os.cpu_count()
+    "page_timeout": 10  # seconds per page in worker processes
+}
+
+# Background Analysis Jobs Configuration
+JOB_CONFIG = {
+    "workers": 4,  # analysis threads shared by all sessions
+    "max_per_session": 2,  # unfinished jobs one browser session may have
+    "max_pending": 32,  # unfinished jobs across the server before new ones are refused
+    "retention": 3600,  # seconds finished jobs stay available to their session
+    "poll_interval": 1.0  # seconds between result checks in the browser
+}
+
+# Instrumentation Configuration
+METRICS_CONFIG = {
+    "enabled": True,
+    "max_samples": 1000,  # recent timings kept per stage for p50/p95
+    "prometheus_file": None,  # e.g. "metrics.prom"; POLICYAI_METRICS_FILE overrides
+    "write_interval": 15,  # seconds between rewrites of the Prometheus file
+    "debug_panel": False  # sidebar timings; also shown with ?debug=1 or POLICYAI_DEBUG=1
+}
+
+# OCR Configuration (needs pytesseract and the tesseract binary)
+OCR_CONFIG = {
+    "enabled": True,
+    "workers": 2,  # concurrent tesseract processes
+    "max_side": 2000,  # pixels; larger images and pages are downscaled first
+    "pdf_dpi": 200,  # render resolution for image-only PDF pages
+    "max_pdf_pages": 50,  # scanned pages recognized per document
+    "page_timeout": 30,  # seconds per page
+    "lang": "eng",
+    "tesseract_config": "--psm 6",  # assume uniform blocks of text
+    "cache_entries": 256  # recognized pages kept in memory, keyed by page hash
+}
+
+# Portfolio Analysis Configuration (Portfolio tab)
+PORTFOLIO_CONFIG = {
+    "workers": 4,  # files extracted and analyzed at once within one portfolio
+    "max_files": 50  # files accepted per portfolio run
+}
+
+# Quick Score Configuration (scoring.py, no AI call)
+SCORE_CONFIG = {
+    # Share of the overall score per group; groups with no known fields are left out
+    "weights": {
+        "liability": 0.35,
+        "uninsured_motorist": 0.2,
+        "additional_coverage": 0.1,  # medical payments and rental reimbursement
+        "deductibles": 0.15,
+        "premium": 0.2
+    },
+    "points_per_doubling": 2.5,  # field score is 5 at the average, +2.5 per doubling of the ratio
+    "adequate_ratio": 1.0  # ratio to the average below which a field is flagged
+}
+
+# Prompt Compaction Configuration
+PROMPT_CONFIG = {
+    "compaction": True,  # strip boilerplate before building the analysis prompt
+    "token_budget": 6000,  # larger policies are analyzed section-wise (map-reduce)
+    "chunk_token_budget": 3000,  # policy tokens per map-reduce chunk
+    "map_workers": 4,  # chunks analyzed in parallel
+    "incremental": True,  # analyze uploads block by block so edits re-analyze only the changed blocks
+    "block_max_tokens": 1500,  # policy tokens per incremental block
+    "block_min_tokens": 300,  # a block ends at a content-defined boundary only after this many tokens
+    "repeat_threshold": 3,  # a non-item line seen this often is a page header/footer
+    "drop_sections": ["EXCLUSION", "DEFINITION", "CONDITION", "GENERAL PROVISION",
+                      "LEGAL NOTICE", "PRIVACY", "FRAUD WARNING"],
+    "max_merged_recommendations": 5
 }
 
 # File Upload Configuration
 UPLOAD_CONFIG = {
-    "max_file_size": 10,  # MB
-    "allowed_types": ["pdf", "doc", "docx", "txt", "png", "jpg", "jpeg"]
+    "max_file_size": 10,  # MB; keep server.maxUploadSize in .streamlit/config.toml in step
+    "allowed_types": ["pdf", "doc", "docx", "txt", "png", "jpg", "jpeg"],
+    "chunk_size": 1024 * 1024,  # bytes copied per read while spooling to disk
+    "spool_dir": None,  # None uses the system temp directory
+    "preview_chars": 5000,  # extracted text shown in the preview box while editing is off
+    "editable_chars": 100000  # documents up to this length can be opened in full with "Edit extracted text"
+}
+
+# Extraction Memo Configuration (extraction_memo.py): extracted upload text reused across reruns
+EXTRACTION_MEMO_CONFIG = {
+    "session_max_bytes": 32 * 1024 * 1024,  # extracted text kept per browser session
+    "shared": True,  # also share extractions between sessions, keyed by content hash
+    "shared_max_bytes": 128 * 1024 * 1024  # extracted text kept for all sessions together
+}
+
+# What-If Simulator Configuration (Manual Entry tab); scored locally, no AI calls
+WHAT_IF_CONFIG = {
+    # Bodily injury per person / per accident and property damage, in dollars
+    "liability_limits": [
+        [25000, 50000, 25000],
+        [50000, 100000, 50000],
+        [100000, 300000, 100000],
+        [250000, 500000, 100000],
+        [500000, 1000000, 250000]
+    ],
+    "deductibles": [0, 250, 500, 1000, 1500, 2000],  # applied to comprehensive and collision alike
+    "sensitivity_factors": [0.5, 2.0]  # each field halved and doubled in the sensitivity table
 }
 
 # Chart Configuration
@@ -69,5 +226,6 @@ CHART_CONFIG = {
         "success": "#51cf66",
         "warning": "#ffd43b"
     },
-    "height": 400
+    "height": 400,
+    "cache_size": 128  # per-policy figure pairs kept in memory
 } 
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Memo of extracted upload text for Auto Policy AI Analyzer
+Maps an upload's content hash to the text (and warnings) its extraction
+produced, so Streamlit reruns reuse the text instead of parsing the same
+bytes again. Entries are evicted least recently used first once the memo
+holds more than its byte budget. No Streamlit dependency.
+"""
+
+import threading
+from collections import OrderedDict
+
+from config import EXTRACTION_MEMO_CONFIG
+
+
+def _entry_bytes(text, warnings):
+    return len(text.encode('utf-8')) + sum(len(str(warning)) for warning in warnings)
+
+
+class ExtractionMemo:
+    """LRU memo of key -> (text, warnings) bounded by the total size of the texts"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = EXTRACTION_MEMO_CONFIG['session_max_bytes'] if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(text, warnings) for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[:2]
+
+    def put(self, key, text, warnings=()):
+        size = _entry_bytes(text, warnings)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            if size > self.max_bytes:
+                # Larger than the whole budget: keeping it would evict everything else
+                return
+            self._entries[key] = (text, tuple(warnings), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+
+    def extract(self, key, extract, warn=None, shared=None):
+        """Text for key, running extract(warn) only when neither this memo nor shared has it
+
+        Warnings raised by extract are passed on to warn and remembered, so a
+        reused result shows the same warnings as the first extraction. Empty
+        results are not remembered.
+        """
+        entry = self.get(key)
+        if entry is None and shared is not None:
+            entry = shared.get(key)
+            if entry is not None:
+                self.put(key, *entry)
+        if entry is None:
+            warnings = []
+
+            def record(message):
+                warnings.append(message)
+                if warn:
+                    warn(message)
+            text = extract(record) or ''
+            if text:
+                # A failed or empty extraction may be transient (page timeout, busy OCR pool): retry next time
+                self.put(key, text, warnings)
+                if shared is not None:
+                    shared.put(key, text, warnings)
+            return text
+        text, warnings = entry
+        if warn:
+            for message in warnings:
+                warn(message)
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
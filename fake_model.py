@@ -0,0 +1,73 @@
+"""
+Local stand-in for a Gemini GenerativeModel
+Used by tests and benchmarks to exercise the analysis pipeline offline
+"""
+
+import json
+import time
+
+DEFAULT_ANALYSIS = {
+    "policy_analysis": {
+        "coverage_adequacy": "Liability limits meet or exceed the US average.",
+        "cost_effectiveness": "Premium is in line with the coverage purchased.",
+        "risk_level": "Medium"
+    },
+    "comparison": {
+        "liability_adequacy": "Bodily injury limits are at or above $50,000/$100,000.",
+        "deductible_analysis": "Deductibles are close to the $500 US average.",
+        "premium_analysis": "Monthly premium is near the $150 US average."
+    },
+    "recommendations": [
+        "Consider raising liability limits to protect personal assets",
+        "Match uninsured motorist limits to your liability limits",
+        "Compare quotes annually to keep the premium competitive"
+    ],
+    "risk_assessment": "Coverage is adequate for a typical driver; higher limits would reduce exposure in serious accidents.",
+    "overall_score": 7
+}
+
+
+class FakeResponse:
+    """Mimics the .text attribute of a Gemini response or streamed chunk"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Iterable of FakeResponse chunks, like generate_content(..., stream=True)"""
+
+    def __init__(self, text, chunk_size, chunk_delay):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+
+    def __iter__(self):
+        for start in range(0, len(self.text), self.chunk_size):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeResponse(self.text[start:start + self.chunk_size])
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel with configurable latency and output"""
+
+    def __init__(self, model_name="fake-gemini", response_text=None, latency=0.0,
+                 chunk_size=64, chunk_delay=0.0, error=None):
+        self.model_name = model_name
+        self.response_text = response_text if response_text is not None else json.dumps(DEFAULT_ANALYSIS, indent=2)
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.error = error
+        self.calls = 0
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        if stream:
+            return FakeStreamResponse(self.response_text, self.chunk_size, self.chunk_delay)
+        return FakeResponse(self.response_text)
@@ -0,0 +1,105 @@
+"""
+Incremental JSON parsing for streamed model responses
+Reports each top-level member of the analysis object (and each element of
+top-level arrays such as recommendations) as soon as its text is complete
+"""
+
+import json
+
+
+class IncrementalJSONParser:
+    """Feed response chunks; get back (path, value) pairs as sections complete
+
+    Paths are ("overall_score",) for a finished top-level member and
+    ("recommendations", 0) for a finished element of a top-level array.
+    Text before the first "{" (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.members = {}
+        self.done = False
+        self._text = ''
+        self._pos = 0
+        self._started = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self._array_key = None
+        self._element_start = None
+        self._element_index = 0
+
+    def feed(self, chunk):
+        """Consume a chunk of response text and return the newly completed pieces"""
+        self._text += chunk
+        events = []
+        text = self._text
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._stack.append('{')
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._stack.append(ch)
+                if ch == '[' and len(self._stack) == 2:
+                    self._start_array()
+            elif ch in '}]':
+                if ch == ']' and len(self._stack) == 2:
+                    self._finish_element(events)
+                    self._array_key = None
+                self._stack.pop()
+                if not self._stack:
+                    self._finish_member(events)
+                    self.done = True
+            elif ch == ',':
+                if len(self._stack) == 1:
+                    self._finish_member(events)
+                    self._member_start = self._pos + 1
+                elif len(self._stack) == 2 and self._array_key is not None:
+                    self._finish_element(events)
+                    self._element_start = self._pos + 1
+            self._pos += 1
+        return events
+
+    def _start_array(self):
+        prefix = self._text[self._member_start:self._pos].strip()
+        try:
+            self._array_key = json.loads(prefix.rstrip(':').strip())
+        except ValueError:
+            self._array_key = None
+        self._element_start = self._pos + 1
+        self._element_index = 0
+
+    def _finish_member(self, events):
+        member_text = self._text[self._member_start:self._pos].strip()
+        if not member_text:
+            return
+        try:
+            member = json.loads('{' + member_text + '}')
+        except ValueError:
+            return  # Left for the full-response parse to report
+        for key, value in member.items():
+            self.members[key] = value
+            events.append(((key,), value))
+
+    def _finish_element(self, events):
+        element_text = self._text[self._element_start:self._pos].strip()
+        if not element_text or self._array_key is None:
+            return
+        try:
+            value = json.loads(element_text)
+        except ValueError:
+            return
+        events.append(((self._array_key, self._element_index), value))
+        self._element_index += 1
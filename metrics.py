@@ -0,0 +1,205 @@
+"""
+Lightweight instrumentation for Auto Policy AI Analyzer
+Timing spans, counters and percentile summaries kept in process, exposed to
+the sidebar debug panel and as a Prometheus text-format file
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import METRICS_CONFIG
+
+PREFIX = "policyai"
+
+COUNTER_HELP = {
+    "analyses": "Analyses requested, by kind and cache outcome",
+    "fallbacks": "Analyses that fell back to the simple prompt, by reason",
+    "generate_calls": "Model calls, by model that answered",
+    "generate_errors": "Model calls that raised, by model",
+    "tokens": "Prompt and response tokens, by model (API counts when available, else local estimates)",
+    "section_analyses": "Policy blocks in incremental analyses, by whether the block's cached findings were reused",
+    "service_requests": "Analysis service responses, by path and HTTP status",
+    "service_rejected": "Analysis service requests refused with 429 because it was saturated, by endpoint",
+    "json_repairs": "Malformed JSON responses passed to the local repair, by outcome",
+    "hedged_requests": "Second requests sent because the routed model passed its p95, by hedge model",
+    "hedge_wins": "Hedged requests that answered before the original, by hedge model",
+    "generate_retries": "Model calls retried after a quota, timeout or server error, by error",
+    "rate_limited": "Model calls refused because no rate-limit slot freed up in time",
+    "circuit_opened": "Times the circuit breaker opened after repeated model failures",
+    "model_demotions": "Models demoted by the router for a high error rate, by model",
+    "history_records": "Analyses written to the history store, by source",
+    "history_errors": "Analyses that could not be written to the history store",
+}
+
+# Analysis kinds that can fall back to the simple prompt: the fallback rate's denominator
+PRIMARY_KINDS = ("analysis", "sections")
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def quantile(ordered, q):
+    """Nearest-rank quantile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))]
+
+
+class MetricsRegistry:
+    """Thread-safe span timings (recent samples for p50/p95, lifetime count/sum) and counters"""
+
+    def __init__(self, max_samples=None, prometheus_file=None, write_interval=None):
+        self.max_samples = max_samples or METRICS_CONFIG['max_samples']
+        self.prometheus_file = prometheus_file
+        self.write_interval = METRICS_CONFIG['write_interval'] if write_interval is None else write_interval
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_write = 0.0
+
+    def observe(self, stage, seconds, **labels):
+        key = (stage, _label_key(labels))
+        with self._lock:
+            entry = self._spans.get(key)
+            if entry is None:
+                entry = self._spans[key] = {"count": 0, "sum": 0.0, "samples": deque(maxlen=self.max_samples)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["samples"].append(seconds)
+        self._maybe_write()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._maybe_write()
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the with-block as one sample of stage (failures are timed too)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def counter(self, name, **labels):
+        """Sum of a counter over every label set matching labels"""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(value for (counter, key), value in self._counters.items()
+                       if counter == name and wanted <= set(key))
+
+    def snapshot(self):
+        """Plain-data view: per-span count/mean/p50/p95 (seconds) and counters"""
+        with self._lock:
+            spans = [(stage, key, entry["count"], entry["sum"], sorted(entry["samples"]))
+                     for (stage, key), entry in self._spans.items()]
+            counters = [(name, dict(key), value) for (name, key), value in self._counters.items()]
+        analyses = sum(value for name, labels, value in counters
+                       if name == "analyses" and labels.get("kind") in PRIMARY_KINDS)
+        fallbacks = sum(value for name, _, value in counters if name == "fallbacks")
+        return {
+            "spans": [{"stage": stage, "labels": dict(key), "count": count, "mean": total / count,
+                       "p50": quantile(samples, 0.5), "p95": quantile(samples, 0.95)}
+                      for stage, key, count, total, samples in sorted(spans)],
+            "counters": [{"name": name, "labels": labels, "value": value}
+                         for name, labels, value in sorted(counters, key=lambda item: (item[0], sorted(item[1].items())))],
+            "fallback_rate": fallbacks / analyses if analyses else 0.0
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            spans = [(stage, key, entry["count"], entry["sum"], sorted(entry["samples"]))
+                     for (stage, key), entry in sorted(self._spans.items())]
+            counters = sorted(self._counters.items())
+        snapshot_rate = self.snapshot()["fallback_rate"]
+
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent in each pipeline stage",
+                 f"# TYPE {PREFIX}_stage_seconds summary"]
+        for stage, key, count, total, samples in spans:
+            pairs = (("stage", stage),) + key
+            for q in (0.5, 0.95):
+                lines.append(f"{PREFIX}_stage_seconds{_format_labels(pairs + (('quantile', str(q)),))} "
+                             f"{quantile(samples, q):.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_sum{_format_labels(pairs)} {total:.6f}")
+            lines.append(f"{PREFIX}_stage_seconds_count{_format_labels(pairs)} {count}")
+
+        seen = set()
+        for (name, key), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name.replace('_', ' '))}")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+
+        lines.append(f"# HELP {PREFIX}_fallback_ratio Share of analyses answered by the simple fallback")
+        lines.append(f"# TYPE {PREFIX}_fallback_ratio gauge")
+        lines.append(f"{PREFIX}_fallback_ratio {snapshot_rate:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Atomically write the text format, e.g. for node_exporter's textfile collector"""
+        path = path or self.prometheus_file
+        if not path:
+            return None
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.metrics-', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+    def _maybe_write(self):
+        if not self.prometheus_file or time.time() - self._last_write < self.write_interval:
+            return
+        # One writer at a time; everyone else skips rather than waits
+        if self._write_lock.acquire(blocking=False):
+            try:
+                self._last_write = time.time()
+                self.write_prometheus()
+            except OSError:
+                pass
+            finally:
+                self._write_lock.release()
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+
+class _NullRegistry(MetricsRegistry):
+    """Used when METRICS_CONFIG['enabled'] is off: records nothing"""
+
+    def observe(self, stage, seconds, **labels):
+        pass
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+
+def _default_registry():
+    registry_class = MetricsRegistry if METRICS_CONFIG['enabled'] else _NullRegistry
+    return registry_class(prometheus_file=os.getenv('POLICYAI_METRICS_FILE') or METRICS_CONFIG['prometheus_file'])
+
+
+registry = _default_registry()
+span = registry.span
+increment = registry.increment
+observe = registry.observe
@@ -0,0 +1,239 @@
+"""
+Latency-aware routing across Gemini models for Auto Policy AI Analyzer
+Keeps rolling latency and error statistics per model, sends each request to
+the most preferred model that meets the latency SLO, hedges slow requests
+with a second call to a faster model and demotes models that keep failing
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from call_guard import get_call_guard
+from config import MODEL_CONFIG, ROUTER_CONFIG
+from metrics import increment, quantile
+
+
+class ModelStats:
+    """Rolling window of (seconds, ok) samples for one model and call type"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.demoted_until = 0.0
+
+    def record(self, seconds, ok):
+        self.samples.append((seconds, ok))
+
+    def latency(self, q):
+        """Quantile of successful call latencies, or None before any succeeded"""
+        latencies = sorted(seconds for seconds, ok in self.samples if ok)
+        return quantile(latencies, q) if latencies else None
+
+    def successes(self):
+        return sum(ok for _, ok in self.samples)
+
+    def error_rate(self):
+        return 1 - self.successes() / len(self.samples) if self.samples else 0.0
+
+
+class RoutedResponse:
+    """A model response plus the name of the model that produced it"""
+
+    def __init__(self, response, routed_model):
+        self._response = response
+        self.routed_model = routed_model
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __iter__(self):
+        return iter(self._response)
+
+
+def _prefetch(response):
+    """Wait for the first streamed chunk so a stream's latency is its time to first chunk"""
+    chunks = iter(response)
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return iter(())
+    return itertools.chain((first,), chunks)
+
+
+class ModelRouter:
+    """Stands in for a GenerativeModel; every generate_content call is routed
+
+    Models are tried in model_options order of preference. Streamed and
+    non-streamed calls keep separate statistics, since a stream's latency is
+    measured to its first chunk. Each attempt, hedges and failovers included,
+    goes through the CallGuard on its own, so every paid request takes a
+    rate-limit slot.
+    """
+
+    model_name = "auto"
+    # generate() leaves rate limiting, retries and timeouts to the per-attempt guard
+    guards_calls = True
+
+    def __init__(self, model_options=None, model_factory=None, preferred=None, latency_slo=None, hedge=None,
+                 hedge_min_samples=None, window=None, error_threshold=None, min_error_samples=None,
+                 demotion_seconds=None, workers=None, guard=None):
+        self.model_options = list(model_options or MODEL_CONFIG['model_options'])
+        if preferred in self.model_options:
+            self.model_options.remove(preferred)
+            self.model_options.insert(0, preferred)
+        self.model_factory = model_factory or genai.GenerativeModel
+        # None: the process-wide guard, looked up per call so configure_call_guard applies
+        self.guard = guard
+        self.latency_slo = ROUTER_CONFIG['latency_slo'] if latency_slo is None else latency_slo
+        self.hedge = ROUTER_CONFIG['hedge'] if hedge is None else hedge
+        self.hedge_min_samples = (ROUTER_CONFIG['hedge_min_samples']
+                                  if hedge_min_samples is None else hedge_min_samples)
+        self.window = window or ROUTER_CONFIG['window']
+        self.error_threshold = ROUTER_CONFIG['error_threshold'] if error_threshold is None else error_threshold
+        self.min_error_samples = (ROUTER_CONFIG['min_error_samples']
+                                  if min_error_samples is None else min_error_samples)
+        self.demotion_seconds = (ROUTER_CONFIG['demotion_seconds']
+                                 if demotion_seconds is None else demotion_seconds)
+
+        self._models = {}
+        self._stats = {}
+        self._unstructured = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers or ROUTER_CONFIG['workers'],
+                                        thread_name_prefix='model-router')
+
+    def stats(self, model_name, stream=False):
+        key = (model_name, stream)
+        if key not in self._stats:
+            self._stats[key] = ModelStats(self.window)
+        return self._stats[key]
+
+    def choose(self, stream=False):
+        """(primary, hedge) model names for the next call; hedge may be None"""
+        now = time.time()
+        with self._lock:
+            stats = {name: self.stats(name, stream) for name in self.model_options}
+            healthy = [name for name in self.model_options if stats[name].demoted_until <= now]
+            if not healthy:
+                # Everything is demoted: use whichever comes back first
+                healthy = [min(self.model_options, key=lambda name: stats[name].demoted_until)]
+
+            within_slo = [name for name in healthy
+                          if (stats[name].latency(0.95) or 0.0) <= self.latency_slo]
+            primary = within_slo[0] if within_slo else min(healthy, key=lambda name: stats[name].latency(0.95))
+            # The hedge goes to the fastest other model; unmeasured ones rank by preference after measured
+            others = [name for name in healthy if name != primary]
+            hedge = min(others, key=lambda name: (stats[name].latency(0.5) is None,
+                                                  stats[name].latency(0.5) or 0.0), default=None)
+        return primary, hedge
+
+    def hedge_delay(self, model_name, stream=False):
+        """Seconds to wait on model_name before hedging: its p95 once trusted, else the SLO"""
+        with self._lock:
+            stats = self.stats(model_name, stream)
+            if stats.successes() >= self.hedge_min_samples:
+                return stats.latency(0.95)
+        return self.latency_slo
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        primary, hedge = self.choose(stream)
+        if hedge is None:
+            return RoutedResponse(self._attempt(primary, contents, stream, kwargs), primary)
+
+        pending = {self._pool.submit(self._attempt, primary, contents, stream, kwargs): primary}
+        done, _ = wait(pending, timeout=self.hedge_delay(primary, stream) if self.hedge else None)
+        hedged = False
+        errors = []
+        while True:
+            for future in done:
+                model_name = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if model_name == hedge:
+                    increment("hedge_wins", model=hedge)
+                # A losing call keeps running in the background and still feeds the statistics
+                return RoutedResponse(response, model_name)
+            if not hedged:
+                # Either the primary is past its p95 or it failed outright
+                hedged = True
+                if not errors:
+                    increment("hedged_requests", model=hedge)
+                pending[self._pool.submit(self._attempt, hedge, contents, stream, kwargs)] = hedge
+            if not pending:
+                raise errors[0]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+    def _attempt(self, model_name, contents, stream, kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._call(model_name, contents, stream, kwargs)
+            if stream:
+                response = _prefetch(response)
+        except Exception:
+            self._record(model_name, stream, time.perf_counter() - started, False)
+            raise
+        self._record(model_name, stream, time.perf_counter() - started, True)
+        return response
+
+    def _call(self, model_name, contents, stream, kwargs):
+        with self._lock:
+            model = self._models.get(model_name)
+        if model is None:
+            model = self.model_factory(model_name)
+            with self._lock:
+                model = self._models.setdefault(model_name, model)
+        if 'generation_config' in kwargs and model_name in self._unstructured:
+            kwargs = {key: value for key, value in kwargs.items() if key != 'generation_config'}
+        try:
+            return self._guarded(model, contents, stream, kwargs)
+        except google_exceptions.InvalidArgument:
+            if 'generation_config' not in kwargs:
+                raise
+            # Older models (e.g. gemini-pro) do not support response schemas
+            self._unstructured.add(model_name)
+            kwargs = {key: value for key, value in kwargs.items() if key != 'generation_config'}
+            return self._guarded(model, contents, stream, kwargs)
+
+    def _guarded(self, model, contents, stream, kwargs):
+        def call(timeout):
+            options = dict(kwargs)
+            if timeout:
+                options.setdefault("request_options", {"timeout": timeout})
+            return model.generate_content(contents, stream=stream, **options)
+        return (self.guard or get_call_guard()).call(call)
+
+    def _record(self, model_name, stream, seconds, ok):
+        with self._lock:
+            stats = self.stats(model_name, stream)
+            stats.record(seconds, ok)
+            if (not ok and len(stats.samples) >= self.min_error_samples
+                    and stats.error_rate() >= self.error_threshold):
+                # Skipped until the cooldown ends, then judged on fresh samples
+                stats.demoted_until = time.time() + self.demotion_seconds
+                stats.samples.clear()
+                increment("model_demotions", model=model_name)
+
+    def snapshot(self):
+        """Per-model statistics for the debug panel"""
+        now = time.time()
+        with self._lock:
+            return [{
+                "model": name,
+                "stream": stream,
+                "calls": len(stats.samples),
+                "p50_s": stats.latency(0.5),
+                "p95_s": stats.latency(0.95),
+                "error_rate": stats.error_rate(),
+                "demoted": stats.demoted_until > now
+            } for (name, stream), stats in sorted(self._stats.items()) if stats.samples or stats.demoted_until > now]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,151 @@
+"""
+Gemini model discovery for Auto Policy AI Analyzer
+Probes the configured models once per process and remembers the winner
+"""
+
+import json
+import os
+import threading
+import time
+
+import google.generativeai as genai
+
+from call_guard import get_call_guard
+from config import MODEL_CONFIG
+from metrics import span
+
+
+def probe_models(model_options, model_factory=None):
+    """Return (model_name, model) for the first model that answers a test prompt
+
+    Test prompts are paid calls, so they go through the shared CallGuard like any other.
+    """
+    model_factory = model_factory or genai.GenerativeModel
+    guard = get_call_guard()
+    with span("model_probe"):
+        for model_name in model_options:
+            try:
+                model = model_factory(model_name)
+                # Test the model connection
+                guard.call(lambda timeout: model.generate_content("Hello", request_options={"timeout": timeout}))
+                return model_name, model
+            except Exception:
+                continue
+    return None, None
+
+
+def load_probe_result(path, ttl):
+    """Load a saved probe result, or None if it is missing or older than ttl"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not data.get('model_name'):
+        return None
+    if time.time() - data.get('probed_at', 0) > ttl:
+        return None
+    return data
+
+
+def save_probe_result(path, model_name, probed_at):
+    """Persist the probe result so a restarted process can skip probing"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"model_name": model_name, "probed_at": probed_at}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Persisting is an optimisation only; the in-process result still stands
+        pass
+
+
+class ModelSelector:
+    """Holds the chosen Gemini model and re-probes only when stale or failing"""
+
+    def __init__(self, model_options=None, probe_ttl=None, cache_file=None,
+                 failure_threshold=None, model_factory=None):
+        self.model_options = list(model_options or MODEL_CONFIG['model_options'])
+        self.probe_ttl = MODEL_CONFIG['probe_ttl'] if probe_ttl is None else probe_ttl
+        self.cache_file = MODEL_CONFIG['probe_cache_file'] if cache_file is None else cache_file
+        self.failure_threshold = (MODEL_CONFIG['failure_threshold']
+                                  if failure_threshold is None else failure_threshold)
+        self.model_factory = model_factory or genai.GenerativeModel
+
+        self.model = None
+        self.model_name = None
+        self.probed_at = 0.0
+        self.from_cache = False
+        self.consecutive_failures = 0
+
+        self._lock = threading.Lock()
+        self._reprobe_thread = None
+
+    def get_model(self):
+        """Return the current model, probing synchronously only if there is none yet"""
+        with self._lock:
+            if self.model is None:
+                self._load_or_probe()
+            elif time.time() - self.probed_at > self.probe_ttl:
+                # Stale: keep serving the current model while re-probing
+                self._start_reprobe()
+            return self.model
+
+    def report_success(self):
+        """Record a successful call against the current model"""
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def report_failure(self):
+        """Record a failed call; re-probe in the background once failures pile up"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self._start_reprobe()
+
+    def is_reprobing(self):
+        """True while a background re-probe is running"""
+        thread = self._reprobe_thread
+        return thread is not None and thread.is_alive()
+
+    def _load_or_probe(self):
+        saved = load_probe_result(self.cache_file, self.probe_ttl) if self.cache_file else None
+        if saved and saved['model_name'] in self.model_options:
+            try:
+                self._set_model(saved['model_name'], self.model_factory(saved['model_name']),
+                                saved['probed_at'], from_cache=True)
+                return
+            except Exception:
+                pass
+        model_name, model = probe_models(self.model_options, self.model_factory)
+        if model is not None:
+            self._set_model(model_name, model, time.time(), from_cache=False)
+
+    def _set_model(self, model_name, model, probed_at, from_cache):
+        self.model = model
+        self.model_name = model_name
+        self.probed_at = probed_at
+        self.from_cache = from_cache
+        self.consecutive_failures = 0
+        if not from_cache and self.cache_file:
+            save_probe_result(self.cache_file, model_name, probed_at)
+
+    def _start_reprobe(self):
+        # Caller holds self._lock
+        if self.is_reprobing():
+            return
+        if not get_call_guard().available():
+            # The backend as a whole is down, not this model; probing would only spend quota
+            return
+        self._reprobe_thread = threading.Thread(target=self._reprobe, daemon=True)
+        self._reprobe_thread.start()
+
+    def _reprobe(self):
+        model_name, model = probe_models(self.model_options, self.model_factory)
+        with self._lock:
+            if model is not None:
+                self._set_model(model_name, model, time.time(), from_cache=False)
+            else:
+                # Nothing answered; retry after another failure or TTL expiry
+                self.probed_at = time.time()
+                self.consecutive_failures = 0
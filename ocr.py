@@ -0,0 +1,175 @@
+"""
+Offline OCR for Auto Policy AI Analyzer
+Recognizes text in image uploads and image-only PDF pages with Tesseract.
+Pages are downscaled and binarized first, recognized on a bounded worker
+pool and cached in memory by page hash
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pypdfium2
+from PIL import Image, ImageOps
+
+from config import OCR_CONFIG
+
+try:
+    import pytesseract
+except ImportError:  # optional: image uploads and scanned PDFs are skipped without it
+    pytesseract = None
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_available = None
+
+
+def ocr_available():
+    """True when pytesseract and the tesseract binary are both installed"""
+    global _available
+    if _available is None:
+        _available = False
+        if pytesseract is not None and OCR_CONFIG['enabled']:
+            try:
+                pytesseract.get_tesseract_version()
+                _available = True
+            except Exception:
+                pass
+    return _available
+
+
+def get_ocr_pool():
+    """Shared pool; each worker drives one tesseract process at a time"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=OCR_CONFIG['workers'], thread_name_prefix='ocr')
+        return _pool
+
+
+def otsu_threshold(image):
+    """Grey level that best separates ink from paper in an 'L' image"""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = background_sum = 0
+    best_level, best_variance = 127, -1
+    for level, count in enumerate(histogram):
+        background += count
+        if not background or background == total:
+            continue
+        background_sum += level * count
+        foreground = total - background
+        mean_gap = background_sum / background - (weighted_total - background_sum) / foreground
+        variance = background * foreground * mean_gap * mean_gap
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess_image(image, max_side=None):
+    """Greyscale, downscale to max_side and binarize, so recognition cost is bounded"""
+    max_side = max_side or OCR_CONFIG['max_side']
+    image = ImageOps.exif_transpose(image).convert('L')
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    threshold = otsu_threshold(image)
+    return image.point(lambda level: 255 if level > threshold else 0, mode='1')
+
+
+def page_hash(image):
+    """Cache key for a preprocessed page"""
+    digest = hashlib.sha256(f"{image.size}|{OCR_CONFIG['lang']}|{OCR_CONFIG['tesseract_config']}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _recognize(image):
+    return pytesseract.image_to_string(image, lang=OCR_CONFIG['lang'], config=OCR_CONFIG['tesseract_config'],
+                                       timeout=OCR_CONFIG['page_timeout'])
+
+
+def _ocr_page(image):
+    """Worker: preprocess, then recognize unless the page hash is cached; returns (text, error)"""
+    try:
+        image = preprocess_image(image)
+        key = page_hash(image)
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key], None
+        text = _recognize(image).strip()
+    except Exception as e:
+        return '', str(e)
+    with _cache_lock:
+        _cache[key] = text
+        while len(_cache) > OCR_CONFIG['cache_entries']:
+            _cache.popitem(last=False)
+    return text, None
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def ocr_images(images):
+    """Recognize a list of PIL images on the worker pool; returns [(text, error)]"""
+    pool = get_ocr_pool()
+    return list(pool.map(_ocr_page, images))
+
+
+def ocr_image(image):
+    """Text in one image (PIL image, path or file object); None if nothing was recognized"""
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as opened:
+            opened.load()
+            image = opened.copy()
+    # Same bounded pool as PDF pages, so concurrent uploads cannot start unlimited tesseract processes
+    text, _ = get_ocr_pool().submit(_ocr_page, image).result()
+    return text or None
+
+
+def ocr_pdf(source, max_pages=None, dpi=None):
+    """Recognize the pages of an image-only PDF (path or bytes)
+
+    Returns the same dict shape as pdf_extraction.extract_pdf. Pages are
+    rendered one window at a time so only a few page images are in memory.
+    """
+    max_pages = max_pages or OCR_CONFIG['max_pdf_pages']
+    scale = (dpi or OCR_CONFIG['pdf_dpi']) / 72
+    window = OCR_CONFIG['workers'] * 2
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+    elif isinstance(source, os.PathLike):
+        source = os.fspath(source)
+
+    document = pypdfium2.PdfDocument(source)
+    try:
+        page_count = len(document)
+        result = {"text": None, "pages": page_count, "has_text_layer": False,
+                  "failed_pages": [], "timed_out_pages": [], "method": None}
+        texts = []
+        for start in range(0, min(page_count, max_pages), window):
+            end = min(start + window, page_count, max_pages)
+            # pdfium is not thread-safe, so pages are rendered here and only recognized in the pool
+            images = [document[index].render(scale=scale, grayscale=True).to_pil()
+                      for index in range(start, end)]
+            for index, (text, error) in zip(range(start, end), ocr_images(images)):
+                if error and 'timeout' in error.lower():
+                    result["timed_out_pages"].append(index + 1)
+                elif error:
+                    result["failed_pages"].append(index + 1)
+                elif text:
+                    texts.append(text)
+    finally:
+        document.close()
+
+    if texts:
+        result.update(text='\n'.join(texts), method="ocr")
+    return result
@@ -0,0 +1,196 @@
+"""
+PDF text extraction engine for Auto Policy AI Analyzer
+Probes the text layer first, extracts page ranges in parallel worker
+processes with per-page timeouts, and joins page text in one pass
+"""
+
+import io
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import PyPDF2
+import pdfplumber
+
+from config import PDF_CONFIG
+from ocr import ocr_available, ocr_pdf
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PageTimeout(Exception):
+    """A single page took longer than the per-page timeout"""
+
+
+def extraction_workers():
+    """Number of worker processes used for page-parallel extraction"""
+    return PDF_CONFIG['workers'] or os.cpu_count() or 1
+
+
+def get_extraction_pool():
+    """Shared worker pool; spawned processes so forking a threaded server is never needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=extraction_workers(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _worker_ready(delay):
+    time.sleep(delay)
+    return os.getpid()
+
+
+def warm_up_pool():
+    """Start every worker process now (each one imports pdfplumber once)"""
+    pool = get_extraction_pool()
+    futures = [pool.submit(_worker_ready, 0.2) for _ in range(extraction_workers())]
+    return len({future.result() for future in futures})
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _extract_page_range(source, start, end, page_timeout):
+    """Worker: extract pages [start, end) and return [(page_index, text, error)]"""
+    # SIGALRM only exists on POSIX; elsewhere the caller's range timeout is the backstop
+    use_alarm = page_timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_page_timeout)
+    results = []
+    try:
+        # Only load this range's pages rather than the whole page tree
+        with pdfplumber.open(_open_source(source), pages=range(start + 1, end + 1)) as pdf:
+            for index, page in zip(range(start, end), pdf.pages):
+                try:
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                    results.append((index, page.extract_text() or '', None))
+                except PageTimeout:
+                    results.append((index, '', 'timeout'))
+                except Exception as e:
+                    results.append((index, '', str(e)))
+                finally:
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous)
+    return results
+
+
+def _open_source(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
+
+def _portable_source(pdf_file):
+    """A path or bytes that worker processes can open themselves"""
+    if isinstance(pdf_file, (str, os.PathLike, bytes, bytearray)):
+        return pdf_file
+    if isinstance(pdf_file, memoryview):
+        return bytes(pdf_file)
+    if hasattr(pdf_file, 'seek'):
+        pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _page_ranges(first_page, page_count, pages_per_task):
+    return [(start, min(start + pages_per_task, page_count))
+            for start in range(first_page, page_count, pages_per_task)]
+
+
+def extract_pdf(pdf_file, parallel=True, probe_pages=None, page_timeout=None, warn=None, ocr=True):
+    """Extract text from a PDF (path, bytes or file object)
+
+    Returns a dict with the joined "text" (None if nothing was found), the page
+    count, whether a text layer was detected, pages that timed out or failed,
+    and which method produced the text. Image-only PDFs go through OCR when
+    it is installed and ocr is true.
+    """
+    warn = warn or (lambda message: None)
+    probe_pages = PDF_CONFIG['probe_pages'] if probe_pages is None else probe_pages
+    page_timeout = PDF_CONFIG['page_timeout'] if page_timeout is None else page_timeout
+    source = _portable_source(pdf_file)
+    result = {"text": None, "pages": 0, "has_text_layer": False,
+              "failed_pages": [], "timed_out_pages": [], "method": None}
+
+    try:
+        with pdfplumber.open(_open_source(source)) as pdf:
+            page_count = len(pdf.pages)
+            result["pages"] = page_count
+            # Fast text-layer probe: image-only PDFs stop here, skipping both full passes
+            probe = [(index, pdf.pages[index].extract_text() or '', None)
+                     for index in range(min(probe_pages, page_count))]
+            if probe_pages and page_count and not any(text.strip() for _, text, _ in probe):
+                return ocr_pdf(source) if ocr and ocr_available() else result
+            result["has_text_layer"] = True
+
+            parallel = (parallel and extraction_workers() > 1
+                        and page_count - len(probe) >= PDF_CONFIG['parallel_min_pages'])
+            # Each worker re-walks the page tree when it opens the file, so hand out
+            # about two ranges per worker rather than many small ones
+            pages_per_task = max(PDF_CONFIG['pages_per_task'],
+                                 math.ceil((page_count - len(probe)) / (extraction_workers() * 2)))
+            remaining = _page_ranges(len(probe), page_count, pages_per_task)
+            if parallel:
+                pages = probe + _extract_parallel(source, remaining, page_timeout)
+            else:
+                pages = list(probe)
+                for start, end in remaining:
+                    pages.extend((index, pdf.pages[index].extract_text() or '', None)
+                                 for index in range(start, end))
+    except Exception as e:
+        warn(f"pdfplumber failed: {str(e)}")
+        return _extract_with_pypdf2(source, result, warn)
+
+    pages.sort(key=lambda page: page[0])
+    for index, _, error in pages:
+        if error == 'timeout':
+            result["timed_out_pages"].append(index + 1)
+        elif error:
+            result["failed_pages"].append(index + 1)
+    text = '\n'.join(text for _, text, _ in pages if text).strip()
+    if text:
+        result.update(text=text, method="pdfplumber")
+        return result
+    return _extract_with_pypdf2(source, result, warn)
+
+
+def _extract_parallel(source, ranges, page_timeout):
+    pool = get_extraction_pool()
+    futures = [(start, end, pool.submit(_extract_page_range, source, start, end, page_timeout))
+               for start, end in ranges]
+    pages = []
+    for start, end, future in futures:
+        # Backstop for platforms without SIGALRM: the whole range gets its page budget
+        range_timeout = page_timeout * (end - start) + 30 if page_timeout else None
+        try:
+            pages.extend(future.result(timeout=range_timeout))
+        except FutureTimeoutError:
+            future.cancel()
+            pages.extend((index, '', 'timeout') for index in range(start, end))
+        except Exception as e:
+            pages.extend((index, '', str(e)) for index in range(start, end))
+    return pages
+
+
+def _extract_with_pypdf2(source, result, warn):
+    """Fallback when pdfplumber cannot open or read the file"""
+    try:
+        reader = PyPDF2.PdfReader(_open_source(source))
+        result["pages"] = result["pages"] or len(reader.pages)
+        text = '\n'.join(page_text for page_text in (page.extract_text() for page in reader.pages)
+                         if page_text).strip()
+        if text:
+            result.update(text=text, has_text_layer=True, method="PyPDF2")
+    except Exception as e:
+        warn(f"PyPDF2 failed: {str(e)}")
+    return result
+
@@ -0,0 +1,543 @@
+"""
+Policy extraction and AI analysis for Auto Policy AI Analyzer
+Importable without Streamlit so the web app and the batch CLI share one code path
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+from google.api_core import exceptions as google_exceptions
+
+from analysis_cache import cache_key
+from analysis_schema import STRUCTURED_GENERATION_CONFIG, coerce_analysis, repair_json, validate_analysis
+from benchmark_data import get_benchmarks
+from call_guard import CircuitOpenError, RateLimitExceeded, get_call_guard
+from config import AI_CONFIG, PROMPT_CONFIG
+from json_stream import IncrementalJSONParser
+from metrics import increment, observe, span
+from policy_extractor import extract_policy_fields
+from prompt_compaction import (chunk_sections, compact_policy_text, compact_sections, count_tokens, merge_analyses,
+                                section_blocks)
+
+# Bump whenever a prompt template (or the bundled benchmark data) changes so cached analyses are not reused
+PROMPT_VERSION = 5
+
+TEXT_EXTENSIONS = ('.txt',)
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+BENCHMARK_LABELS = {
+    'bodily_injury_per_person': "Bodily Injury Liability per Person",
+    'bodily_injury_per_accident': "Bodily Injury Liability per Accident",
+    'property_damage': "Property Damage Liability",
+    'comprehensive_deductible': "Comprehensive Deductible",
+    'collision_deductible': "Collision Deductible",
+    'uninsured_per_person': "Uninsured Motorist per Person",
+    'uninsured_per_accident': "Uninsured Motorist per Accident",
+    'medical_payments': "Medical Payments",
+    'rental_reimbursement': "Rental Reimbursement",
+    'monthly_premium': "Monthly Premium",
+    'annual_premium': "Annual Premium",
+}
+
+ANALYSIS_SECTIONS = ('policy_analysis', 'comparison', 'recommendations', 'risk_assessment', 'overall_score')
+
+
+class AnalysisError(Exception):
+    """An analysis failed; message and optional hint are safe to show to users"""
+
+    def __init__(self, message, hint=None):
+        super().__init__(message)
+        self.hint = hint
+
+
+class ModelCallError(AnalysisError):
+    """The model call itself failed (quota, network, backend error)"""
+
+
+class ResponseParseError(AnalysisError):
+    """The model answered but the response was not usable JSON"""
+
+
+def model_call_error(message, error):
+    """ModelCallError for a failed call, with a hint matching why it failed"""
+    if isinstance(error, CircuitOpenError):
+        hint = f"The AI service is failing right now, so requests are paused. Try again in {error.retry_in:.0f} seconds."
+    elif isinstance(error, RateLimitExceeded):
+        hint = "The analyzer is at its request limit. Please try again in a moment."
+    else:
+        hint = "This might be due to API limits or network issues. Please try again."
+    return ModelCallError(f"{message}: {error}", hint=hint)
+
+
+def extract_text_from_pdf(pdf_file, warn=None, parallel=True):
+    """Extract text from PDF file using multiple methods"""
+    # pdfplumber, PyPDF2 and pypdfium2 load only once a PDF arrives
+    from pdf_extraction import extract_pdf
+    with span("extract", source="pdf"):
+        return extract_pdf(pdf_file, parallel=parallel, warn=warn)["text"]
+
+
+def extract_text_from_image(image):
+    """OCR a policy photo or scan (path, file object or PIL image); None without OCR"""
+    from ocr import ocr_available, ocr_image
+    if not ocr_available():
+        return None
+    with span("extract", source="image"):
+        return ocr_image(image)
+
+
+def extract_text_from_file(path, parallel=True):
+    """Extract text from a policy file on disk (TXT, PDF or image); None if nothing usable"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return extract_text_from_pdf(path, parallel=parallel)
+    if extension in IMAGE_EXTENSIONS:
+        return extract_text_from_image(path)
+    with span("extract", source="text"), open(path, 'rb') as f:
+        text = f.read().decode('utf-8', errors='replace').strip()
+    return text or None
+
+
+def _ordinal(number):
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+def benchmark_reference(user_policy=None):
+    """Benchmark medians for the policy's state (or the US) and where the policy falls in them"""
+    user_policy = user_policy or {}
+    benchmarks = get_benchmarks()
+    state = benchmarks.state_name(user_policy.get('state'))
+    percentiles = benchmarks.policy_percentiles(user_policy, state)
+    lines = [f"{state or 'US'} benchmarks for reference (median"
+             + (", and this policy's percentile in the state):" if percentiles else "):")]
+    for field, label in BENCHMARK_LABELS.items():
+        line = f"    - {label}: ${benchmarks.median(state, field):,.0f}" + ("/day" if field == 'rental_reimbursement' else "")
+        if field in percentiles:
+            line += f" (this policy: {_ordinal(round(percentiles[field]))} percentile)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def build_analysis_prompt(policy_text, user_policy=None):
+    """Prompt asking for the structured JSON analysis, with state benchmarks when the state is known"""
+    return f"""
+    You are an expert auto insurance analyst. Analyze the following auto insurance policy information and provide a detailed comparison with the benchmarks below.
+
+    Policy Information:
+    {policy_text}
+
+    {benchmark_reference(user_policy)}
+
+    Please provide a detailed analysis in the following JSON format ONLY. Do not include any other text before or after the JSON:
+    {{
+        "policy_analysis": {{
+            "coverage_adequacy": "Brief assessment of coverage adequacy",
+            "cost_effectiveness": "Analysis of cost vs. value",
+            "risk_level": "Low/Medium/High risk assessment"
+        }},
+        "comparison": {{
+            "liability_adequacy": "Comparison with state liability benchmarks (US when the state is unknown)",
+            "deductible_analysis": "Analysis of deductible levels",
+            "premium_analysis": "Premium comparison with state benchmarks (US when the state is unknown)"
+        }},
+        "recommendations": [
+            "Specific recommendation 1",
+            "Specific recommendation 2",
+            "Specific recommendation 3"
+        ],
+        "risk_assessment": "Detailed risk assessment",
+        "overall_score": 7
+    }}
+
+    IMPORTANT: Respond with ONLY valid JSON. No additional text, explanations, or formatting outside the JSON structure.
+    """
+
+
+def build_simple_prompt(policy_text):
+    """Prompt for the free-text fallback analysis"""
+    return f"""
+    Analyze this auto insurance policy and provide a brief assessment:
+
+    {policy_text}
+
+    Provide a simple analysis covering:
+    1. Coverage adequacy
+    2. Cost effectiveness
+    3. Risk level
+    4. Key recommendations
+    """
+
+
+def parse_analysis_response(response_text):
+    """Extract the analysis JSON object from a model response, repairing it if needed"""
+    with span("parse"):
+        return _parse_analysis_response(response_text)
+
+
+def _parse_analysis_response(response_text):
+    response_text = (response_text or '').strip()
+    if not response_text:
+        raise ResponseParseError("Empty response from AI")
+
+    # Look for JSON content between curly braces
+    start_idx = response_text.find('{')
+    end_idx = response_text.rfind('}')
+    if start_idx == -1:
+        raise ResponseParseError("No JSON structure found in AI response")
+
+    json_text = response_text[start_idx:end_idx + 1] if end_idx > start_idx else response_text[start_idx:]
+    try:
+        analysis = json.loads(json_text)
+    except json.JSONDecodeError as json_error:
+        # Targeted repair (fences, trailing commas, truncation) before any retry
+        analysis = repair_json(response_text[start_idx:])
+        increment("json_repairs", outcome="failed" if analysis is None else "repaired")
+        if analysis is None:
+            raise ResponseParseError(f"JSON parsing error: {str(json_error)}",
+                                     hint=f"Attempted to parse: {json_text[:100]}...")
+    return check_analysis(analysis)
+
+
+def check_analysis(analysis):
+    """Validate a parsed analysis against the schema, keeping usable partial results"""
+    if not isinstance(analysis, dict):
+        raise ResponseParseError("AI response was not a JSON object")
+    analysis = coerce_analysis(analysis)
+    errors = validate_analysis(analysis)
+    if errors and not any(key in analysis for key in ANALYSIS_SECTIONS):
+        raise ResponseParseError("AI response did not match the analysis format",
+                                 hint="; ".join(errors[:3]))
+    return analysis
+
+
+# Models that rejected the JSON-mode generation config; asked for plain text instead
+_UNSTRUCTURED_MODELS = set()
+
+
+def _call_model(model, prompt, stream, structured, timeout=None):
+    model_name = getattr(model, 'model_name', None)
+    options = {"request_options": {"timeout": timeout}} if timeout else {}
+    if structured and AI_CONFIG.get('structured_output') and model_name not in _UNSTRUCTURED_MODELS:
+        try:
+            return model.generate_content(prompt, stream=stream,
+                                          generation_config=STRUCTURED_GENERATION_CONFIG, **options)
+        except google_exceptions.InvalidArgument:
+            # Older models (e.g. gemini-pro) do not support response schemas
+            _UNSTRUCTURED_MODELS.add(model_name)
+    return model.generate_content(prompt, stream=stream, **options)
+
+
+def _response_text(response):
+    try:
+        return response.text or ''
+    except Exception:
+        # Blocked or empty candidates raise on .text; callers surface that themselves
+        return ''
+
+
+def _record_generation(model_name, prompt, response_text, usage, seconds, stream):
+    """Timing, token counts and the answering model for one generate_content call"""
+    observe("generate", seconds, model=model_name, stream=stream)
+    increment("generate_calls", model=model_name)
+    # Gemini reports exact counts in usage_metadata; fakes and older SDKs fall back to the local estimate
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) or count_tokens(prompt)
+    response_tokens = getattr(usage, 'candidates_token_count', None) or count_tokens(response_text)
+    increment("tokens", prompt_tokens, model=model_name, direction="prompt")
+    increment("tokens", response_tokens, model=model_name, direction="response")
+
+
+class _MeteredStream:
+    """Chunks of a streamed response, recorded once consumed; routed_model names the model that answered"""
+
+    def __init__(self, response, model_name, prompt, started):
+        self.routed_model = model_name
+        self._chunks = self._meter(response, prompt, started)
+
+    def _meter(self, response, prompt, started):
+        texts, usage = [], None
+        for chunk in response:
+            texts.append(_response_text(chunk))
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            yield chunk
+        _record_generation(self.routed_model, prompt, ''.join(texts), usage, time.perf_counter() - started, True)
+
+    def __iter__(self):
+        return self._chunks
+
+
+def answered_by(model, response):
+    """Name of the model that produced response: the routed one behind a ModelRouter"""
+    return getattr(response, 'routed_model', None) or getattr(model, 'model_name', None)
+
+
+def answering_models(analysis):
+    """Model name(s) recorded in an analysis's prompt_stats, or None"""
+    return ((analysis or {}).get('prompt_stats') or {}).get('model')
+
+
+def _joined_models(analyses):
+    return ', '.join(sorted({answering_models(analysis) for analysis in analyses} - {None})) or None
+
+
+def generate(model, prompt, stream=False, structured=True):
+    """Call the model, using JSON mode with the analysis schema where supported
+
+    Every call is timed and its token counts recorded; streamed calls are
+    recorded once the stream has been consumed. Calls go through the shared
+    CallGuard (rate limit, retries, timeout, circuit breaker); a stream is
+    only retried if it fails before it starts. A model that guards each of
+    its own attempts (ModelRouter) is called directly.
+    """
+    model_name = getattr(model, 'model_name', None)
+    started = time.perf_counter()
+    try:
+        if getattr(model, 'guards_calls', False):
+            response = _call_model(model, prompt, stream, structured)
+        else:
+            response = get_call_guard().call(lambda timeout: _call_model(model, prompt, stream, structured, timeout))
+    except Exception:
+        increment("generate_errors", model=model_name)
+        raise
+    # A ModelRouter reports which of its models answered
+    model_name = getattr(response, 'routed_model', None) or model_name
+    if stream:
+        return _MeteredStream(response, model_name, prompt, started)
+    _record_generation(model_name, prompt, _response_text(response), getattr(response, 'usage_metadata', None),
+                       time.perf_counter() - started, False)
+    return response
+
+
+def prepare_policy_text(policy_text):
+    """Compact the policy for prompting; returns (sections, compacted_text, stats)"""
+    with span("prompt_build"):
+        if PROMPT_CONFIG['compaction']:
+            sections = compact_sections(policy_text)
+        else:
+            sections = [(None, policy_text.strip())]
+        compacted, stats = compact_policy_text(policy_text, sections)
+    stats["mode"] = "map_reduce" if stats["prompt_tokens"] > PROMPT_CONFIG['token_budget'] else "single"
+    return sections, compacted, stats
+
+
+def _analyze_prompt(policy_text, model, user_policy=None):
+    return _analyze_built_prompt(build_analysis_prompt(policy_text, user_policy), model)
+
+
+def _analyze_built_prompt(prompt, model):
+    try:
+        response = generate(model, prompt)
+        response_text = response.text
+    except Exception as e:
+        raise model_call_error("Error analyzing policy", e)
+    analysis = parse_analysis_response(response_text)
+    analysis["prompt_stats"] = {"model": answered_by(model, response)}
+    return analysis
+
+
+def analyze_policy_map_reduce(sections, model, stats, user_policy=None):
+    """Analyze over-budget policies chunk by chunk in parallel and merge the results"""
+    chunks = chunk_sections(sections)
+    with ThreadPoolExecutor(max_workers=PROMPT_CONFIG['map_workers']) as pool:
+        futures = [pool.submit(_analyze_prompt, chunk, model, user_policy) for chunk in chunks]
+    analyses, weights, errors = [], [], []
+    for chunk, future in zip(chunks, futures):
+        try:
+            analyses.append(future.result())
+            weights.append(count_tokens(chunk))
+        except AnalysisError as e:
+            errors.append(e)
+    if not analyses:
+        raise errors[0]
+    models = _joined_models(analyses)
+    analysis = merge_analyses(analyses, weights)
+    analysis["prompt_stats"] = dict(stats, chunks=len(chunks), failed_chunks=len(errors), model=models)
+    return analysis
+
+
+def analyze_policy_with_gemini(policy_text, model):
+    """Analyze policy using Gemini AI"""
+    sections, compacted, stats = prepare_policy_text(policy_text)
+    # Fields come from the full text: compaction may drop the line naming the state
+    user_policy = extract_policy_fields(policy_text)
+    if stats["mode"] == "map_reduce":
+        return analyze_policy_map_reduce(sections, model, stats, user_policy)
+    analysis = _analyze_prompt(compacted, model, user_policy)
+    analysis["prompt_stats"] = dict(stats, model=answering_models(analysis))
+    return analysis
+
+
+def analyze_policy_streaming(policy_text, model, on_section=None):
+    """Analyze policy with a streamed response, reporting sections as they complete
+
+    on_section(path, value) is called for each finished top-level field and
+    each finished recommendation; the full analysis dict is returned at the end.
+    Over-budget policies use map-reduce and report all sections once merged.
+    """
+    sections, compacted, stats = prepare_policy_text(policy_text)
+    user_policy = extract_policy_fields(policy_text)
+    if stats["mode"] == "map_reduce":
+        analysis = analyze_policy_map_reduce(sections, model, stats, user_policy)
+        if on_section:
+            for key, value in analysis.items():
+                on_section((key,), value)
+        return analysis
+
+    prompt = build_analysis_prompt(compacted, user_policy)
+    parser = IncrementalJSONParser()
+    chunks = []
+    try:
+        response = generate(model, prompt, stream=True)
+        stream = iter(response)
+    except Exception as e:
+        raise model_call_error("Error analyzing policy", e)
+    while True:
+        # Only the model call and the stream are wrapped: on_section may raise JobCancelled,
+        # which is not a model failure
+        try:
+            chunk_text = next(stream).text
+        except StopIteration:
+            break
+        except Exception as e:
+            raise model_call_error("Error analyzing policy", e)
+        chunks.append(chunk_text)
+        for path, value in parser.feed(chunk_text):
+            if on_section:
+                on_section(path, value)
+    analysis = parse_analysis_response(''.join(chunks))
+    analysis["prompt_stats"] = dict(stats, model=answered_by(model, response))
+    return analysis
+
+
+def _block_prompts(policy_text):
+    """(sections, [(block, prompt)]) for block-by-block analysis"""
+    if PROMPT_CONFIG['compaction']:
+        sections = compact_sections(policy_text)
+    else:
+        sections = [(None, policy_text.strip())]
+    # Each block is benchmarked on its own values, plus the state named anywhere in the document
+    state = extract_policy_fields(policy_text).get('state')
+    prompts = []
+    for block in section_blocks(sections):
+        block_policy = extract_policy_fields(block)
+        if state:
+            block_policy['state'] = state
+        prompts.append((block, build_analysis_prompt(block, block_policy)))
+    return sections, prompts
+
+
+def _block_key(prompt, model_name):
+    return cache_key(prompt, model_name, PROMPT_VERSION, kind="section")
+
+
+def incremental_pays_off(policy_text, model_name, cache=None):
+    """Whether block-by-block analysis beats one streamed call for this text
+
+    It does when the document spans several blocks, or when a block's
+    findings are already cached; a single uncached block is better served by
+    the streamed full prompt.
+    """
+    _, prompts = _block_prompts(policy_text)
+    if len(prompts) > 1:
+        return True
+    return cache is not None and any(cache.contains(_block_key(prompt, model_name)) for _, prompt in prompts)
+
+
+def analyze_policy_incremental(policy_text, model, cache=None, on_section=None, model_name=None):
+    """Analyze policy block by block, reusing cached findings for blocks that have not changed
+
+    The text is split into content-defined blocks (see section_blocks); each
+    block's analysis is cached under a hash of its prompt, so after an edit only
+    the changed blocks reach the model. The merged analysis is reported to
+    on_section once every block is in.
+    """
+    model_name = model_name or getattr(model, 'model_name', None)
+    sections, prompts = _block_prompts(policy_text)
+    _, stats = compact_policy_text(policy_text, sections)
+
+    analyses, fresh = {}, []
+    for index, (_, prompt) in enumerate(prompts):
+        key = _block_key(prompt, model_name)
+        analysis = cache.get(key) if cache is not None else None
+        if analysis is None:
+            fresh.append((index, key))
+        else:
+            analyses[index] = analysis
+
+    errors = []
+    if fresh:
+        with ThreadPoolExecutor(max_workers=PROMPT_CONFIG['map_workers']) as pool:
+            futures = [(index, key, pool.submit(_analyze_built_prompt, prompts[index][1], model))
+                       for index, key in fresh]
+        for index, key, future in futures:
+            try:
+                analyses[index] = future.result()
+            except AnalysisError as e:
+                errors.append(e)
+                continue
+            if cache is not None:
+                cache.put(key, analyses[index])
+    increment("section_analyses", len(prompts) - len(fresh), cache="hit")
+    increment("section_analyses", len(fresh), cache="miss")
+    if not analyses:
+        raise errors[0]
+
+    ordered = sorted(analyses)
+    analysis = merge_analyses([analyses[index] for index in ordered],
+                              [count_tokens(prompts[index][0]) for index in ordered])
+    analysis["prompt_stats"] = dict(stats, mode="incremental", blocks=len(prompts),
+                                    reused_blocks=len(prompts) - len(fresh), failed_blocks=len(errors),
+                                    model=_joined_models(analyses.values()))
+    if on_section:
+        for key, value in analysis.items():
+            on_section((key,), value)
+    return analysis
+
+
+def analyze_policy_simple(policy_text, model):
+    """Simple analysis without JSON parsing as fallback"""
+    prompt = build_simple_prompt(policy_text)
+    try:
+        response = generate(model, prompt, structured=False)
+        response_text = response.text
+    except Exception as e:
+        raise model_call_error("Fallback analysis also failed", e)
+    return {
+        "policy_analysis": {
+            "coverage_adequacy": "Analysis provided by AI",
+            "cost_effectiveness": "Cost analysis completed",
+            "risk_level": "Risk assessment provided"
+        },
+        "comparison": {
+            "liability_adequacy": "Compared with state benchmarks (US when the state is unknown)",
+            "deductible_analysis": "Deductible analysis completed",
+            "premium_analysis": "Premium comparison done"
+        },
+        "recommendations": ["Review your policy with an insurance agent", "Consider increasing coverage if needed", "Shop around for better rates"],
+        "risk_assessment": response_text,
+        "overall_score": 6,
+        "prompt_stats": {"model": answered_by(model, response)}
+    }
+
+
+def cached_analysis(kind, policy_text, model_name, analyze, cache=None):
+    """Return a cached analysis for this text/prompt/model, or compute and store it"""
+    if cache is None:
+        increment("analyses", kind=kind, cache="off")
+        return analyze(policy_text)
+
+    key = cache_key(policy_text, model_name, PROMPT_VERSION, kind)
+    analysis = cache.get(key)
+    if analysis is not None:
+        increment("analyses", kind=kind, cache="hit")
+        return analysis
+
+    increment("analyses", kind=kind, cache="miss")
+    analysis = analyze(policy_text)
+    if analysis:
+        cache.put(key, analysis)
+    return analysis
@@ -0,0 +1,134 @@
+"""
+Rule-based policy field extraction for Auto Policy AI Analyzer
+Parses policy text into the same nested structure the Manual Entry tab builds,
+so numeric comparisons never need an LLM call
+"""
+
+import re
+
+# Section headings such as "LIABILITY COVERAGE (Required by Louisiana Law):"
+_HEADING_RE = re.compile(r'^\s*([A-Za-z][A-Za-z /&\-]*?)\s*(?:\([^)]*\))?\s*:\s*$')
+# Line items such as "- Bodily Injury: $25,000 per person / $50,000 per accident"
+_ITEM_RE = re.compile(r'^\s*[-•*]?\s*([A-Za-z][A-Za-z /&\-]*?)\s*:\s*(.+?)\s*$')
+_BULLET_RE = re.compile(r'^\s*[-•*]\s*(.+?)\s*$')
+_AMOUNT_RE = re.compile(r'\$\s*(\d[\d,]*(?:\.\d+)?)')
+_SPLIT_LIMIT_RE = re.compile(r'\b(\d{1,4})/(\d{1,4})/(\d{1,4})\b')
+_NEGATIVE_RE = re.compile(r'\b(not included|no|none|declined|excluded)\b', re.IGNORECASE)
+
+# Ordered: the first keyword found in a heading or label decides its category
+_CATEGORY_KEYWORDS = (
+    ('uninsured', 'uninsured_motorist'),
+    ('underinsured', 'underinsured_motorist'),
+    ('liability', 'liability'),
+    ('collision', 'collision'),
+    ('comprehensive', 'comprehensive'),
+    ('medical', 'medical_payments'),
+    ('rental', 'rental_reimbursement'),
+    ('roadside', 'roadside_assistance'),
+    ('towing', 'towing'),
+    ('premium', 'premium'),
+    ('policy number', 'policy_number'),
+    ('state', 'state'),
+)
+
+
+def _category(text):
+    text = text.lower()
+    for keyword, category in _CATEGORY_KEYWORDS:
+        if keyword in text:
+            return category
+    return None
+
+
+def _amounts(value):
+    return [float(amount.replace(',', '')) for amount in _AMOUNT_RE.findall(value)]
+
+
+def _number(amount):
+    return int(amount) if amount.is_integer() else amount
+
+
+def _set(policy, path, value):
+    """Set a nested field unless an earlier line already did (first match wins)"""
+    target = policy
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    target.setdefault(path[-1], value)
+
+
+def _apply_line(policy, section, label, value):
+    label_lower = (label or '').lower()
+    category = _category(label_lower) if label else None
+    category = category or section
+    amounts = _amounts(value)
+
+    if category == 'policy_number' and label:
+        _set(policy, ('policy_number',), value)
+    elif category == 'state' and label_lower == 'state':
+        _set(policy, ('state',), value)
+    elif category == 'roadside_assistance':
+        _set(policy, ('roadside_assistance',), not _NEGATIVE_RE.search(value))
+    elif category == 'liability':
+        if 'property' in label_lower and amounts:
+            _set(policy, ('liability_coverage', 'property_damage', 'per_accident'), _number(amounts[0]))
+        elif len(amounts) >= 2:
+            _set(policy, ('liability_coverage', 'bodily_injury', 'per_person'), _number(amounts[0]))
+            _set(policy, ('liability_coverage', 'bodily_injury', 'per_accident'), _number(amounts[1]))
+        else:
+            # Split limits written as "15/30/25" (thousands)
+            split = _SPLIT_LIMIT_RE.search(value)
+            if split:
+                per_person, per_accident, property_damage = (int(n) * 1000 for n in split.groups())
+                _set(policy, ('liability_coverage', 'bodily_injury', 'per_person'), per_person)
+                _set(policy, ('liability_coverage', 'bodily_injury', 'per_accident'), per_accident)
+                _set(policy, ('liability_coverage', 'property_damage', 'per_accident'), property_damage)
+    elif category == 'uninsured_motorist':
+        if 'property' not in label_lower and len(amounts) >= 2:
+            _set(policy, ('uninsured_motorist', 'per_person'), _number(amounts[0]))
+            _set(policy, ('uninsured_motorist', 'per_accident'), _number(amounts[1]))
+    elif category in ('collision', 'comprehensive'):
+        if amounts:
+            _set(policy, (f'{category}_deductible',), _number(amounts[0]))
+    elif category in ('medical_payments', 'rental_reimbursement'):
+        if amounts:
+            _set(policy, (category,), _number(amounts[0]))
+    elif category == 'premium' and amounts:
+        if 'month' in label_lower:
+            _set(policy, ('monthly_premium',), amounts[0])
+        elif 'annual' in label_lower or 'year' in label_lower:
+            _set(policy, ('annual_premium',), amounts[0])
+
+
+def extract_policy_fields(policy_text):
+    """Parse policy text into the Manual Entry structure; missing fields are omitted"""
+    policy = {}
+    section = None
+    for line in (policy_text or '').splitlines():
+        if not line.strip():
+            continue
+        heading = _HEADING_RE.match(line)
+        if heading:
+            section = _category(heading.group(1))
+            continue
+        item = _ITEM_RE.match(line)
+        if item:
+            _apply_line(policy, section, item.group(1), item.group(2))
+            continue
+        bullet = _BULLET_RE.match(line)
+        if bullet and section:
+            _apply_line(policy, section, None, bullet.group(1))
+
+    # Mirror the Manual Entry tab, which derives the annual premium from the monthly one
+    if 'monthly_premium' in policy and 'annual_premium' not in policy:
+        policy['annual_premium'] = round(policy['monthly_premium'] * 12, 2)
+    elif 'annual_premium' in policy and 'monthly_premium' not in policy:
+        policy['monthly_premium'] = round(policy['annual_premium'] / 12, 2)
+    return policy
+
+
+def has_numeric_fields(policy):
+    """True if the extracted policy has anything worth charting"""
+    return any(key in policy for key in (
+        'liability_coverage', 'uninsured_motorist', 'comprehensive_deductible',
+        'collision_deductible', 'medical_payments', 'monthly_premium'
+    ))
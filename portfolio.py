@@ -0,0 +1,113 @@
+"""
+Portfolio analysis for Auto Policy AI Analyzer
+Extracts, scores and analyzes a set of policy files on a bounded worker pool,
+reporting each record as it finishes, and aggregates the set into a pandas
+table. No Streamlit dependency; pandas and NumPy load on first use.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import PORTFOLIO_CONFIG
+from policy_analyzer import AnalysisError, extract_text_from_file
+from policy_extractor import extract_policy_fields
+
+# Table column -> path into the extracted policy fields
+FIELD_COLUMNS = {
+    "bi_per_person": ("liability_coverage", "bodily_injury", "per_person"),
+    "bi_per_accident": ("liability_coverage", "bodily_injury", "per_accident"),
+    "property_damage": ("liability_coverage", "property_damage", "per_accident"),
+    "um_per_person": ("uninsured_motorist", "per_person"),
+    "comprehensive_deductible": ("comprehensive_deductible",),
+    "collision_deductible": ("collision_deductible",),
+    "monthly_premium": ("monthly_premium",),
+    "annual_premium": ("annual_premium",),
+}
+COLUMNS = ("file", "status", "state", "ai_score", "quick_score", *FIELD_COLUMNS, "risk_level", "seconds", "error")
+
+
+def _field_value(policy, path):
+    for key in path:
+        policy = policy.get(key) if isinstance(policy, dict) else None
+    return policy
+
+
+def analyze_file(name, path, analyze=None):
+    """One portfolio record: extracted fields, quick score and (if analyze is given) the AI analysis"""
+    from scoring import quick_score
+
+    started = time.perf_counter()
+    record = {"file": name, "status": "ok"}
+    try:
+        text = extract_text_from_file(path)
+    except Exception as e:
+        text = None
+        record["error"] = f"Could not read file: {e}"
+    if not text:
+        record.setdefault("error", "Could not extract text from file")
+        record.update(status="error", seconds=round(time.perf_counter() - started, 3))
+        return record
+
+    fields = extract_policy_fields(text)
+    score = quick_score(fields)
+    record.update(state=score["state"], quick_score=score["overall_score"])
+    record.update((column, _field_value(fields, path)) for column, path in FIELD_COLUMNS.items())
+    if analyze is not None:
+        try:
+            analysis = analyze(text)
+            record.update(ai_score=analysis.get("overall_score"),
+                          risk_level=(analysis.get("policy_analysis") or {}).get("risk_level"))
+        except AnalysisError as e:
+            record.update(status="error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_portfolio(job, files, analyze=None, workers=None):
+    """Background job: analyze [(name, path)] concurrently, publishing records as they finish
+
+    Progress holds 'total' and the finished 'records' in completion order.
+    The files are only read, never deleted.
+    """
+    job.set_progress("total", len(files))
+    job.set_progress("records", [])
+    records = []
+    with ThreadPoolExecutor(max_workers=workers or PORTFOLIO_CONFIG['workers'],
+                            thread_name_prefix='portfolio') as pool:
+        futures = [pool.submit(analyze_file, name, path, analyze) for name, path in files]
+        try:
+            for future in as_completed(futures):
+                records.append(future.result())
+                job.set_progress("records", list(records))
+                job.check_cancelled()
+        finally:
+            # Queued files are dropped on cancel; running ones finish on their own
+            for future in futures:
+                future.cancel()
+    return records
+
+
+def portfolio_frame(records):
+    """pandas DataFrame with one row per file and the COLUMNS in order"""
+    import pandas as pd
+    frame = pd.DataFrame(list(records), columns=list(COLUMNS))
+    numeric = ["ai_score", "quick_score", *FIELD_COLUMNS, "seconds"]
+    frame[numeric] = frame[numeric].apply(pd.to_numeric, errors="coerce")
+    return frame.sort_values("file", kind="stable").reset_index(drop=True)
+
+
+def portfolio_summary(frame):
+    """Headline numbers across the portfolio; missing values are skipped"""
+    def stat(value):
+        return None if value != value else round(float(value), 2)  # NaN -> None
+
+    analyzed = frame[frame["status"] == "ok"]
+    return {
+        "files": len(frame),
+        "analyzed": len(analyzed),
+        "failed": int((frame["status"] == "error").sum()),
+        "mean_ai_score": stat(analyzed["ai_score"].mean()),
+        "mean_quick_score": stat(analyzed["quick_score"].mean()),
+        "median_monthly_premium": stat(analyzed["monthly_premium"].median()),
+        "total_annual_premium": stat(analyzed["annual_premium"].sum(min_count=1)),
+    }
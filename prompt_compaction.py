@@ -0,0 +1,205 @@
+"""
+Prompt compaction for Auto Policy AI Analyzer
+Splits policy text into sections, drops repeated headers/footers and legal
+boilerplate, counts tokens locally, and groups sections into chunks for
+map-reduce analysis of documents that exceed the token budget, or into
+content-defined blocks for incremental re-analysis
+"""
+
+import hashlib
+import re
+
+from config import PROMPT_CONFIG
+
+# "LIABILITY COVERAGE (Required by Louisiana Law):" or an all-caps line such as "EXCLUSIONS"
+_HEADING_RE = re.compile(r'^\s*(?:([A-Za-z][A-Za-z /&\-]*?)\s*(?:\([^)]*\))?\s*:|([A-Z][A-Z /&\-]{2,60}))\s*$')
+_DIGITS_RE = re.compile(r'\d+')
+# Footers such as "Form PP 00 01 Page 3 of 80" repeat with a different page number
+_PAGE_MARKER_RE = re.compile(r'\bpage\s+\d+', re.IGNORECASE)
+# "Collision Deductible: 500/1000/2000" is data, however often it repeats (one per vehicle)
+_COVERAGE_VALUE_RE = re.compile(r'\b(?:coverages?|limits?|deductibles?|premiums?|liability|injury|damage|medical|'
+                                r'uninsured|underinsured|collision|comprehensive|rental|towing|roadside)\b.*\d',
+                                re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'[ \t]+')
+# Roughly how SentencePiece splits policy text: short letter runs, number groups, punctuation
+_TOKEN_RE = re.compile(r'[A-Za-z]{1,4}|\d{1,3}|[^\sA-Za-z\d]')
+# About one section in this many ends a block (see section_blocks)
+_BOUNDARY_EVERY = 3
+
+
+def count_tokens(text):
+    """Local token estimate (no API call); close to Gemini counts for English policy text"""
+    return len(_TOKEN_RE.findall(text or ''))
+
+
+def split_sections(text):
+    """Return [(heading, lines)] in document order; text before any heading has heading None"""
+    sections = [(None, [])]
+    for line in text.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading and '$' not in line:
+            sections.append(((heading.group(1) or heading.group(2)).strip(), [line.strip()]))
+        elif line.strip():
+            sections[-1][1].append(_WHITESPACE_RE.sub(' ', line.strip()))
+    return [(heading, lines) for heading, lines in sections if lines]
+
+
+def _boilerplate_key(line):
+    # Only page markers are compared without their digits; anything else must repeat verbatim
+    if _PAGE_MARKER_RE.search(line):
+        return _DIGITS_RE.sub('#', line.lower())
+    return line.lower()
+
+
+def find_repeated_lines(sections, min_repeats=None):
+    """Normalised lines that repeat like page headers or footers
+
+    Line items ("- ..."), lines with dollar amounts and coverage labels with a
+    number are never treated as boilerplate, since identical limits and
+    deductibles legitimately repeat across coverages and vehicles.
+    """
+    min_repeats = min_repeats or PROMPT_CONFIG['repeat_threshold']
+    counts = {}
+    for _, lines in sections:
+        for line in lines:
+            if line.startswith(('-', '•', '*')) or '$' in line or _COVERAGE_VALUE_RE.search(line):
+                continue
+            key = _boilerplate_key(line)
+            counts[key] = counts.get(key, 0) + 1
+    return {key for key, count in counts.items() if count >= min_repeats}
+
+
+def _is_dropped_section(heading):
+    heading = (heading or '').upper()
+    return any(keyword in heading for keyword in PROMPT_CONFIG['drop_sections'])
+
+
+def compact_sections(text):
+    """Sections with boilerplate removed, as [(heading, section_text)]"""
+    sections = split_sections(text)
+    repeated = find_repeated_lines(sections)
+    compacted = []
+    for heading, lines in sections:
+        if _is_dropped_section(heading):
+            continue
+        kept = [line for line in lines if _boilerplate_key(line) not in repeated]
+        # A section reduced to its own heading carries no information
+        if kept and not (heading and len(kept) == 1 and kept[0] == lines[0]):
+            compacted.append((heading, '\n'.join(kept)))
+    return compacted
+
+
+def compact_policy_text(text, sections=None):
+    """Compact policy text for a prompt; returns (compacted_text, stats)"""
+    sections = compact_sections(text) if sections is None else sections
+    compacted = '\n\n'.join(section_text for _, section_text in sections)
+    original_tokens = count_tokens(text)
+    compacted_tokens = count_tokens(compacted)
+    return compacted, {
+        "original_tokens": original_tokens,
+        "prompt_tokens": compacted_tokens,
+        "tokens_saved": original_tokens - compacted_tokens,
+        "sections": len(sections)
+    }
+
+
+def chunk_sections(sections, chunk_budget=None):
+    """Group consecutive sections into chunks of at most chunk_budget tokens
+
+    Sections larger than the budget on their own are split by line.
+    """
+    chunk_budget = chunk_budget or PROMPT_CONFIG['chunk_token_budget']
+    chunks, current, current_tokens = [], [], 0
+    for _, section_text in sections:
+        pieces = [section_text]
+        if count_tokens(section_text) > chunk_budget:
+            pieces = section_text.splitlines()
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and current_tokens + tokens > chunk_budget:
+                chunks.append('\n\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _is_boundary(section_text):
+    digest = hashlib.sha256(section_text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % _BOUNDARY_EVERY == 0
+
+
+def section_blocks(sections, max_tokens=None, min_tokens=None):
+    """Group consecutive sections into blocks whose boundaries follow their content
+
+    Once a block holds min_tokens, it ends after any section whose hash marks a
+    boundary. It also ends before a section that would push it past
+    max_tokens. Boundaries do not depend on running token counts, so editing
+    one section usually changes only its own block. Sections larger than
+    max_tokens are split by line. A final block under min_tokens joins the one
+    before it when they fit together, so short documents stay one block.
+    """
+    max_tokens = max_tokens or PROMPT_CONFIG['block_max_tokens']
+    min_tokens = PROMPT_CONFIG['block_min_tokens'] if min_tokens is None else min_tokens
+    blocks, current, current_tokens = [], [], 0
+    last_tokens = 0
+    for _, section_text in sections:
+        pieces = [section_text]
+        if count_tokens(section_text) > max_tokens:
+            pieces = section_text.splitlines()
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                blocks.append('\n\n'.join(current))
+                last_tokens, current, current_tokens = current_tokens, [], 0
+            current.append(piece)
+            current_tokens += tokens
+            if current_tokens >= min_tokens and _is_boundary(piece):
+                blocks.append('\n\n'.join(current))
+                last_tokens, current, current_tokens = current_tokens, [], 0
+    if current:
+        if blocks and current_tokens < min_tokens and last_tokens + current_tokens <= max_tokens:
+            blocks[-1] += '\n\n' + '\n\n'.join(current)
+        else:
+            blocks.append('\n\n'.join(current))
+    return blocks
+
+
+def merge_analyses(analyses, weights=None):
+    """Reduce per-chunk analyses into one analysis dict"""
+    weights = weights or [1] * len(analyses)
+    pairs = [(analysis, weight) for analysis, weight in zip(analyses, weights) if analysis]
+    if not pairs:
+        return None
+    analyses = [analysis for analysis, _ in pairs]
+    merged = {}
+
+    for section in ('policy_analysis', 'comparison'):
+        fields = {}
+        for analysis in analyses:
+            for key, value in (analysis.get(section) or {}).items():
+                if value and value not in fields.setdefault(key, []):
+                    fields[key].append(value)
+        if fields:
+            merged[section] = {key: ' '.join(values) for key, values in fields.items()}
+
+    recommendations = []
+    for analysis in analyses:
+        for rec in analysis.get('recommendations') or []:
+            if rec not in recommendations:
+                recommendations.append(rec)
+    if recommendations:
+        merged['recommendations'] = recommendations[:PROMPT_CONFIG['max_merged_recommendations']]
+
+    risks = [analysis['risk_assessment'] for analysis in analyses if analysis.get('risk_assessment')]
+    if risks:
+        merged['risk_assessment'] = '\n\n'.join(risks)
+
+    scored = [(analysis['overall_score'], weight) for analysis, weight in pairs
+              if isinstance(analysis.get('overall_score'), (int, float))]
+    if scored:
+        merged['overall_score'] = round(sum(score * weight for score, weight in scored)
+                                        / sum(weight for _, weight in scored))
+    return merged
@@ -0,0 +1,193 @@
+"""
+Deterministic policy scoring for Auto Policy AI Analyzer
+Scores limits, deductibles and premiums against US averages (state medians
+when the state is known) with NumPy, a whole array of policies at a time, so a
+quick score needs no AI call
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from benchmark_data import get_benchmarks
+from config import SCORE_CONFIG, US_AVERAGES
+
+# (field, group, path into the policy dict, higher_is_better), one column per field
+SCORE_FIELDS = (
+    ('bodily_injury_per_person', 'liability', ('liability_coverage', 'bodily_injury', 'per_person'), True),
+    ('bodily_injury_per_accident', 'liability', ('liability_coverage', 'bodily_injury', 'per_accident'), True),
+    ('property_damage', 'liability', ('liability_coverage', 'property_damage', 'per_accident'), True),
+    ('uninsured_per_person', 'uninsured_motorist', ('uninsured_motorist', 'per_person'), True),
+    ('uninsured_per_accident', 'uninsured_motorist', ('uninsured_motorist', 'per_accident'), True),
+    ('medical_payments', 'additional_coverage', ('medical_payments',), True),
+    ('rental_reimbursement', 'additional_coverage', ('rental_reimbursement',), True),
+    ('comprehensive_deductible', 'deductibles', ('comprehensive_deductible',), False),
+    ('collision_deductible', 'deductibles', ('collision_deductible',), False),
+    ('monthly_premium', 'premium', ('monthly_premium',), False),
+)
+
+FIELDS = tuple(field for field, _, _, _ in SCORE_FIELDS)
+GROUPS = tuple(SCORE_CONFIG['weights'])
+
+_HIGHER_IS_BETTER = np.array([higher for _, _, _, higher in SCORE_FIELDS])
+# (fields, groups) 0/1 matrix: field scores @ membership sums each group
+_MEMBERSHIP = np.array([[group == name for name in GROUPS] for _, group, _, _ in SCORE_FIELDS], dtype=float)
+_WEIGHTS = np.array([SCORE_CONFIG['weights'][name] for name in GROUPS], dtype=float)
+
+
+def _field_value(policy, path):
+    for key in path:
+        policy = policy.get(key) if isinstance(policy, dict) else None
+    if isinstance(policy, bool) or not isinstance(policy, (int, float)):
+        return np.nan
+    return policy
+
+
+def policy_matrix(policies):
+    """(policies, fields) float array of the scored fields; missing values are NaN"""
+    return np.array([[_field_value(policy, path) for _, _, path, _ in SCORE_FIELDS] for policy in policies],
+                    dtype=float).reshape(len(policies), len(SCORE_FIELDS))
+
+
+def normalize_state(state):
+    """State code for a name or postal code in the benchmark data; None if unknown"""
+    return get_benchmarks().normalize_state(state)
+
+
+def _average_table(us_averages, state_averages):
+    """Row 0 holds the US averages, row i + 1 those of state i overlaid on them"""
+    table = np.array([[_field_value(us_averages, path) for _, _, path, _ in SCORE_FIELDS]] * (len(state_averages) + 1))
+    for row, name in enumerate(state_averages, 1):
+        for column, (_, _, path, _) in enumerate(SCORE_FIELDS):
+            value = _field_value(state_averages[name], path)
+            if not np.isnan(value):
+                table[row, column] = value
+    return table
+
+
+@lru_cache(maxsize=1)
+def _default_state_averages():
+    benchmarks = get_benchmarks()
+    return {code: benchmarks.medians(code) for code in benchmarks.states()}
+
+
+@lru_cache(maxsize=1)
+def _default_average_table():
+    return _average_table(US_AVERAGES, _default_state_averages())
+
+
+def average_matrix(states, us_averages=None, state_averages=None):
+    """(policies, fields) averages: US values, or the state's medians when it is known
+
+    state_averages maps state codes to policy-shaped dicts and defaults to the
+    benchmark data; states may be names or postal codes.
+    """
+    if us_averages is None and state_averages is None:
+        table = _default_average_table()
+    else:
+        table = _average_table(us_averages or US_AVERAGES,
+                               _default_state_averages() if state_averages is None else state_averages)
+    rows = {code: row for row, code in enumerate(_default_state_averages() if state_averages is None
+                                                 else state_averages, 1)}
+    index = np.array([rows.get(normalize_state(state), 0) for state in states], dtype=np.intp)
+    return table[index]
+
+
+def score_arrays(values, averages):
+    """Vectorized scores for (policies, fields) values against matching averages
+
+    ratio is value / average for limits and average / value for deductibles and
+    premiums, so above 1 is always better than average. Field scores are 0-10,
+    5 at the average; group and overall scores are NaN when nothing is known.
+    """
+    values = np.asarray(values, dtype=float)
+    averages = np.asarray(averages, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(_HIGHER_IS_BETTER, values / averages, averages / values)
+        # A $0 deductible is as good as it gets; a zero limit scores 0 through log2(0) = -inf
+        ratio = np.where(~_HIGHER_IS_BETTER & (values == 0), np.inf, ratio)
+        field_scores = np.clip(5 + SCORE_CONFIG['points_per_doubling'] * np.log2(ratio), 0, 10)
+
+    known = ~np.isnan(field_scores)
+    counts = known @ _MEMBERSHIP
+    with np.errstate(invalid='ignore'):
+        group_scores = np.where(known, field_scores, 0) @ _MEMBERSHIP / counts
+        scored = counts > 0
+        overall = np.where(scored, group_scores, 0) @ _WEIGHTS / (scored @ _WEIGHTS)
+    return {
+        "ratio": ratio,
+        "field_scores": field_scores,
+        "adequate": ratio >= SCORE_CONFIG['adequate_ratio'],
+        "group_scores": group_scores,
+        "overall": overall
+    }
+
+
+def score_policies(policies, states=None):
+    """Score a list of policy dicts at once; states default to each policy's 'state' field"""
+    if states is None:
+        states = [policy.get('state') for policy in policies]
+    return score_arrays(policy_matrix(policies), average_matrix(states))
+
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def quick_score(policy, state=None):
+    """Score one policy: overall 0-10 score, per-group scores and per-field ratios"""
+    state = normalize_state(state or policy.get('state'))
+    scores = score_policies([policy], [state])
+    ratio, field_scores, adequate = scores["ratio"][0], scores["field_scores"][0], scores["adequate"][0]
+    return {
+        "overall_score": _rounded(scores["overall"][0]),
+        "state": get_benchmarks().state_name(state),
+        "groups": {name: _rounded(value) for name, value in zip(GROUPS, scores["group_scores"][0])},
+        "fields": {field: {"ratio": round(float(ratio[i]), 2), "score": _rounded(field_scores[i]),
+                           "adequate": bool(adequate[i])}
+                   for i, field in enumerate(FIELDS) if not np.isnan(field_scores[i])}
+    }
+
+
+def sweep(policy, axes, state=None):
+    """Score every combination of axis settings applied to policy, in one vectorized pass
+
+    axes is a list of (fields, settings) pairs; each setting gives a value for
+    every field on that axis, e.g. (('comprehensive_deductible',
+    'collision_deductible'), [(250, 250), (500, 500)]). Returns overall and
+    group scores shaped (len(settings) per axis..., [groups]).
+    """
+    base = policy_matrix([policy])[0]
+    shape = tuple(len(settings) for _, settings in axes)
+    values = np.broadcast_to(base, shape + base.shape).copy()
+    for axis, (fields, settings) in enumerate(axes):
+        settings = np.asarray(settings, dtype=float).reshape(len(settings), len(fields))
+        along_axis = [1] * len(shape)
+        along_axis[axis] = len(settings)
+        for column, field in enumerate(fields):
+            values[..., FIELDS.index(field)] = settings[:, column].reshape(along_axis)
+
+    flat = values.reshape(-1, len(FIELDS))
+    averages = np.broadcast_to(average_matrix([state or policy.get('state')]), flat.shape)
+    scores = score_arrays(flat, averages)
+    return {
+        "overall": scores["overall"].reshape(shape),
+        "group_scores": scores["group_scores"].reshape(shape + (len(GROUPS),))
+    }
+
+
+def sensitivity(policy, factors, state=None):
+    """Overall score with each known field scaled by each factor, one field at a time
+
+    Returns (fields, scores) where scores is shaped (fields, factors); fields
+    the policy does not have are left out.
+    """
+    base = policy_matrix([policy])[0]
+    fields = [field for field, value in zip(FIELDS, base) if not np.isnan(value)]
+    columns = [FIELDS.index(field) for field in fields]
+    factors = np.asarray(factors, dtype=float)
+    values = np.broadcast_to(base, (len(fields), len(factors), len(FIELDS))).copy()
+    values[np.arange(len(fields)), :, columns] = base[columns, None] * factors
+    flat = values.reshape(-1, len(FIELDS))
+    averages = np.broadcast_to(average_matrix([state or policy.get('state')]), flat.shape)
+    return fields, score_arrays(flat, averages)["overall"].reshape(len(fields), len(factors))
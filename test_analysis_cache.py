@@ -0,0 +1,51 @@
+"""
+Tests for the persistent analysis cache
+"""
+
+import time
+
+from analysis_cache import AnalysisCache, cache_key
+
+
+def test_key_ignores_whitespace_but_not_model_or_prompt_version():
+    key = cache_key("Bodily Injury:  $50,000\n", "gemini-pro", 1)
+    assert key == cache_key("  Bodily Injury: $50,000", "gemini-pro", 1)
+    assert key != cache_key("Bodily Injury: $50,000", "gemini-1.5-pro", 1)
+    assert key != cache_key("Bodily Injury: $50,000", "gemini-pro", 2)
+    assert key != cache_key("Bodily Injury: $50,000", "gemini-pro", 1, kind="simple")
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("k") is None
+    cache.put("k", {"overall_score": 7})
+    assert cache.get("k") == {"overall_score": 7}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_ttl_expiry(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), ttl=0.01)
+    cache.put("k", {"overall_score": 7})
+    time.sleep(0.05)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_entry_count(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+
+
+def test_eviction_by_size(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), max_bytes=300)
+    for i in range(10):
+        cache.put(str(i), {"risk_assessment": "x" * 100})
+    assert cache.stats()["bytes"] <= 300
+    assert cache.get("9") is not None
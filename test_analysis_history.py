@@ -0,0 +1,87 @@
+"""
+Tests for the analysis history store
+"""
+
+import time
+
+from analysis_history import AnalysisHistory
+
+DAY = 24 * 60 * 60
+# Noon local time, so day buckets do not depend on the test machine's timezone
+NOON = time.mktime((2026, 3, 10, 12, 0, 0, 0, 0, -1))
+
+
+def analysis(score, risk="Medium"):
+    return {"overall_score": score, "policy_analysis": {"risk_level": risk}, "recommendations": ["Raise limits"]}
+
+
+def fill(history, count=120):
+    """count records over count / 10 days, alternating Texas and Ohio"""
+    for number in range(count):
+        fields = {"policy_number": f"PN-{number:04d}", "state": "Texas" if number % 2 else "OH",
+                  "monthly_premium": 100 + number}
+        history.record(f"Policy {number}", analysis(number % 10), fields, source="manual",
+                       model_name="gemini-pro", created_at=NOON + (number // 10) * DAY + number)
+
+
+def test_record_extracts_fields_and_replaces_repeats(tmp_path):
+    history = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    text = open("test_policy_basic.txt").read()
+    first = history.record(text, analysis(6), source="upload", model_name="gemini-pro")
+    record = history.get(first)
+    assert record["score"] == 6 and record["risk_level"] == "Medium" and record["source"] == "upload"
+    assert record["fields"]["liability_coverage"]["bodily_injury"]["per_person"] == 25000
+    assert record["analysis"]["recommendations"] == ["Raise limits"]
+
+    # Same text and model: the record is updated, not duplicated
+    assert history.record(text + "\n", analysis(8), source="upload", model_name="gemini-pro") == first
+    assert history.get(first)["score"] == 8
+    history.record(text, analysis(7), source="upload", model_name="gemini-1.5-pro")
+    assert history.count() == 2
+    assert history.get(first + 100) is None
+
+
+def test_keyset_pages_cover_every_match_once(tmp_path):
+    history = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    fill(history)
+    seen, before = [], None
+    while True:
+        rows = history.page(limit=25, before=before, state="tx")
+        if not rows:
+            break
+        seen += [row["id"] for row in rows]
+        before = (rows[-1]["created_at"], rows[-1]["id"])
+    assert len(seen) == len(set(seen)) == history.count(state="TX") == 60
+    assert all(row["state"] == "TX" for row in history.page(limit=5, state="Texas"))
+    assert "analysis" not in history.page(limit=1)[0]
+
+    plan = " ".join(row[-1] for row in history._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM history WHERE (created_at, id) < (?, ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT 25", (NOON, 1)))
+    assert "SEARCH" in plan and "idx_history_created" in plan
+
+
+def test_filters_use_indexes(tmp_path):
+    history = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    fill(history)
+    assert history.count(policy_number="PN-001") == 10
+    assert history.count(min_score=8, max_score=9) == 24
+    assert history.count(since=NOON + 11 * DAY) == 10
+    plan = " ".join(row[-1] for row in history._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM history WHERE policy_number >= ? AND policy_number < ?",
+        ("PN-001", "PN-001\U0010ffff")))
+    assert "idx_history_policy_number" in plan
+
+
+def test_trends_and_states_aggregate_in_sql(tmp_path):
+    history = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    fill(history, count=30)
+    trends = history.trends("day")
+    assert [row["period"] for row in trends] == ["2026-03-10", "2026-03-11", "2026-03-12"]
+    assert [row["analyses"] for row in trends] == [10, 10, 10]
+    assert trends[0]["mean_score"] == 4.5
+    assert trends[0]["mean_monthly_premium"] == 104.5
+    assert [row["period"] for row in history.trends("month")] == ["2026-03"]
+
+    states = {row["state"]: row["analyses"] for row in history.by_state()}
+    assert states == {"TX": 15, "OH": 15}
@@ -0,0 +1,68 @@
+"""
+Tests for the background analysis job manager
+"""
+
+import threading
+
+import pytest
+
+from analysis_jobs import CANCELLED, DONE, FAILED, QUEUED, JobLimitExceeded, JobManager
+
+
+def wait(job):
+    if not job.future.cancelled():
+        job.future.result(timeout=5)
+    return job
+
+
+def test_same_key_reuses_job_across_reruns():
+    manager = JobManager(workers=1)
+    calls = []
+    job = wait(manager.submit("s1", "policy", lambda job: calls.append(1) or {"overall_score": 7}))
+    again = manager.submit("s1", "policy", lambda job: calls.append(1))
+    assert again is job and job.status == DONE and job.result == {"overall_score": 7}
+    assert calls == [1]
+    assert manager.submit("s2", "policy", lambda job: 1) is not job
+    manager.shutdown()
+
+
+def test_per_session_limit_and_queued_cancel():
+    manager = JobManager(workers=1, max_per_session=2)
+    release = threading.Event()
+    running = manager.submit("s1", "a", lambda job: release.wait(5))
+    queued = manager.submit("s1", "b", lambda job: "never")
+    with pytest.raises(JobLimitExceeded):
+        manager.submit("s1", "c", lambda job: None)
+    assert queued.status == QUEUED and manager.queue_position(queued) == 0
+    queued.cancel()
+    assert queued.status == CANCELLED
+    release.set()
+    assert wait(running).status == DONE
+    manager.shutdown()
+
+
+def test_running_job_stops_at_checkpoint():
+    manager = JobManager(workers=1)
+    started, proceed = threading.Event(), threading.Event()
+
+    def work(job):
+        started.set()
+        proceed.wait(5)
+        job.check_cancelled()
+        return "finished"
+
+    job = manager.submit("s1", "a", work)
+    started.wait(5)
+    job.cancel()
+    proceed.set()
+    assert wait(job).status == CANCELLED and job.result is None
+    manager.shutdown()
+
+
+def test_failure_is_captured_and_can_be_retried():
+    manager = JobManager(workers=1)
+    failed = wait(manager.submit("s1", "a", lambda job: 1 / 0))
+    assert failed.status == FAILED and isinstance(failed.error, ZeroDivisionError)
+    retry = wait(manager.submit("s1", "a", lambda job: job.set_progress("overall_score", 5) or "ok"))
+    assert retry is not failed and retry.status == DONE and retry.progress() == {"overall_score": 5}
+    manager.shutdown()
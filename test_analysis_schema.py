@@ -0,0 +1,53 @@
+"""
+Tests for analysis validation and JSON repair
+"""
+
+import json
+
+import pytest
+
+from analysis_schema import repair_json, repair_stats, validate_analysis
+from fake_model import DEFAULT_ANALYSIS, FakeGenerativeModel
+from policy_analyzer import ResponseParseError, analyze_policy_with_gemini, parse_analysis_response
+
+
+def test_validator_accepts_default_analysis_and_reports_paths():
+    assert validate_analysis(DEFAULT_ANALYSIS) == []
+    broken = dict(DEFAULT_ANALYSIS, recommendations=["ok", 3])
+    del broken["comparison"]
+    assert validate_analysis(broken) == ["$.comparison: missing", "$.recommendations[]: expected string, got int"]
+
+
+def test_trailing_commas_and_fences_are_repaired():
+    text = '```json\n{"recommendations": ["a", "b",], "overall_score": 8,}\n```'
+    assert repair_json(text) == {"recommendations": ["a", "b"], "overall_score": 8}
+
+
+def test_truncated_response_keeps_complete_members():
+    full = json.dumps(DEFAULT_ANALYSIS)
+    truncated = full[:full.index('"risk_assessment"') + 30]
+    repaired = repair_json(truncated)
+    assert repaired["policy_analysis"] == DEFAULT_ANALYSIS["policy_analysis"]
+    assert repaired["recommendations"] == DEFAULT_ANALYSIS["recommendations"]
+
+
+def test_repair_is_counted():
+    before = repair_stats()
+    repair_json('{"overall_score": 7,}')
+    repair_json('no json here')
+    after = repair_stats()
+    assert after["attempts"] == before["attempts"] + 2
+    assert after["successes"] == before["successes"] + 1
+
+
+def test_parse_coerces_score_and_rejects_unrelated_objects():
+    assert parse_analysis_response('{"overall_score": "8/10"}') == {"overall_score": 8}
+    with pytest.raises(ResponseParseError):
+        parse_analysis_response('{"answer": 42}')
+
+
+def test_malformed_response_needs_no_second_call():
+    model = FakeGenerativeModel(response_text=json.dumps(DEFAULT_ANALYSIS)[:-40])
+    analysis = analyze_policy_with_gemini("Monthly Premium: $150", model)
+    assert analysis["policy_analysis"] == DEFAULT_ANALYSIS["policy_analysis"]
+    assert model.calls == 1
@@ -0,0 +1,73 @@
+"""
+Tests for the async HTTP analysis service
+Runs the aiohttp app in-process against a FakeGenerativeModel
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+from analysis_history import AnalysisHistory
+from analysis_service import create_app
+from call_guard import CallGuard
+from fake_model import DEFAULT_ANALYSIS, FakeGenerativeModel
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    # Not throttled by the process-wide rate limit other tests have drawn down
+    guard = CallGuard(requests_per_minute=60000, burst=100)
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: guard)
+    monkeypatch.setattr("analysis_service.get_call_guard", lambda: guard)
+
+
+def serve(model, check, **kwargs):
+    """Run check(client) against the service app"""
+    async def run():
+        async with TestClient(TestServer(create_app(model, model.model_name, **kwargs))) as client:
+            await check(client)
+    asyncio.run(run())
+
+
+def test_text_and_file_analysis(tmp_path):
+    model = FakeGenerativeModel()
+    history = AnalysisHistory(str(tmp_path / "history.sqlite3"))
+    policy = open("test_policy_basic.txt", "rb").read()
+
+    async def check(client):
+        response = await client.post("/v1/analyze", json={"text": policy.decode()})
+        assert response.status == 200
+        body = await response.json()
+        assert body["analysis"]["overall_score"] == DEFAULT_ANALYSIS["overall_score"]
+        assert body["policy"]["liability_coverage"]["bodily_injury"]["per_person"] == 25000
+
+        form = FormData()
+        form.add_field("file", policy, filename="policy.txt", content_type="text/plain")
+        response = await client.post("/v1/extract/file", data=form)
+        assert (await response.json())["text"].startswith(policy.decode().strip()[:20])
+
+        assert (await client.post("/v1/analyze", json={"text": " "})).status == 400
+        assert (await client.post("/v1/analyze/file", data=FormData({"other": "x"}))).status == 400
+        assert "policyai_service_requests_total" in await (await client.get("/metrics")).text()
+
+    serve(model, check, history=history)
+    assert model.calls == 1
+    assert [row["source"] for row in history.page()] == ["service"]
+
+
+def test_saturated_service_answers_429():
+    model = FakeGenerativeModel(latency=0.3)
+
+    async def check(client):
+        responses = await asyncio.gather(*[client.post("/v1/analyze", data=f"Policy {number}")
+                                           for number in range(4)])
+        statuses = sorted(response.status for response in responses)
+        assert statuses == [200, 200, 429, 429]
+        assert [r.headers.get("Retry-After") for r in responses if r.status == 429] == ["1", "1"]
+        assert (await (await client.get("/healthz")).json())["in_flight"] == 0
+
+    serve(model, check, concurrency=1, queue_limit=1)
@@ -0,0 +1,90 @@
+"""
+Tests for the headless batch analyzer
+Runs against the bundled test policies with a fake model, no API key needed
+"""
+
+import asyncio
+import glob
+import json
+import shutil
+
+import pytest
+
+from analysis_cache import AnalysisCache
+from batch_analyze import collect_inputs, load_completed, run_batch
+from call_guard import CallGuard
+from fake_model import DEFAULT_ANALYSIS, FakeGenerativeModel
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    # Not throttled by the process-wide rate limit other tests have drawn down
+    guard = CallGuard(requests_per_minute=60000, burst=100)
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: guard)
+
+
+def copy_policies(tmp_path):
+    for path in glob.glob("test_policy_*.txt"):
+        shutil.copy(path, tmp_path)
+    return collect_inputs([str(tmp_path)])
+
+
+def test_streams_one_record_per_policy(tmp_path):
+    paths = copy_policies(tmp_path)
+    output = tmp_path / "results.jsonl"
+    model = FakeGenerativeModel()
+    summary = asyncio.run(run_batch(paths, str(output), model, "fake", concurrency=2,
+                                    extract_workers=1))
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert summary == {"ok": 4, "error": 0}
+    assert sorted(r["source"] for r in records) == paths
+    assert all(r["analysis"].pop("prompt_stats")["mode"] == "single" for r in records)
+    assert all(r["analysis"] == DEFAULT_ANALYSIS for r in records)
+
+
+def test_parse_failure_falls_back_to_simple_analysis(tmp_path):
+    paths = copy_policies(tmp_path)[:1]
+    output = tmp_path / "results.jsonl"
+    model = FakeGenerativeModel(response_text="not json at all")
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"))
+    asyncio.run(run_batch(paths, str(output), model, "fake", extract_workers=1, cache=cache))
+    record = json.loads(output.read_text())
+    assert record["status"] == "ok"
+    assert record["analysis_kind"] == "simple"
+    assert model.calls == 2
+
+    # The fallback is cached too: a rerun calls the model only for the full analysis again
+    output.unlink()
+    asyncio.run(run_batch(paths, str(output), model, "fake", extract_workers=1, cache=cache))
+    assert json.loads(output.read_text())["analysis_kind"] == "simple"
+    assert model.calls == 3
+
+
+def test_unexpected_errors_are_recorded_per_file(tmp_path, monkeypatch):
+    paths = copy_policies(tmp_path)[:2]
+    output = tmp_path / "results.jsonl"
+
+    def broken(text, model):
+        if "TEST-BASIC-001" in text:
+            raise KeyError("candidates")
+        return DEFAULT_ANALYSIS
+
+    monkeypatch.setattr("batch_analyze.analyze_policy_with_gemini", broken)
+    summary = asyncio.run(run_batch(paths, str(output), FakeGenerativeModel(), "fake", extract_workers=1))
+    assert summary == {"ok": 1, "error": 1}
+    failed = [record for record in map(json.loads, output.read_text().splitlines()) if record["status"] == "error"]
+    assert failed[0]["source"].endswith("test_policy_basic.txt") and "KeyError" in failed[0]["error"]
+
+
+def test_resume_skips_completed_sources(tmp_path):
+    paths = copy_policies(tmp_path)
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"source": paths[0], "status": "ok"}) + "\n"
+                      + json.dumps({"source": paths[1], "status": "error"}) + "\n"
+                      + '{"source": "trunc')
+    assert load_completed(str(output)) == {paths[0]}
+
+    # The interrupted line is cut before new records are appended
+    asyncio.run(run_batch(paths[1:2], str(output), FakeGenerativeModel(), "fake", extract_workers=1))
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["status"] for record in records] == ["ok", "error", "ok"]
@@ -0,0 +1,62 @@
+"""
+Tests for the state benchmark data store
+"""
+
+import pytest
+
+from benchmark_data import BenchmarkData, get_benchmarks
+from config import US_AVERAGES
+from policy_analyzer import build_analysis_prompt
+from policy_extractor import extract_policy_fields
+
+DATA = {
+    "version": 1,
+    "percentiles": [0, 25, 50, 75, 100],
+    "fields": ["bodily_injury_per_person", "monthly_premium"],
+    "states": {
+        "US": {"name": "United States", "values": [[15000, 25000, 50000, 100000, 500000], [50, 100, 150, 200, 450]]},
+        "TX": {"name": "Texas", "values": [[30000, 30000, 30000, 100000, 500000], [60, 120, 165, 210, 500]]}
+    }
+}
+
+
+def test_bundled_data_covers_every_state_and_matches_us_averages():
+    benchmarks = get_benchmarks()
+    assert len(benchmarks.states()) == 51
+    assert benchmarks.medians()["liability_coverage"] == US_AVERAGES["liability_coverage"]
+    assert benchmarks.medians()["monthly_premium"] == US_AVERAGES["monthly_premium"]
+
+
+def test_percentile_interpolates_between_points():
+    benchmarks = BenchmarkData(DATA)
+    assert benchmarks.percentile("Texas", "monthly_premium", 165) == 50
+    assert benchmarks.percentile("tx", "monthly_premium", 187.5) == 62.5
+    assert benchmarks.percentile("TX", "monthly_premium", 10) == 0
+    assert benchmarks.percentile("TX", "monthly_premium", 1000) == 100
+
+
+def test_tied_points_get_the_middle_of_the_range():
+    # The Texas minimum is also its 25th and 50th percentile
+    assert BenchmarkData(DATA).percentile("Texas", "bodily_injury_per_person", 30000) == 25
+
+
+def test_unknown_state_falls_back_to_us():
+    benchmarks = BenchmarkData(DATA)
+    assert benchmarks.normalize_state("Ontario") is None
+    assert benchmarks.normalize_state("US") is None
+    assert benchmarks.median("Ontario", "monthly_premium") == 150
+    assert benchmarks.policy_percentiles({"monthly_premium": 142.5, "state": "texas"}) == {"monthly_premium": 37.5}
+
+
+def test_unsorted_points_rejected():
+    data = dict(DATA, states={"US": {"name": "United States", "values": [[1, 3, 2, 4, 5], [1, 2, 3, 4, 5]]}})
+    with pytest.raises(ValueError):
+        BenchmarkData(data)
+
+
+def test_prompt_uses_state_benchmarks_instead_of_us_averages():
+    policy = extract_policy_fields(open("test_policy_louisiana.txt").read())
+    prompt = build_analysis_prompt("policy text", policy)
+    assert "Louisiana benchmarks" in prompt
+    assert "Monthly Premium: $215 (this policy:" in prompt
+    assert "US benchmarks" in build_analysis_prompt("policy text")
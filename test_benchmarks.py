@@ -0,0 +1,32 @@
+"""
+Tests for the pipeline benchmark harness (fake model, no API key needed)
+"""
+
+from benchmarks.bench_pipeline import STAGES, bench_stages, compare, load_inputs
+from benchmarks.bench_startup import DEFERRED_MODULES, measure
+
+
+def test_every_stage_timed_for_each_input():
+    inputs = [item for item in load_inputs(pdf_pages=[2]) if item[0] in ("test_policy_basic.txt", "synthetic_2p.pdf")]
+    stages, per_input = bench_stages(inputs, repeat=1, latency=0.0)
+    assert set(stages) == set(STAGES)
+    assert set(per_input) == {"test_policy_basic.txt", "synthetic_2p.pdf"}
+    assert all(summary["samples"] == 2 for summary in stages.values())
+
+
+def test_slower_stage_flagged_against_baseline():
+    def summary(ms):
+        return {"median_ms": ms, "p95_ms": ms, "min_ms": ms, "samples": 1}
+    baseline = {"stages": {"charts": summary(10.0), "parse": summary(0.1)},
+                "inputs": {"a.txt": {"charts": summary(10.0)}}}
+    results = {"stages": {"charts": summary(20.0), "parse": summary(0.5)},
+               "inputs": {"a.txt": {"charts": summary(11.0)}}}
+    # parse is 5x slower but under the noise floor; a.txt/charts is within tolerance
+    assert compare(results, baseline, tolerance=0.25, noise_ms=1.0) == ["charts"]
+    assert results["stages"]["charts"]["ratio"] == 2.0
+
+
+def test_app_startup_defers_heavy_modules():
+    loaded = measure("import app")["modules"]
+    assert "streamlit" in loaded
+    assert not [module for module in DEFERRED_MODULES if module in loaded]
@@ -0,0 +1,136 @@
+"""
+Tests for the rate limiter, retries and circuit breaker around model calls
+A fake clock stands in for time, so no test actually sleeps
+"""
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from call_guard import CLOSED, OPEN, CallGuard, CircuitOpenError, RateLimitExceeded, TokenBucket
+from fake_model import FakeGenerativeModel
+from policy_analyzer import ModelCallError, analyze_policy_simple
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_guard(clock, **kwargs):
+    options = dict(requests_per_minute=60, burst=2, max_retries=2, base_delay=1.0, max_delay=8.0,
+                   timeout=5.0, acquire_timeout=10.0, failure_threshold=3, reset_seconds=30.0)
+    options.update(kwargs)
+    return CallGuard(clock=clock, sleep=clock.sleep, **options)
+
+
+def flaky(errors, result="ok"):
+    """fn(timeout) that raises each of errors in turn, then returns result"""
+    errors = list(errors)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if errors:
+            raise errors.pop(0)
+        return result
+    fn.calls = calls
+    return fn
+
+
+def test_token_bucket_allows_bursts_then_paces_calls():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() and bucket.acquire()
+    assert clock.sleeps == []
+    assert bucket.acquire()
+    assert clock.sleeps == [0.5]
+    assert not bucket.acquire(timeout=0.1)
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    clock = FakeClock()
+    guard = make_guard(clock, burst=5)
+    fn = flaky([google_exceptions.ResourceExhausted("429"), google_exceptions.DeadlineExceeded("slow")])
+    assert guard.call(fn) == "ok"
+    assert fn.calls == [5.0, 5.0, 5.0]
+    assert len(clock.sleeps) == 2 and clock.sleeps[0] <= 1.0 and clock.sleeps[1] <= 2.0
+
+    # Bad requests are not retried and do not count against the backend
+    fn = flaky([google_exceptions.InvalidArgument("bad")])
+    with pytest.raises(google_exceptions.InvalidArgument):
+        guard.call(fn)
+    assert len(fn.calls) == 1 and guard.breaker.failures == 0
+
+
+def test_circuit_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    guard = make_guard(clock, max_retries=0, requests_per_minute=6000)
+    for _ in range(3):
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            guard.call(flaky([google_exceptions.ServiceUnavailable("503")]))
+    assert guard.status()["state"] == OPEN
+
+    fn = flaky([])
+    with pytest.raises(CircuitOpenError):
+        guard.call(fn)
+    assert fn.calls == []
+
+    clock.now += 30
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        guard.call(flaky([google_exceptions.ServiceUnavailable("503")]))
+    assert guard.status()["state"] == OPEN and guard.status()["retry_in"] == pytest.approx(30.0)
+    clock.now += 30
+    assert guard.call(fn) == "ok"
+    assert guard.status()["state"] == CLOSED
+
+
+def test_rate_limited_trial_does_not_wedge_the_breaker():
+    clock = FakeClock()
+    guard = make_guard(clock, max_retries=0, requests_per_minute=1, burst=3, acquire_timeout=0.5)
+    for _ in range(3):
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            guard.call(flaky([google_exceptions.ServiceUnavailable("503")]))
+    clock.now += 30
+    # Cooldown over but no rate-limit slot yet: the breaker must not stay half-open
+    with pytest.raises(RateLimitExceeded):
+        guard.call(flaky([]))
+    assert guard.available() and guard.status()["state"] == OPEN
+    clock.now += 30
+    assert guard.call(flaky([])) == "ok"
+    assert guard.status()["state"] == CLOSED
+
+
+def test_interrupted_trial_hands_back_its_slot():
+    clock = FakeClock()
+    guard = make_guard(clock, max_retries=0, requests_per_minute=6000)
+    for _ in range(3):
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            guard.call(flaky([google_exceptions.ServiceUnavailable("503")]))
+    clock.now += 30
+
+    def interrupted(timeout):
+        assert not guard.available()  # half-open with the trial in flight
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        guard.call(interrupted)
+    assert guard.call(flaky([])) == "ok"
+
+
+def test_rate_limit_surfaces_as_model_call_error(monkeypatch):
+    clock = FakeClock()
+    guard = make_guard(clock, burst=1, acquire_timeout=0.5)
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: guard)
+    model = FakeGenerativeModel(response_text="Looks fine")
+    assert analyze_policy_simple("policy", model)["risk_assessment"]
+    with pytest.raises(ModelCallError) as error:
+        analyze_policy_simple("policy", model)
+    assert isinstance(error.value.__context__, RateLimitExceeded)
+    assert "request limit" in error.value.hint
@@ -0,0 +1,62 @@
+"""
+Tests for the comparison chart engine
+"""
+
+import plotly.graph_objects as go
+
+from charts import clear_chart_cache, comparison_frame, create_comparison_charts
+from config import US_AVERAGES
+
+POLICY = {
+    "liability_coverage": {
+        "bodily_injury": {"per_person": 100000, "per_accident": 300000},
+        "property_damage": {"per_accident": 50000}
+    },
+    "uninsured_motorist": {"per_person": 100000, "per_accident": 300000},
+    "medical_payments": 5000,
+    "monthly_premium": 120.0,
+    "annual_premium": 1440.0
+}
+
+
+def test_frame_covers_every_field_with_missing_values_as_zero():
+    frame = comparison_frame({"monthly_premium": 99, "medical_payments": None})
+    assert len(set(map(len, frame.values()))) == 1
+    assert frame["user"][frame["label"].index("Monthly Premium")] == 99
+    assert frame["us_average"][frame["panel"].index("medical_payments")] == US_AVERAGES["medical_payments"]
+    assert frame["user"][frame["panel"].index("medical_payments")] == 0
+
+
+def test_all_four_coverage_panels_filled():
+    clear_chart_cache()
+    fig_premium, fig_coverage = create_comparison_charts(POLICY, US_AVERAGES)
+    panels = {}
+    for trace in fig_coverage.data:
+        panels.setdefault(trace.xaxis, {})[trace.name] = list(trace.y)
+    assert panels == {
+        "x": {"Your Policy": [100000, 300000], "US Average": [50000, 100000]},
+        "x2": {"Your Policy": [50000], "US Average": [25000]},
+        "x3": {"Your Policy": [100000, 300000], "US Average": [25000, 50000]},
+        "x4": {"Your Policy": [5000], "US Average": [1000]},
+    }
+    assert [trace.name for trace in fig_premium.data] == ["Your Policy", "US Average"]
+    # The unvalidated fast path must still produce figures Plotly accepts
+    go.Figure(fig_premium.to_dict())
+    go.Figure(fig_coverage.to_dict())
+
+
+def test_same_policy_reuses_cached_figures():
+    first = create_comparison_charts(POLICY, US_AVERAGES)
+    assert create_comparison_charts(dict(POLICY), US_AVERAGES) is first
+    changed = dict(POLICY, monthly_premium=130.0)
+    assert create_comparison_charts(changed, US_AVERAGES) is not first
+
+
+def test_state_medians_charted_under_their_own_label():
+    clear_chart_cache()
+    state_medians = dict(US_AVERAGES, monthly_premium=195, annual_premium=2340)
+    fig_premium, _ = create_comparison_charts(POLICY, state_medians, "New York Median")
+    assert [trace.name for trace in fig_premium.data] == ["Your Policy", "New York Median"]
+    assert list(fig_premium.data[1].y) == [195, 2340]
+    assert create_comparison_charts(POLICY, state_medians) is not create_comparison_charts(POLICY, state_medians,
+                                                                                          "New York Median")
@@ -0,0 +1,64 @@
+"""
+Tests for the memo of extracted upload text
+"""
+
+from extraction_memo import ExtractionMemo
+
+
+def counting_extractor(text, warnings=()):
+    calls = []
+
+    def extract(warn):
+        calls.append(1)
+        for message in warnings:
+            warn(message)
+        return text
+    extract.calls = calls
+    return extract
+
+
+def test_same_content_is_extracted_once_and_warnings_replayed():
+    memo = ExtractionMemo(max_bytes=1000)
+    extract = counting_extractor("policy text", ["page 2 was scanned"])
+    shown = []
+    assert memo.extract("pdf:abc", extract, warn=shown.append) == "policy text"
+    assert memo.extract("pdf:abc", extract, warn=shown.append) == "policy text"
+    assert len(extract.calls) == 1
+    assert shown == ["page 2 was scanned"] * 2
+    assert memo.stats() == {"entries": 1, "bytes": len("policy text") + len("page 2 was scanned"),
+                            "hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entries_evicted_past_the_byte_cap():
+    memo = ExtractionMemo(max_bytes=10)
+    memo.put("a", "aaaa")
+    memo.put("b", "bbbb")
+    assert memo.get("a")
+    memo.put("c", "cccc")
+    assert memo.get("b") is None
+    assert memo.get("a") and memo.get("c")
+    assert memo.stats()["bytes"] == 8
+
+    # Anything over the whole budget is not kept rather than flushing the rest
+    memo.put("huge", "x" * 11)
+    assert memo.get("huge") is None and memo.stats()["entries"] == 2
+
+
+def test_shared_memo_serves_other_sessions():
+    shared = ExtractionMemo(max_bytes=1000)
+    extract = counting_extractor("policy text")
+    ExtractionMemo(max_bytes=1000).extract("pdf:abc", extract, shared=shared)
+    other_session = ExtractionMemo(max_bytes=1000)
+    assert other_session.extract("pdf:abc", extract, shared=shared) == "policy text"
+    assert len(extract.calls) == 1
+    assert other_session.get("pdf:abc") == ("policy text", ())
+
+
+def test_failed_extraction_is_retried():
+    memo, shared = ExtractionMemo(max_bytes=1000), ExtractionMemo(max_bytes=1000)
+    failing = counting_extractor(None)
+    assert memo.extract("pdf:abc", failing, shared=shared) == ""
+    assert memo.extract("pdf:abc", failing, shared=shared) == ""
+    assert len(failing.calls) == 2
+    assert shared.stats()["entries"] == 0
+    assert memo.extract("pdf:abc", counting_extractor("policy text"), shared=shared) == "policy text"
@@ -0,0 +1,69 @@
+"""
+Tests for incremental JSON parsing and streamed analysis
+Uses the local fake model, no API key needed
+"""
+
+import json
+
+import pytest
+
+from analysis_jobs import JobCancelled
+from fake_model import DEFAULT_ANALYSIS, FakeGenerativeModel
+from json_stream import IncrementalJSONParser
+from policy_analyzer import ModelCallError, analyze_policy_streaming
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+def test_sections_complete_in_order_for_any_chunk_size():
+    text = "```json\n" + json.dumps(DEFAULT_ANALYSIS, indent=2) + "\n```"
+    for size in (1, 7, 64, len(text)):
+        parser, events = feed_in_chunks(text, size)
+        paths = [path for path, _ in events]
+        assert paths == [
+            ("policy_analysis",), ("comparison",),
+            ("recommendations", 0), ("recommendations", 1), ("recommendations", 2), ("recommendations",),
+            ("risk_assessment",), ("overall_score",)
+        ]
+        assert parser.members == DEFAULT_ANALYSIS
+        assert parser.done
+
+
+def test_braces_and_escapes_inside_strings():
+    text = '{"risk_assessment": "Limits {low}, \\"see\\" [note], ok", "overall_score": 4}'
+    parser, events = feed_in_chunks(text, 3)
+    assert events == [(("risk_assessment",), 'Limits {low}, "see" [note], ok'), (("overall_score",), 4)]
+
+
+def test_section_available_before_response_finishes():
+    text = json.dumps(DEFAULT_ANALYSIS)
+    parser = IncrementalJSONParser()
+    cut = text.index('"comparison"')
+    assert [path for path, _ in parser.feed(text[:cut])] == [("policy_analysis",)]
+
+
+def test_streaming_analysis_with_fake_model():
+    seen = []
+    model = FakeGenerativeModel(chunk_size=16)
+    analysis = analyze_policy_streaming("Monthly Premium: $150", model,
+                                        on_section=lambda path, value: seen.append(path))
+    assert analysis.pop("prompt_stats")["tokens_saved"] == 0
+    assert analysis == DEFAULT_ANALYSIS
+    assert seen[0] == ("policy_analysis",)
+    assert ("overall_score",) in seen
+
+
+def test_cancelling_a_stream_is_not_a_model_failure():
+    def cancel(path, value):
+        raise JobCancelled()
+
+    # Raised as is, so the app does not count it against the model's health
+    with pytest.raises(JobCancelled) as raised:
+        analyze_policy_streaming("Monthly Premium: $150", FakeGenerativeModel(chunk_size=16), on_section=cancel)
+    assert not isinstance(raised.value, ModelCallError)
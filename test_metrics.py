@@ -0,0 +1,53 @@
+"""
+Tests for stage timings, token counts and the Prometheus export
+"""
+
+import metrics
+from fake_model import FakeGenerativeModel
+from metrics import MetricsRegistry
+from policy_analyzer import analyze_policy_streaming, analyze_policy_with_gemini, cached_analysis
+
+
+def test_percentiles_and_fallback_rate():
+    registry = MetricsRegistry()
+    for ms in range(1, 101):
+        registry.observe("generate", ms / 1000, model="m")
+    registry.increment("analyses", 2, kind="analysis", cache="miss")
+    registry.increment("analyses", 2, kind="sections", cache="miss")
+    registry.increment("analyses", 3, kind="simple", cache="miss")
+    registry.increment("fallbacks", reason="parse")
+    snapshot = registry.snapshot()
+    [span] = snapshot["spans"]
+    assert span["count"] == 100
+    assert abs(span["p50"] - 0.05) < 0.002 and abs(span["p95"] - 0.095) < 0.002
+    assert snapshot["fallback_rate"] == 0.25
+
+
+def test_prometheus_text_format(tmp_path):
+    registry = MetricsRegistry()
+    with registry.span("parse"):
+        pass
+    registry.increment("tokens", 120, model='gemini "flash"', direction="prompt")
+    path = registry.write_prometheus(str(tmp_path / "policyai.prom"))
+    text = open(path, encoding="utf-8").read()
+    assert '# TYPE policyai_stage_seconds summary' in text
+    assert 'policyai_stage_seconds_count{stage="parse"} 1' in text
+    assert 'policyai_tokens_total{direction="prompt",model="gemini \\"flash\\""} 120' in text
+    assert text.endswith("policyai_fallback_ratio 0.000000\n")
+
+
+def test_model_calls_record_latency_tokens_and_model():
+    registry = metrics.registry
+    registry.reset()
+
+    model = FakeGenerativeModel(model_name="fake-a")
+    cached_analysis("analysis", "Monthly Premium: $150", "fake-a",
+                    lambda text: analyze_policy_with_gemini(text, model))
+    analyze_policy_streaming("Monthly Premium: $150", FakeGenerativeModel(model_name="fake-b"))
+
+    stages = {(span["stage"], span["labels"].get("model")) for span in registry.snapshot()["spans"]}
+    assert {("prompt_build", None), ("parse", None), ("generate", "fake-a"), ("generate", "fake-b")} <= stages
+    assert registry.counter("generate_calls") == 2
+    assert registry.counter("tokens", model="fake-a", direction="prompt") > 0
+    assert registry.counter("tokens", model="fake-b", direction="response") > 0
+    assert registry.counter("analyses", cache="off") == 1
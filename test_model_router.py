@@ -0,0 +1,116 @@
+"""
+Tests for latency-aware model routing
+Each model is a local FakeGenerativeModel endpoint with its own latency and errors
+"""
+
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import metrics
+from call_guard import CallGuard
+from fake_model import FakeGenerativeModel
+from model_router import ModelRouter
+from policy_analyzer import analyze_policy_simple, analyze_policy_streaming, analyze_policy_with_gemini, generate
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    # Every attempt takes a slot from the process-wide guard; this one is not drawn down by other tests
+    guard = CallGuard(requests_per_minute=60000, burst=100)
+    monkeypatch.setattr("model_router.get_call_guard", lambda: guard)
+
+
+def make_router(endpoints, **kwargs):
+    models = {name: FakeGenerativeModel(name, response_text=name, **options) for name, options in endpoints.items()}
+    kwargs.setdefault("latency_slo", 1.0)
+    router = ModelRouter(list(models), model_factory=models.__getitem__, **kwargs)
+    return router, models
+
+
+def test_preferred_model_used_while_within_slo():
+    router, models = make_router({"a": {}, "b": {}}, preferred="b")
+    assert router.choose() == ("b", "a")
+    assert router.generate_content("hi").text == "b"
+    assert models["a"].calls == 0
+
+    # b's p95 breaks the SLO: a takes over
+    router, models = make_router({"a": {}, "b": {}}, latency_slo=0.5, hedge=False)
+    for _ in range(3):
+        router._record("a", False, 0.8, True)
+    assert router.choose() == ("b", "a")
+
+
+def test_slow_primary_is_hedged_to_faster_model():
+    metrics.registry.reset()
+    router, models = make_router({"slow": {"latency": 0.5}, "fast": {}}, latency_slo=0.05)
+    started = time.perf_counter()
+    response = router.generate_content("hi")
+    assert response.text == "fast" and response.routed_model == "fast"
+    assert time.perf_counter() - started < 0.4
+    assert metrics.registry.counter("hedged_requests", model="fast") == 1
+    assert metrics.registry.counter("hedge_wins", model="fast") == 1
+
+
+def test_failing_model_fails_over_and_is_demoted():
+    metrics.registry.reset()
+    router, models = make_router({"bad": {"error": RuntimeError("down")}, "good": {}}, min_error_samples=2)
+    for _ in range(2):
+        assert router.generate_content("hi").routed_model == "good"
+    assert metrics.registry.counter("model_demotions", model="bad") == 1
+    assert router.choose()[0] == "good"
+    router.generate_content("hi")
+    assert models["bad"].calls == 2
+
+    # With nothing else left the error reaches the caller
+    router, _ = make_router({"bad": {"error": RuntimeError("down")}})
+    with pytest.raises(RuntimeError):
+        router.generate_content("hi")
+
+
+def test_streams_hedge_on_first_chunk_and_record_answering_model():
+    metrics.registry.reset()
+    router, _ = make_router({"slow": {"latency": 0.5}, "fast": {"chunk_size": 2}}, latency_slo=0.05)
+    chunks = list(generate(router, "hi", stream=True, structured=False))
+    assert "".join(chunk.text for chunk in chunks) == "fast"
+    assert metrics.registry.counter("generate_calls", model="fast") == 1
+    assert router.snapshot()[0]["stream"] is True
+
+
+def test_models_without_json_mode_are_asked_for_plain_text():
+    class PlainModel(FakeGenerativeModel):
+        def generate_content(self, contents, stream=False, **kwargs):
+            if "generation_config" in kwargs:
+                raise google_exceptions.InvalidArgument("response_schema not supported")
+            return super().generate_content(contents, stream=stream)
+
+    router = ModelRouter(["plain"], model_factory=lambda name: PlainModel(name, response_text="ok"))
+    assert router.generate_content("hi", generation_config={}).text == "ok"
+    assert router.generate_content("hi", generation_config={}).text == "ok"
+    assert router._unstructured == {"plain"}
+
+
+def test_every_attempt_takes_a_guard_slot():
+    class CountingGuard(CallGuard):
+        calls = 0
+
+        def call(self, fn):
+            CountingGuard.calls += 1
+            return super().call(fn)
+
+    guard = CountingGuard(requests_per_minute=60000, burst=100)
+    router, models = make_router({"slow": {"latency": 0.5}, "fast": {}}, latency_slo=0.05, guard=guard)
+    assert generate(router, "hi", structured=False).text == "fast"
+    time.sleep(0.5)  # the losing call finishes in the background
+    assert models["slow"].calls == models["fast"].calls == 1
+    assert CountingGuard.calls == 2
+
+
+def test_analyses_record_the_model_that_answered(monkeypatch):
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: CallGuard(requests_per_minute=60000, burst=100))
+    router = ModelRouter(["a", "b"], model_factory=lambda name: FakeGenerativeModel(name), preferred="b",
+                         hedge=False)
+    assert analyze_policy_with_gemini("Monthly Premium: $150", router)["prompt_stats"]["model"] == "b"
+    assert analyze_policy_streaming("Monthly Premium: $150", router)["prompt_stats"]["model"] == "b"
+    assert analyze_policy_simple("Monthly Premium: $150", router)["prompt_stats"]["model"] == "b"
@@ -0,0 +1,89 @@
+"""
+Tests for Gemini model discovery
+Uses a fake model factory so no API key or network access is needed
+"""
+
+import time
+
+import pytest
+
+from call_guard import CallGuard
+from model_selection import ModelSelector, load_probe_result, save_probe_result
+
+
+class FakeModel:
+    def __init__(self, name, calls, healthy):
+        self.name = name
+        self.calls = calls
+        self.healthy = healthy
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(self.name)
+        if self.name not in self.healthy:
+            raise RuntimeError(f"{self.name} unavailable")
+        return "Hi"
+
+
+@pytest.fixture(autouse=True)
+def guard(monkeypatch):
+    # Probes go through the guard; this one is not throttled by other tests
+    guard = CallGuard(requests_per_minute=60000, burst=100, max_retries=0)
+    monkeypatch.setattr("model_selection.get_call_guard", lambda: guard)
+    return guard
+
+
+def make_factory(calls, healthy):
+    return lambda name: FakeModel(name, calls, healthy)
+
+
+def test_probes_once_per_process(tmp_path):
+    calls = []
+    selector = ModelSelector(["a", "b"], probe_ttl=60, cache_file=str(tmp_path / "probe.json"),
+                             model_factory=make_factory(calls, {"b"}))
+    assert selector.get_model().name == "b"
+    assert selector.get_model().name == "b"
+    assert calls == ["a", "b"]
+
+
+def test_restart_skips_probe_with_saved_result(tmp_path):
+    cache_file = str(tmp_path / "probe.json")
+    save_probe_result(cache_file, "b", time.time())
+    calls = []
+    selector = ModelSelector(["a", "b"], probe_ttl=60, cache_file=cache_file,
+                             model_factory=make_factory(calls, {"b"}))
+    assert selector.get_model().name == "b"
+    assert selector.from_cache
+    assert calls == []
+
+
+def test_expired_probe_result_is_ignored(tmp_path):
+    cache_file = str(tmp_path / "probe.json")
+    save_probe_result(cache_file, "b", time.time() - 120)
+    assert load_probe_result(cache_file, ttl=60) is None
+
+
+def test_failures_trigger_background_reprobe(tmp_path):
+    calls = []
+    healthy = {"a"}
+    selector = ModelSelector(["a", "b"], probe_ttl=60, cache_file=str(tmp_path / "probe.json"),
+                             failure_threshold=2, model_factory=make_factory(calls, healthy))
+    assert selector.get_model().name == "a"
+    healthy.clear()
+    healthy.add("b")
+    selector.report_failure()
+    assert not selector.is_reprobing()
+    selector.report_failure()
+    selector._reprobe_thread.join(timeout=5)
+    assert selector.get_model().name == "b"
+
+
+def test_no_reprobe_while_the_circuit_is_open(tmp_path, guard):
+    calls = []
+    selector = ModelSelector(["a", "b"], probe_ttl=60, cache_file=str(tmp_path / "probe.json"),
+                             failure_threshold=1, model_factory=make_factory(calls, {"a"}))
+    selector.get_model()
+    for _ in range(guard.breaker.failure_threshold):
+        guard.breaker.record_failure()
+    selector.report_failure()
+    assert not selector.is_reprobing()
+    assert calls == ["a"]
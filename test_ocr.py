@@ -0,0 +1,77 @@
+"""
+Tests for the OCR stage
+Tesseract is replaced by a counting stub, so the binary is not needed
+"""
+
+import threading
+
+import pytest
+from PIL import Image, ImageDraw
+
+import ocr
+from benchmarks.synthetic_pdf import make_pdf
+from config import OCR_CONFIG
+from pdf_extraction import extract_pdf
+from policy_analyzer import extract_text_from_file
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    calls = []
+
+    def recognize(image):
+        calls.append(image.size)
+        return f"Monthly Premium: $150.00\nPage {len(calls)}"
+
+    ocr.clear_cache()
+    monkeypatch.setattr(ocr, "_available", True)
+    monkeypatch.setattr(ocr, "_recognize", recognize)
+    yield calls
+    ocr.clear_cache()
+
+
+def scan(size=(3000, 1500)):
+    image = Image.new('RGB', size, (200, 200, 190))
+    ImageDraw.Draw(image).rectangle((100, 100, 900, 300), fill=(30, 30, 40))
+    return image
+
+
+def test_preprocess_downscales_and_binarizes():
+    image = ocr.preprocess_image(scan(), max_side=1000)
+    assert image.mode == '1'
+    assert image.size == (1000, 500)
+    assert sorted(color for _, color in image.getcolors()) == [0, 255]
+
+
+def test_repeated_page_recognized_once(fake_tesseract):
+    assert ocr.ocr_image(scan()) == ocr.ocr_image(scan())
+    assert fake_tesseract == [(OCR_CONFIG['max_side'], OCR_CONFIG['max_side'] // 2)]
+
+
+def test_single_images_use_the_bounded_pool(fake_tesseract, monkeypatch):
+    threads = []
+    recognize = ocr._recognize
+    monkeypatch.setattr(ocr, "_recognize",
+                        lambda image: threads.append(threading.current_thread().name) or recognize(image))
+    assert ocr.ocr_image(scan())
+    assert threads[0].startswith("ocr")
+
+
+def test_image_only_pdf_goes_through_ocr(fake_tesseract):
+    result = extract_pdf(make_pdf(6, with_text=False))
+    assert result["method"] == "ocr"
+    assert result["pages"] == 6 and len(fake_tesseract) == 6
+    assert result["text"].count("Monthly Premium") == 6
+
+
+def test_image_file_feeds_analysis_text(fake_tesseract, tmp_path):
+    path = tmp_path / "policy.png"
+    scan().save(path)
+    assert extract_text_from_file(str(path)).startswith("Monthly Premium: $150.00")
+
+
+def test_images_skipped_without_tesseract(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr, "_available", False)
+    path = tmp_path / "policy.jpg"
+    scan().save(path)
+    assert extract_text_from_file(str(path)) is None
@@ -0,0 +1,41 @@
+"""
+Tests for the PDF extraction engine
+Uses generated PDFs so no sample documents are needed
+"""
+
+from benchmarks.synthetic_pdf import make_pdf
+from config import PDF_CONFIG
+from pdf_extraction import extract_pdf
+from policy_analyzer import extract_text_from_pdf
+
+
+def test_text_pdf_pages_joined_in_order():
+    result = extract_pdf(make_pdf(5))
+    assert result["method"] == "pdfplumber"
+    assert result["pages"] == 5
+    positions = [result["text"].index(f"DECLARATIONS PAGE {page}\n") for page in range(1, 6)]
+    assert positions == sorted(positions)
+
+
+def test_image_only_pdf_stops_after_probe():
+    result = extract_pdf(make_pdf(50, with_text=False), ocr=False)
+    assert result["text"] is None
+    assert result["has_text_layer"] is False
+    assert result["method"] is None
+
+
+def test_parallel_matches_serial(monkeypatch):
+    pdf_bytes = make_pdf(40)
+    serial = extract_pdf(pdf_bytes, parallel=False)
+    monkeypatch.setitem(PDF_CONFIG, "workers", 2)
+    monkeypatch.setitem(PDF_CONFIG, "parallel_min_pages", 10)
+    monkeypatch.setitem(PDF_CONFIG, "pages_per_task", 8)
+    parallel = extract_pdf(pdf_bytes)
+    assert parallel["text"] == serial["text"]
+    assert parallel["timed_out_pages"] == [] and parallel["failed_pages"] == []
+
+
+def test_unreadable_file_reports_both_methods():
+    warnings = []
+    assert extract_text_from_pdf(b"not a pdf", warn=warnings.append) is None
+    assert [w.split(":")[0] for w in warnings] == ["pdfplumber failed", "PyPDF2 failed"]
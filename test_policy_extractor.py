@@ -0,0 +1,52 @@
+"""
+Tests for the rule-based policy field extractor
+Validated against the bundled sample and test policies
+"""
+
+from policy_extractor import extract_policy_fields, has_numeric_fields
+
+# (file, BI per person, BI per accident, PD, collision, comprehensive, UM per person,
+#  UM per accident, medical, rental, roadside, monthly, annual)
+EXPECTED = [
+    ('sample_policy.txt', 100000, 300000, 50000, 1000, 500, 25000, 50000, 2000, 40, True, 185.0, 2220.0),
+    ('test_policy_basic.txt', 25000, 50000, 25000, 1000, 1000, 25000, 50000, 1000, 25, False, 120.0, 1440.0),
+    ('test_policy_average.txt', 50000, 100000, 25000, 500, 500, 25000, 50000, 1000, 30, True, 150.0, 1800.0),
+    ('test_policy_premium.txt', 500000, 1000000, 100000, 250, 250, 500000, 1000000, 10000, 75, True, 350.0, 4200.0),
+    ('test_policy_louisiana.txt', 15000, 30000, 25000, 500, 500, 15000, 30000, 2000, 30, True, 165.0, 1980.0),
+]
+
+
+def test_bundled_policies():
+    for (path, bi_person, bi_accident, pd_accident, collision, comprehensive, um_person,
+         um_accident, medical, rental, roadside, monthly, annual) in EXPECTED:
+        with open(path, 'r', encoding='utf-8') as f:
+            policy = extract_policy_fields(f.read())
+        assert policy['liability_coverage'] == {
+            "bodily_injury": {"per_person": bi_person, "per_accident": bi_accident},
+            "property_damage": {"per_accident": pd_accident}
+        }, path
+        assert policy['collision_deductible'] == collision, path
+        assert policy['comprehensive_deductible'] == comprehensive, path
+        assert policy['uninsured_motorist'] == {"per_person": um_person, "per_accident": um_accident}, path
+        assert policy['medical_payments'] == medical, path
+        assert policy['rental_reimbursement'] == rental, path
+        assert policy['roadside_assistance'] is roadside, path
+        assert (policy['monthly_premium'], policy['annual_premium']) == (monthly, annual), path
+
+
+def test_state_and_policy_number():
+    with open('test_policy_louisiana.txt', 'r', encoding='utf-8') as f:
+        policy = extract_policy_fields(f.read())
+    assert policy['state'] == 'Louisiana'
+    assert policy['policy_number'] == 'LA-TEST-004'
+
+
+def test_split_limit_shorthand():
+    policy = extract_policy_fields("LIABILITY:\n- Limits: 15/30/25\nPremium:\n- Monthly: $99.50")
+    assert policy['liability_coverage']['bodily_injury'] == {"per_person": 15000, "per_accident": 30000}
+    assert policy['liability_coverage']['property_damage'] == {"per_accident": 25000}
+    assert policy['annual_premium'] == 1194.0
+
+
+def test_no_fields_found():
+    assert not has_numeric_fields(extract_policy_fields("Dear customer, thank you for choosing us."))
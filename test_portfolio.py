@@ -0,0 +1,83 @@
+"""
+Tests for multi-file portfolio analysis
+"""
+
+import threading
+import time
+
+from analysis_jobs import CANCELLED, DONE, JobManager
+from charts import create_portfolio_charts
+from policy_analyzer import ResponseParseError
+from portfolio import COLUMNS, portfolio_frame, portfolio_summary, run_portfolio
+
+FILES = [(name, name) for name in ("test_policy_basic.txt", "test_policy_premium.txt", "test_policy_louisiana.txt")]
+
+
+class FakeJob:
+    def __init__(self):
+        self.progress = {}
+
+    def set_progress(self, key, value):
+        self.progress[key] = value
+
+    def check_cancelled(self):
+        pass
+
+
+def analyze(text):
+    if "Louisiana" in text:
+        raise ResponseParseError("Could not parse the AI response")
+    return {"overall_score": 7, "policy_analysis": {"risk_level": "Low"}}
+
+
+def test_portfolio_job_records_every_file():
+    manager = JobManager(workers=1)
+    job = manager.submit("s1", "portfolio", run_portfolio, FILES + [("missing.txt", "missing.txt")], analyze)
+    job.future.result(timeout=10)
+    assert job.status == DONE
+    assert job.progress()["total"] == 4 and len(job.progress()["records"]) == 4
+    records = {record["file"]: record for record in job.result}
+    assert records["test_policy_basic.txt"]["ai_score"] == 7
+    assert records["test_policy_basic.txt"]["bi_per_person"] == 25000
+    # A failed AI call keeps the extracted fields and quick score
+    assert records["test_policy_louisiana.txt"]["status"] == "error"
+    assert records["test_policy_louisiana.txt"]["quick_score"] is not None
+    assert records["missing.txt"]["error"].startswith("Could not read file")
+    manager.shutdown()
+
+
+def test_frame_summary_and_charts():
+    frame = portfolio_frame(run_portfolio(FakeJob(), FILES, analyze, workers=2))
+    assert list(frame.columns) == list(COLUMNS)
+    assert list(frame["file"]) == sorted(name for name, _ in FILES)
+    summary = portfolio_summary(frame)
+    assert summary["files"] == 3 and summary["analyzed"] == 2 and summary["failed"] == 1
+    assert summary["mean_ai_score"] == 7.0
+    fig_scores, fig_limits, fig_premiums = create_portfolio_charts(frame)
+    assert [trace.name for trace in fig_scores.data] == ["AI Score", "Quick Score"]
+    assert len(fig_limits.data) == 3 and len(fig_premiums.data[0].x) == 2
+
+
+def test_quick_only_portfolio_makes_no_ai_calls():
+    records = run_portfolio(FakeJob(), FILES, analyze=None)
+    assert all(record["status"] == "ok" and "ai_score" not in record for record in records)
+    assert portfolio_summary(portfolio_frame(records))["mean_ai_score"] is None
+
+
+def test_cancel_stops_remaining_files():
+    manager = JobManager(workers=1)
+    release = threading.Event()
+
+    def slow(text):
+        release.wait(5)
+        return {"overall_score": 5}
+
+    job = manager.submit("s1", "portfolio", run_portfolio, FILES * 4, slow, 1)
+    while not job.progress().get("total"):
+        time.sleep(0.01)
+    job.cancel()
+    release.set()
+    job.future.result(timeout=10)
+    assert job.status == CANCELLED
+    assert len(job.progress()["records"]) < len(FILES) * 4
+    manager.shutdown()
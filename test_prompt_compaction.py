@@ -0,0 +1,130 @@
+"""
+Tests for prompt compaction and map-reduce analysis
+"""
+
+from config import PROMPT_CONFIG
+from fake_model import DEFAULT_ANALYSIS, FakeGenerativeModel
+from analysis_cache import AnalysisCache
+from call_guard import CallGuard
+from policy_analyzer import analyze_policy_incremental, analyze_policy_with_gemini, incremental_pays_off
+from prompt_compaction import (chunk_sections, compact_policy_text, compact_sections, count_tokens, merge_analyses,
+                               section_blocks)
+
+
+def long_policy(pages=6):
+    with open('sample_policy.txt', 'r', encoding='utf-8') as f:
+        body = f.read()
+    parts = []
+    for page in range(1, pages + 1):
+        parts.append("ACME MUTUAL INSURANCE COMPANY")
+        parts.append(body if page == 1 else "ADDITIONAL FEATURES:\n- Vanishing Deductible")
+        parts.append("EXCLUSIONS:\nWe do not provide coverage for any insured who intentionally causes "
+                     "bodily injury or property damage, or while the vehicle is used for racing.")
+        parts.append(f"Form PP 00 01 01 05 Page {page} of {pages}")
+    return "\n".join(parts)
+
+
+def sectioned_policy(sections=16, edit=None):
+    parts = []
+    for number in range(sections):
+        detail = "limit corrected after review" if number == edit else "limit shown on the declarations page"
+        parts.append(f"COVERAGE PART {number}:\n- Item {number}: ${(number + 1) * 1000:,} {detail}\n"
+                     f"- Applies to each covered auto listed in schedule {number}")
+    return "\n".join(parts)
+
+
+def test_headers_footers_and_exclusions_removed():
+    text = long_policy()
+    compacted, stats = compact_policy_text(text)
+    assert "ACME MUTUAL" not in compacted
+    assert "Page 3 of 6" not in compacted
+    assert "racing" not in compacted
+    assert "- Bodily Injury: $100,000 per person / $300,000 per accident" in compacted
+    assert stats["tokens_saved"] == stats["original_tokens"] - stats["prompt_tokens"] > 0
+
+
+def test_repeated_limits_are_not_boilerplate():
+    text = "\n".join(["LIABILITY:", "- Bodily Injury: $500,000 per person"] * 4)
+    compacted, _ = compact_policy_text(text)
+    assert compacted.count("$500,000") == 4
+
+
+def test_repeated_vehicle_lines_are_kept():
+    vehicles = []
+    for number, car in enumerate(("2019 Honda Civic", "2021 Toyota RAV4", "2017 Ford F-150"), start=1):
+        vehicles += [f"VEHICLE {number}", car, "Collision Deductible: 500/1000/2000",
+                     "Comprehensive Deductible: 250/500", "Declarations Page 1 of 1"]
+    compacted, _ = compact_policy_text("\n".join(vehicles))
+    for number in (1, 2, 3):
+        assert f"VEHICLE {number}" in compacted
+    assert compacted.count("Collision Deductible: 500/1000/2000") == 3
+    assert compacted.count("Comprehensive Deductible: 250/500") == 3
+    assert "Declarations Page" not in compacted
+
+
+def test_chunks_respect_budget():
+    sections = compact_sections(long_policy(pages=40))
+    chunks = chunk_sections(sections, chunk_budget=120)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 120 for chunk in chunks)
+
+
+def test_merge_deduplicates_and_weights_scores():
+    merged = merge_analyses([{"overall_score": 9, "recommendations": ["a", "b"]},
+                             {"overall_score": 3, "recommendations": ["b", "c"]}], weights=[3, 1])
+    assert merged == {"recommendations": ["a", "b", "c"], "overall_score": 8}
+
+
+def test_over_budget_policy_uses_map_reduce(monkeypatch):
+    monkeypatch.setitem(PROMPT_CONFIG, "token_budget", 100)
+    monkeypatch.setitem(PROMPT_CONFIG, "chunk_token_budget", 100)
+    model = FakeGenerativeModel()
+    analysis = analyze_policy_with_gemini(long_policy(), model)
+    assert analysis["prompt_stats"]["mode"] == "map_reduce"
+    assert model.calls == analysis["prompt_stats"]["chunks"] > 1
+    assert analysis["policy_analysis"] == DEFAULT_ANALYSIS["policy_analysis"]
+    assert analysis["overall_score"] == DEFAULT_ANALYSIS["overall_score"]
+
+
+def test_blocks_only_change_around_an_edit():
+    blocks = section_blocks(compact_sections(sectioned_policy()), max_tokens=150, min_tokens=40)
+    edited = section_blocks(compact_sections(sectioned_policy(edit=7)), max_tokens=150, min_tokens=40)
+    assert len(blocks) > 3
+    assert all(count_tokens(block) <= 150 for block in blocks)
+    assert len(set(edited) - set(blocks)) <= 2
+
+
+def test_incremental_analysis_reanalyzes_only_edited_blocks(monkeypatch, tmp_path):
+    monkeypatch.setitem(PROMPT_CONFIG, "block_max_tokens", 150)
+    monkeypatch.setitem(PROMPT_CONFIG, "block_min_tokens", 40)
+    # Not throttled by the process-wide rate limit other tests have drawn down
+    guard = CallGuard(requests_per_minute=60000, burst=100)
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: guard)
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"))
+    model = FakeGenerativeModel()
+    analysis = analyze_policy_incremental(sectioned_policy(), model, cache)
+    blocks = analysis["prompt_stats"]["blocks"]
+    assert analysis["prompt_stats"]["mode"] == "incremental"
+    assert model.calls == blocks > 3
+    assert analysis["overall_score"] == DEFAULT_ANALYSIS["overall_score"]
+
+    reported = []
+    edited = analyze_policy_incremental(sectioned_policy(edit=7), model, cache,
+                                        on_section=lambda path, value: reported.append(path))
+    assert model.calls - blocks <= 2
+    assert edited["prompt_stats"]["reused_blocks"] >= edited["prompt_stats"]["blocks"] - 2
+    assert ("recommendations",) in reported
+
+
+def test_short_uploads_keep_the_single_streamed_call(monkeypatch, tmp_path):
+    guard = CallGuard(requests_per_minute=60000, burst=100)
+    monkeypatch.setattr("policy_analyzer.get_call_guard", lambda: guard)
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"))
+    short = open("test_policy_louisiana.txt", encoding="utf-8").read()
+    assert not incremental_pays_off(short, "fake", cache)
+    assert incremental_pays_off(sectioned_policy(sections=80), "fake", None)
+
+    # Once its block is cached, re-analyzing the short document is free on the incremental path
+    analyze_policy_incremental(short, FakeGenerativeModel(), cache, model_name="fake")
+    assert incremental_pays_off(short, "fake", cache)
+    assert cache.stats()["misses"] == 1
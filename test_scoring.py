@@ -0,0 +1,76 @@
+"""
+Tests for the deterministic quick-score engine
+"""
+
+import math
+
+import numpy as np
+
+from benchmarks.bench_scoring import make_policies
+from config import US_AVERAGES
+from policy_extractor import extract_policy_fields
+from scoring import FIELDS, GROUPS, quick_score, score_policies, sensitivity, sweep
+
+
+def test_average_policy_scores_five_everywhere():
+    score = quick_score(US_AVERAGES)
+    assert score["overall_score"] == 5.0
+    assert set(score["groups"].values()) == {5.0}
+    assert set(score["fields"]) == set(FIELDS)
+
+
+def test_higher_limits_and_lower_costs_score_better():
+    policy = extract_policy_fields(open("test_policy_basic.txt").read())
+    score = quick_score(policy)
+    # 25/50 liability is half the US average: one halving is 2.5 points below 5
+    assert score["fields"]["bodily_injury_per_person"] == {"ratio": 0.5, "score": 2.5, "adequate": False}
+    assert score["groups"]["liability"] < 5
+    assert score["fields"]["monthly_premium"]["ratio"] == 1.25
+    assert quick_score(extract_policy_fields(open("test_policy_premium.txt").read()))["groups"]["liability"] == 10.0
+
+
+def test_state_averages_used_for_premium_when_known():
+    policy = {"monthly_premium": 195}
+    assert quick_score(policy)["fields"]["monthly_premium"]["adequate"] is False
+    new_york = quick_score(policy, state="new york")
+    assert new_york["state"] == "New York"
+    assert new_york["fields"]["monthly_premium"] == {"ratio": 1.0, "score": 5.0, "adequate": True}
+
+
+def test_missing_fields_left_out_of_the_overall_score():
+    assert quick_score({})["overall_score"] is None
+    score = quick_score({"collision_deductible": 1000, "roadside_assistance": True})
+    assert list(score["fields"]) == ["collision_deductible"]
+    assert score["overall_score"] == score["groups"]["deductibles"] == 2.5
+
+
+def test_batch_scoring_matches_single_policy_scores():
+    policies = make_policies(50)
+    scores = score_policies(policies)
+    assert scores["group_scores"].shape == (50, len(GROUPS))
+    for index in (0, 17, 49):
+        single = quick_score(policies[index])["overall_score"]
+        assert math.isclose(round(float(scores["overall"][index]), 1), single)
+    assert not np.isnan(scores["overall"]).any()
+
+
+def test_sweep_matches_scoring_each_configuration():
+    deductibles = [(250, 250), (500, 500), (1000, 1000)]
+    limits = [(25000, 50000, 25000), (100000, 300000, 100000)]
+    result = sweep(US_AVERAGES, [(("bodily_injury_per_person", "bodily_injury_per_accident", "property_damage"), limits),
+                                 (("comprehensive_deductible", "collision_deductible"), deductibles)])
+    assert result["overall"].shape == (2, 3)
+    assert result["group_scores"].shape == (2, 3, len(GROUPS))
+    policy = {**US_AVERAGES, "liability_coverage": {"bodily_injury": {"per_person": 100000, "per_accident": 300000},
+                                                    "property_damage": {"per_accident": 100000}},
+              "comprehensive_deductible": 1000, "collision_deductible": 1000}
+    assert math.isclose(round(float(result["overall"][1, 2]), 1), quick_score(policy)["overall_score"])
+    assert result["overall"][0, 1] < 5.0 < result["overall"][1, 1]
+
+
+def test_sensitivity_scales_one_field_at_a_time():
+    fields, scores = sensitivity({"monthly_premium": 150, "collision_deductible": 500}, [0.5, 1.0, 2.0])
+    assert fields == ["collision_deductible", "monthly_premium"]
+    assert scores.shape == (2, 3)
+    # Halving a cost raises the score; the unchanged column is the base score
+    assert scores[1, 0] > scores[1, 1] == 5.0 > scores[1, 2]
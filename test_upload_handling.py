@@ -0,0 +1,52 @@
+"""
+Tests for bounded-memory upload handling
+"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+from upload_handling import UploadTooLarge, preview_text, spool_upload
+
+
+class FakeUpload(io.BytesIO):
+    def __init__(self, data, name="policy.txt", mime_type="text/plain", size=None):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+        self.size = size
+
+
+def test_spooled_upload_round_trip_and_cleanup():
+    data = "LIABILITY COVERAGE:\n- Bodily Injury: $50,000 per person\n".encode() * 100
+    with spool_upload(FakeUpload(data), chunk_size=64) as upload:
+        assert upload.size == len(data)
+        assert upload.sha256 == hashlib.sha256(data).hexdigest()
+        assert upload.read_text() == data.decode()
+        with upload.mapped() as buf:
+            assert buf[:10] == data[:10]
+        path = upload.path
+    assert not os.path.exists(path)
+
+
+def test_limit_enforced_while_streaming():
+    # Declared size is missing, so the limit must trip mid-copy
+    upload = FakeUpload(b"x" * 1000)
+    with pytest.raises(UploadTooLarge):
+        spool_upload(upload, max_bytes=500, chunk_size=100)
+    assert upload.tell() <= 600
+
+
+def test_declared_size_rejected_before_reading():
+    upload = FakeUpload(b"x" * 10, size=10 * 1024 * 1024 * 1024)
+    with pytest.raises(UploadTooLarge):
+        spool_upload(upload)
+    assert upload.tell() == 0
+
+
+def test_preview_is_capped():
+    assert preview_text("short", max_chars=10) == "short"
+    preview = preview_text("a" * 100, max_chars=10)
+    assert preview.startswith("a" * 10) and "90 more characters" in preview
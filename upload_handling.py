@@ -0,0 +1,106 @@
+"""
+Bounded-memory upload handling for Auto Policy AI Analyzer
+Streams uploads to a temporary file in chunks, enforcing the configured size
+limit as it goes, and exposes the result as a path or a memory-mapped buffer
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from config import UPLOAD_CONFIG
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded UPLOAD_CONFIG['max_file_size']"""
+
+    def __init__(self, limit_bytes):
+        super().__init__(f"File is larger than the {limit_bytes // (1024 * 1024)} MB upload limit")
+        self.limit_bytes = limit_bytes
+
+
+def max_upload_bytes():
+    """Configured upload limit in bytes"""
+    return int(UPLOAD_CONFIG['max_file_size'] * 1024 * 1024)
+
+
+class SpooledUpload:
+    """An upload written to a temporary file; delete it with close() or a with-block"""
+
+    def __init__(self, path, name, mime_type, size, sha256):
+        self.path = path
+        self.name = name
+        self.type = mime_type
+        self.size = size
+        self.sha256 = sha256
+
+    @contextmanager
+    def mapped(self):
+        """Read-only memory map of the upload (empty bytes for an empty file)"""
+        if not self.size:
+            yield b''
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+    def read_text(self, encoding='utf-8'):
+        """Decode the whole upload straight from the mapped file"""
+        with self.mapped() as buf:
+            return str(buf, encoding) if self.size else ''
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def spool_upload(uploaded_file, max_bytes=None, chunk_size=None):
+    """Copy an uploaded file to disk chunk by chunk, stopping as soon as it is too large"""
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    chunk_size = chunk_size or UPLOAD_CONFIG['chunk_size']
+
+    # Reject early when the uploader already knows the size
+    declared_size = getattr(uploaded_file, 'size', None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    suffix = os.path.splitext(getattr(uploaded_file, 'name', '') or '')[1]
+    fd, path = tempfile.mkstemp(prefix='policyai-', suffix=suffix, dir=UPLOAD_CONFIG['spool_dir'])
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = uploaded_file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return SpooledUpload(path, getattr(uploaded_file, 'name', os.path.basename(path)),
+                         getattr(uploaded_file, 'type', None), size, digest.hexdigest())
+
+
+def preview_text(text, max_chars=None):
+    """Capped head of a document for display; the full text is never sent to the browser"""
+    max_chars = UPLOAD_CONFIG['preview_chars'] if max_chars is None else max_chars
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n\n… ({len(text) - max_chars:,} more characters not shown)"